@@ -0,0 +1,107 @@
+"""Benchmark for applying V4A diffs to large files.
+
+Compares ``agents.apply_diff`` with the indexed engine used by
+``WorkspaceEditor`` (``coding_agent.util.diff_engine``) on synthetic
+lockfile-like files from 1 KB to 50 MB, patched with three hunks spread
+across the file. Both engines must produce identical output.
+
+Run from the repository root:
+
+    python benchmarks/bench_apply_diff.py [--sizes 1K,64K,1M,10M,50M] [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from agents import apply_diff  # noqa: E402
+
+from coding_agent.util.diff_engine import apply_diff_indexed  # noqa: E402
+
+
+DEFAULT_SIZES = "1K,64K,1M,10M,50M"
+_UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+def _parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+def build_file(size: int) -> list[str]:
+    lines: list[str] = []
+    total = 0
+    number = 0
+    while total < size:
+        # Repetitive structure like package-lock.json: many near-identical lines.
+        block = [
+            f'    "node_modules/package-{number}": {{',
+            f'      "version": "1.{number % 50}.0",',
+            '      "dev": true,',
+            "    },",
+        ]
+        lines.extend(block)
+        total += sum(len(line) + 1 for line in block)
+        number += 1
+    return lines
+
+
+def build_diff(lines: list[str]) -> str:
+    hunks = []
+    for fraction in (0.1, 0.5, 0.9):
+        target = int(len(lines) * fraction) // 4 * 4
+        context = lines[target : target + 4]
+        hunks.append(
+            "\n".join(
+                [
+                    "@@",
+                    f" {context[0]}",
+                    f"-{context[1]}",
+                    f"+{context[1].replace('.0', '.1')}",
+                    f" {context[2]}",
+                    f" {context[3]}",
+                ]
+            )
+        )
+    return "\n".join(hunks) + "\n"
+
+
+def _best_of(func, repeat: int) -> tuple[float, str]:
+    best = float("inf")
+    result = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'lines':>10} {'agents.apply_diff':>18} {'indexed':>10} {'speedup':>8}")
+    for label in args.sizes.split(","):
+        lines = build_file(_parse_size(label))
+        text = "\n".join(lines)
+        diff = build_diff(lines)
+        baseline, expected = _best_of(lambda: apply_diff(text, diff), args.repeat)
+        indexed, actual = _best_of(lambda: apply_diff_indexed(text, diff), args.repeat)
+        assert actual == expected, f"engines disagree for {label}"
+        print(
+            f"{label:>8} {len(lines):>10} {baseline * 1e3:>15.2f} ms "
+            f"{indexed * 1e3:>7.2f} ms {baseline / indexed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Micro-benchmark for ShellExecutor command classification.
+
+Compares the original per-pattern ``re.search`` loops with the precompiled
+``CommandClassifier`` (cold, i.e. cache disabled, and warm).
+
+Run from the repository root:
+
+    python benchmarks/bench_command_classifier.py [--iterations N]
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from coding_agent.tools.shell import ShellExecutor  # noqa: E402
+from coding_agent.util.command_classifier import CommandClassifier  # noqa: E402
+
+
+COMMANDS = [
+    "ls -la",
+    "cat package.json",
+    "git status",
+    "npm install",
+    "npm run build && npm test",
+    "npm create vite@latest portfolio -- --template react-swc-ts",
+    "npx create-next-app@latest web --ts --eslint",
+    "python manage.py migrate",
+    "npm run dev -- --host 0.0.0.0 --port 4173 &",
+    "uvicorn app:app --reload &",
+    "grep -rn 'TODO' src | head -50",
+]
+
+
+def _pattern_groups() -> dict[str, tuple[str, ...]]:
+    return {
+        "needs-yes": ShellExecutor._YES_FLAG_PATTERNS,
+        "auto-confirm": ShellExecutor._AUTO_CONFIRM_PATTERNS,
+        "scaffold-vite": ShellExecutor._VITE_CREATE_PATTERNS,
+        "dev-server": ShellExecutor._DEV_SERVER_PATTERNS,
+    }
+
+
+def legacy_classify(command: str) -> set[str]:
+    tags: set[str] = set()
+    for tag, patterns in _pattern_groups().items():
+        lower = command.strip().lower()
+        for pattern in patterns:
+            if re.search(pattern, lower):
+                tags.add(tag)
+                break
+    return tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    cold = CommandClassifier(_pattern_groups(), cache_size=0)
+    warm = CommandClassifier(_pattern_groups())
+
+    for command in COMMANDS:
+        assert legacy_classify(command) == set(cold.classify(command).tags), command
+
+    candidates = {
+        "legacy re.search loop": lambda: [legacy_classify(c) for c in COMMANDS],
+        "classifier (no cache)": lambda: [cold.classify(c) for c in COMMANDS],
+        "classifier (cached)": lambda: [warm.classify(c) for c in COMMANDS],
+    }
+    per_call = len(COMMANDS) * args.iterations
+    for name, func in candidates.items():
+        elapsed = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:<24} {elapsed / per_call * 1e6:8.2f} us/command")
+
+
+if __name__ == "__main__":
+    main()
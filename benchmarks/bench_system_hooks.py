@@ -0,0 +1,256 @@
+"""Benchmark for the message filter and reminder hooks in coding_agent.util.system_hooks.
+
+Builds synthetic threads of 100 to 50,000 items (user messages, reasoning,
+function_call/function_call_output pairs, re-sent duplicate calls and
+outputs recorded before their calls) and measures:
+
+* ``filter_cold``   - ``filter_duplicates`` over a whole unfiltered thread
+                      (dedup and reorder of every item),
+* ``filter_turn``   - one more turn appended to an already-filtered thread,
+* ``reminder``      - ``SystemReminderHook`` producing a reminder for an
+                      unchanged todo list and injecting it before an LLM call.
+
+For each case it reports operations per second and the peak memory
+allocated during one operation (tracemalloc). Everything runs offline.
+Results can be saved as a JSON baseline and compared on later runs; the
+script exits with status 1 when a case is slower than the baseline by more
+than ``--tolerance``.
+
+Run from the repository root:
+
+    python benchmarks/bench_system_hooks.py [--sizes 100,1K,10K,50K] [--repeat N]
+        [--save-baseline FILE | --baseline FILE [--tolerance 0.25]]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from agency_swarm.utils.thread import ThreadManager  # noqa: E402
+
+from coding_agent.util.system_hooks import (  # noqa: E402
+    SystemReminderHook,
+    filter_duplicates,
+)
+
+
+DEFAULT_SIZES = "100,1K,10K,50K"
+_UNITS = {"K": 1000}
+# Share of tool calls that are re-sent (duplicate call_id) or whose output is
+# recorded before the call.
+DUPLICATE_RATE = 0.05
+OUT_OF_ORDER_RATE = 0.05
+
+
+def _parse_size(value: str) -> int:
+    value = value.strip().upper()
+    if value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+class _SharedContext:
+    """Stand-in for the agency context: a thread manager plus get/set storage."""
+
+    def __init__(self, thread_manager: ThreadManager) -> None:
+        self.thread_manager = thread_manager
+        self._values: dict = {
+            "todos": {
+                "todos": [
+                    {"task": f"Task {index}", "status": status}
+                    for index, status in enumerate(
+                        ["completed"] * 6 + ["in_progress"] * 2 + ["pending"] * 4
+                    )
+                ],
+                "version": 1,
+            }
+        }
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key, value) -> None:
+        self._values[key] = value
+
+
+def build_turn(rng: random.Random, turn: int, timestamp: float) -> list[dict]:
+    """One user turn: a message, reasoning and a few tool calls with outputs."""
+    items: list[dict] = [
+        {"type": "message", "role": "user", "content": f"request {turn}", "timestamp": timestamp}
+    ]
+    for call in range(rng.randint(1, 4)):
+        call_id = f"call_{turn}_{call}"
+        function_call = {
+            "type": "function_call",
+            "call_id": call_id,
+            "name": "shell",
+            "arguments": '{"commands": ["ls"]}',
+            "timestamp": timestamp,
+        }
+        output = {
+            "type": "function_call_output",
+            "call_id": call_id,
+            "output": "file.txt\n" * rng.randint(1, 20),
+            "timestamp": timestamp,
+        }
+        items.append({"type": "reasoning", "summary": [], "timestamp": timestamp})
+        if rng.random() < OUT_OF_ORDER_RATE:
+            items.extend([output, function_call])
+        else:
+            items.extend([function_call, output])
+        if rng.random() < DUPLICATE_RATE:
+            items.append(dict(function_call))
+    items.append(
+        {"type": "message", "role": "assistant", "content": "done", "timestamp": timestamp}
+    )
+    return items
+
+
+def build_thread(size: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    items: list[dict] = []
+    turn = 0
+    while len(items) < size:
+        items.extend(build_turn(rng, turn, float(turn)))
+        turn += 1
+    return items[:size]
+
+
+def _context(items: list[dict]) -> SimpleNamespace:
+    manager = ThreadManager()
+    manager.replace_messages(items)
+    return SimpleNamespace(context=_SharedContext(manager))
+
+
+def _run_sync(coroutine) -> None:
+    # The hook coroutines never suspend; an event loop would dominate the timing.
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        return
+    raise RuntimeError("hook coroutine suspended unexpectedly")
+
+
+def _measure(setup, operation, repeat: int) -> dict:
+    """Best wall time and peak allocation of ``operation(setup())`` over ``repeat`` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        operation(state)
+        best = min(best, time.perf_counter() - started)
+    state = setup()
+    tracemalloc.start()
+    operation(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": best,
+        "ops_per_sec": 1.0 / best if best > 0 else float("inf"),
+        "peak_alloc_bytes": peak,
+    }
+
+
+def bench_size(size: int, repeat: int) -> dict[str, dict]:
+    thread = build_thread(size)
+    next_turn = build_turn(random.Random(size), 10**6, 10.0**6)
+    quiet = contextlib.redirect_stdout(io.StringIO())  # filter warnings for orphan outputs
+
+    def cold_setup():
+        return _context([dict(item) for item in thread])
+
+    def warm_setup():
+        context = _context([dict(item) for item in thread])
+        with quiet:
+            filter_duplicates(context)
+        return context
+
+    def run_turn(context) -> None:
+        context.context.thread_manager.add_messages([dict(item) for item in next_turn])
+        filter_duplicates(context)
+
+    def reminder_setup():
+        # Steady state: the todo list is unchanged since the previous reminder.
+        hook, context = SystemReminderHook(), _context(thread)
+        hook._inject_reminder(context, "user_message")
+        return hook, context, []
+
+    def run_reminder(state) -> None:
+        hook, context, input_items = state
+        hook._inject_reminder(context, "user_message")
+        _run_sync(hook.on_llm_start(context, None, None, input_items))
+
+    with quiet:
+        return {
+            "filter_cold": _measure(cold_setup, filter_duplicates, repeat),
+            "filter_turn": _measure(warm_setup, run_turn, repeat),
+            "reminder": _measure(reminder_setup, run_reminder, repeat),
+        }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for size, cases in results.items():
+        for case, measured in cases.items():
+            reference = baseline.get(size, {}).get(case)
+            if reference is None:
+                continue
+            slowdown = measured["seconds"] / reference["seconds"] - 1
+            if slowdown > tolerance:
+                regressions.append(
+                    f"{case} @ {size}: {measured['seconds'] * 1e3:.3f} ms vs baseline "
+                    f"{reference['seconds'] * 1e3:.3f} ms (+{slowdown:.0%})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, help="JSON baseline to compare against")
+    parser.add_argument("--save-baseline", type=Path, help="write results as a JSON baseline")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown against the baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    results: dict[str, dict] = {}
+    print(f"{'size':>8} {'case':<12} {'time':>12} {'ops/sec':>12} {'peak alloc':>12}")
+    for label in args.sizes.split(","):
+        size = _parse_size(label)
+        results[str(size)] = cases = bench_size(size, args.repeat)
+        for case, measured in cases.items():
+            print(
+                f"{size:>8} {case:<12} {measured['seconds'] * 1e3:>9.3f} ms "
+                f"{measured['ops_per_sec']:>12.1f} {measured['peak_alloc_bytes'] / 1024:>9.1f} KB"
+            )
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
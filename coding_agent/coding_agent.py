@@ -1,7 +1,8 @@
 from agents import ModelSettings
 from agency_swarm import Agent, WebSearchTool
 from openai.types.shared import Reasoning
-from coding_agent.tools import apply_patch, shell_tool, OpenAIImageGenerationTool, update_plan, DeployTool
+from coding_agent.tools import apply_patch, shell_tool, OpenAIImageGenerationTool, update_plan, DeployTool, BackgroundProcesses, WorkspaceChanges, EditHistory
+from coding_agent.util.system_hooks import CompositeHooks, create_context_budget_hook, create_patch_batch_hook
 coding_agent = Agent(
     name="CodingAgent",
     description="Vibe Code Any Website",
@@ -13,8 +14,13 @@ coding_agent = Agent(
         WebSearchTool(),
         OpenAIImageGenerationTool,
         update_plan,
-		    DeployTool
+		    DeployTool,
+        BackgroundProcesses,
+        WorkspaceChanges,
+        # Undo/redo needs the opt-in edit history (CODING_AGENT_PATCH_SNAPSHOTS=1).
+        *([EditHistory] if apply_patch.editor.snapshots is not None else []),
     ],
+    hooks=CompositeHooks([create_context_budget_hook(), create_patch_batch_hook(apply_patch.editor)]),
     model_settings=ModelSettings(
         reasoning=Reasoning(
             effort="medium",
@@ -0,0 +1,68 @@
+from typing import Literal
+
+from agency_swarm.tools import BaseTool
+from pydantic import Field
+
+from ..util.session_state import session_key
+from .shell import shell_executor
+
+
+class BackgroundProcesses(BaseTool):
+    """
+    Manages long-running background commands (dev servers, watchers) started through the shell tool.
+
+    Use it to list running jobs, read the latest lines of a job's log, check whether a port is accepting
+    connections, or stop a job (its whole process group) when it is no longer needed.
+    """
+
+    action: Literal["list", "tail", "probe", "stop"] = Field(
+        ..., description="Operation to perform: list, tail, probe or stop."
+    )
+    job_id: str | None = Field(
+        None, description="Background job id (e.g. 'bg-1'). Required for tail and stop."
+    )
+    lines: int = Field(
+        50, ge=1, le=500, description="Number of log lines to return for tail."
+    )
+    port: int | None = Field(
+        None,
+        description="Port to probe on localhost. Defaults to the ports detected in the job's command.",
+    )
+
+    async def run(self) -> str:
+        registry = shell_executor.background_jobs
+        # Only jobs started by this conversation are visible.
+        owner = session_key(self._context)
+
+        if self.action == "list":
+            jobs = registry.list_jobs(owner)
+            if not jobs:
+                return "No background jobs."
+            return "\n".join(job.describe() for job in jobs)
+
+        if self.action == "probe":
+            ports = [self.port] if self.port is not None else []
+            if not ports and self.job_id:
+                job = registry.get(self.job_id, owner)
+                ports = job.ports if job else []
+            if not ports:
+                return "Error: provide a port (none could be detected from the job's command)."
+            results = []
+            for port in ports:
+                listening = await registry.probe_port(port)
+                results.append(
+                    f"port {port}: {'accepting connections' if listening else 'not listening'}"
+                )
+            return "\n".join(results)
+
+        if not self.job_id:
+            return f"Error: job_id is required for '{self.action}'."
+        if registry.get(self.job_id, owner) is None:
+            return f"Error: unknown background job '{self.job_id}'."
+
+        if self.action == "tail":
+            output = registry.tail(self.job_id, self.lines, owner)
+            return output or f"No output logged for {self.job_id} yet."
+
+        job = await registry.stop(self.job_id, owner=owner)
+        return f"Stopped {job.job_id} (pid={job.pid})."
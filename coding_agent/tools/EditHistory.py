@@ -0,0 +1,54 @@
+from typing import Literal
+
+from agency_swarm.tools import BaseTool
+from pydantic import Field
+
+from ..util.snapshot_store import SnapshotConflict
+from .apply_patch import workspace_editor
+
+
+class EditHistory(BaseTool):
+    """
+    Lists, undoes and redoes the file edits made with apply_patch (a multi-file patch counts as one edit).
+
+    Use it to back out an edit that broke something instead of writing a reverse patch by hand. Undo refuses
+    when a file was changed since the edit (by the shell, a formatter or a dev server); pass force=true to
+    overwrite those changes anyway.
+    """
+
+    action: Literal["list", "undo", "redo"] = Field(
+        ..., description="Operation to perform: list, undo or redo."
+    )
+    steps: int = Field(1, ge=1, le=50, description="Number of edits to undo or redo.")
+    force: bool = Field(
+        False, description="Undo/redo even if the files were changed after the edit."
+    )
+
+    async def run(self) -> str:
+        editor = workspace_editor
+        if editor.snapshots is None:
+            return "Error: edit history is disabled (set CODING_AGENT_PATCH_SNAPSHOTS=1)."
+
+        if self.action == "list":
+            records = editor.snapshots.history()
+            if not records:
+                return "No edits to undo."
+            return "\n".join(
+                f"edit {record.edit_id}: {record.label}" for record in reversed(records)
+            )
+
+        apply = editor.undo if self.action == "undo" else editor.redo
+        verb = "Undid" if self.action == "undo" else "Redid"
+        lines = []
+        for _ in range(self.steps):
+            try:
+                labels = apply(1, self.force)
+            except SnapshotConflict as exc:
+                lines.append(f"Error: {exc}; pass force=true to overwrite those changes.")
+                break
+            if not labels:
+                if not lines:
+                    lines.append(f"Nothing to {self.action}.")
+                break
+            lines.extend(f"{verb}: {label}" for label in labels)
+        return "\n".join(lines)
@@ -96,8 +96,12 @@ class UpdatePlan(BaseTool):
 
             # Persist to shared agency context when available. The framework
             # manages the context lifecycle; if not present, simply skip.
+            # The version lets the system reminder hook reuse its rendering
+            # until the list changes.
             if self.context is not None:
-                self.context.set("todos", todos_payload)
+                previous = self.context.get("todos", None)
+                version = previous.get("version", 0) + 1 if isinstance(previous, dict) else 1
+                self.context.set("todos", {"todos": todos_payload, "version": version})
 
             # Format the response
             total_tasks = len(self.todos)
@@ -0,0 +1,38 @@
+from agency_swarm.tools import BaseTool
+from pydantic import Field
+
+from ..util.workspace_watcher import ChangeFeedGap
+from .shell import workspace_watcher
+
+
+class WorkspaceChanges(BaseTool):
+    """
+    Lists files created, modified or deleted in the workspace since a given generation.
+
+    Every answer starts with the current generation number; pass it as `since` next time to see only
+    what changed in between (including changes made by dev servers, installs or build steps) instead of
+    re-listing the whole tree with the shell.
+    """
+
+    since: int = Field(
+        0, ge=0, description="Generation returned by a previous call; 0 lists all recorded changes."
+    )
+    limit: int = Field(200, ge=1, le=2000, description="Maximum number of paths to return.")
+
+    async def run(self) -> str:
+        watcher = workspace_watcher
+        watcher.start()
+        if not watcher.running:
+            return "Error: the workspace watcher is not running (disabled or no workspace yet)."
+        generation = watcher.sync()
+        try:
+            changes = watcher.changed_paths_since(self.since)
+        except ChangeFeedGap as exc:
+            return f"generation {generation}\nError: {exc}."
+        if not changes:
+            return f"generation {generation}\nNo changes."
+        lines = [f"generation {generation}"]
+        lines.extend(f"{kind:<8} {path}" for path, kind in list(changes.items())[: self.limit])
+        if len(changes) > self.limit:
+            lines.append(f"... {len(changes) - self.limit} more")
+        return "\n".join(lines)
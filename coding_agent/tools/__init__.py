@@ -3,5 +3,8 @@ from .UpdatePlan import update_plan
 from .apply_patch import apply_patch
 from .shell import shell_tool
 from .deploy import DeployTool
+from .BackgroundProcesses import BackgroundProcesses
+from .WorkspaceChanges import WorkspaceChanges
+from .EditHistory import EditHistory
 
-__all__ = ["OpenAIImageGenerationTool", "update_plan", "apply_patch", "shell_tool", "DeployTool"]
\ No newline at end of file
+__all__ = ["OpenAIImageGenerationTool", "update_plan", "apply_patch", "shell_tool", "DeployTool", "BackgroundProcesses", "WorkspaceChanges", "EditHistory"]
\ No newline at end of file
@@ -1,43 +1,487 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from agents import apply_diff
 from agents.editor import ApplyPatchOperation, ApplyPatchResult
 from agents import ApplyPatchTool
 
+from ..util.atomic_write import (
+    atomic_delete,
+    atomic_write_bytes,
+    atomic_write_stream,
+    normalize_durability,
+)
+from ..util.command_cache import bump_workspace_generation
+from ..util.diff_engine import (
+    StreamingUnsupported,
+    apply_diff_indexed,
+    requires_reference_parser,
+    stream_diff,
+)
+from ..util.file_cache import (
+    DEFAULT_CACHE_BYTES,
+    DEFAULT_CACHE_ENTRIES,
+    FileContentCache,
+)
+from ..util.patch_journal import PatchJournal
+from ..util.snapshot_store import (
+    DEFAULT_MAX_BYTES as DEFAULT_SNAPSHOT_MAX_BYTES,
+    EditRecord,
+    SnapshotStore,
+)
+from ..util.syntax_check import SyntaxValidator
+from ..util.text_encoding import DEFAULT_FORMAT, BinaryFileError, TextFormat
+
+
+DEFAULT_BATCH_WORKERS = 8
+# Per-workspace directory for editor state that must survive restarts.
+STATE_DIR_NAME = ".coding-agent"
+DEFAULT_STREAMING_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+
+class PatchBatchError(RuntimeError):
+    """Raised when an operation of a batch cannot be applied; nothing was written."""
+
+    def __init__(self, index: int, path: str, error: Exception) -> None:
+        super().__init__(f"Operation {index} ({path}) failed: {error}")
+        self.index = index
+        self.path = path
+        self.error = error
+
+
+@dataclass(slots=True)
+class PatchBatchResult:
+    results: list[ApplyPatchResult]
+    files_changed: int
+    prepare_seconds: float
+    commit_seconds: float
+
+    @property
+    def total_seconds(self) -> float:
+        return self.prepare_seconds + self.commit_seconds
+
+
+@dataclass(slots=True)
+class _ExpectedBatch:
+    """Operations of one model response, applied together when the first arrives."""
+
+    context: object
+    operations: list[ApplyPatchOperation]
+    position: int = 0
+    results: list[ApplyPatchResult] | None = None
+    error: Exception | None = None
+
+
+@dataclass(slots=True)
+class _PlannedChange:
+    target: Path
+    content: str | None
+    output: str
+    text_format: TextFormat = DEFAULT_FORMAT
+
 
 class WorkspaceEditor:
-    """Editor for creating, updating, and deleting files within a workspace."""
-    
-    def __init__(self, root: Path) -> None:
+    """
+    Editor for creating, updating, and deleting files within a workspace.
+
+    Updates keep each file's encoding (UTF-8, UTF-16/32, Latin-1), byte order
+    mark and newline style; files that look binary are refused. Written
+    files with a known syntax (Python, JSON, TOML, YAML, or any registered
+    with ``validator``) are parsed and errors are appended to the output.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        durability: str | None = None,
+        journal_dir: Path | None = None,
+        cache_entries: int | None = None,
+        cache_bytes: int | None = None,
+        streaming_threshold: int | None = None,
+        snapshots: bool | None = None,
+        snapshot_dir: Path | None = None,
+        validate: bool | None = None,
+        validator: SyntaxValidator | None = None,
+    ) -> None:
         self._root = root.resolve()
+        # none: rename only; fdatasync: flush file data; full: also fsync the directory.
+        if durability is None:
+            durability = os.environ.get("CODING_AGENT_PATCH_DURABILITY")
+        self.durability = normalize_durability(durability)
+        # The journal lives in the workspace so it survives reboots; it is
+        # recovered on the first write, not when the module is imported.
+        if journal_dir is None:
+            env_journal_dir = os.environ.get("CODING_AGENT_PATCH_JOURNAL_DIR")
+            if env_journal_dir:
+                journal_dir = Path(env_journal_dir)
+            else:
+                journal_dir = self._root / STATE_DIR_NAME / "journal"
+        self.journal = PatchJournal(journal_dir, durability=self.durability, root=self._root)
+        self._journal_recovered = False
+
+        # Decoded contents of recently read/written files, validated by stat.
+        if cache_entries is None:
+            cache_entries = _env_int("CODING_AGENT_PATCH_CACHE_ENTRIES")
+        if cache_entries is None or cache_entries < 0:
+            cache_entries = DEFAULT_CACHE_ENTRIES
+        if cache_bytes is None:
+            cache_bytes = _env_int("CODING_AGENT_PATCH_CACHE_BYTES")
+        if cache_bytes is None or cache_bytes < 0:
+            cache_bytes = DEFAULT_CACHE_BYTES
+        self.content_cache = FileContentCache(cache_entries, cache_bytes)
+
+        # Updates to files at least this large are streamed from a memory map
+        # instead of being decoded into memory (0 disables streaming).
+        if streaming_threshold is None:
+            streaming_threshold = _env_int("CODING_AGENT_PATCH_STREAMING_THRESHOLD_BYTES")
+        if streaming_threshold is None or streaming_threshold < 0:
+            streaming_threshold = DEFAULT_STREAMING_THRESHOLD_BYTES
+        self.streaming_threshold = streaming_threshold
+
+        # Undo/redo history (opt-in): every edit copies the pre- and
+        # post-image of each touched file into a content-addressed store.
+        if snapshots is None:
+            snapshots = os.environ.get("CODING_AGENT_PATCH_SNAPSHOTS", "0") == "1"
+        self.snapshots: SnapshotStore | None = None
+        if snapshots:
+            if snapshot_dir is None:
+                env_snapshot_dir = os.environ.get("CODING_AGENT_PATCH_SNAPSHOT_DIR")
+                if env_snapshot_dir:
+                    snapshot_dir = Path(env_snapshot_dir)
+                else:
+                    root_id = hashlib.sha256(str(self._root).encode()).hexdigest()[:16]
+                    snapshot_dir = (
+                        Path(tempfile.gettempdir()) / "coding-agent-snapshots" / root_id
+                    )
+            compress = (
+                os.environ.get("CODING_AGENT_PATCH_SNAPSHOT_COMPRESSION", "").lower()
+                == "zstd"
+            )
+            max_bytes = _env_int("CODING_AGENT_PATCH_SNAPSHOT_MAX_BYTES")
+            if max_bytes is None or max_bytes < 0:
+                max_bytes = DEFAULT_SNAPSHOT_MAX_BYTES
+            self.snapshots = SnapshotStore(
+                snapshot_dir, compress=compress, max_bytes=max_bytes
+            )
+
+        # Syntax check of written files, reported in the operation output.
+        if validate is None:
+            validate = os.environ.get("CODING_AGENT_PATCH_VALIDATE", "1") == "1"
+        self.validator = (validator or SyntaxValidator()) if validate else None
+
+        # Announced multi-operation patches, per conversation (see expect_batch).
+        self._expected: dict[int, _ExpectedBatch] = {}
+        self._expected_lock = threading.Lock()
+
+    def expect_batch(self, context, operations: Sequence[ApplyPatchOperation]) -> None:
+        """
+        Announce the operations a model response is about to apply, in order.
+
+        ApplyPatchTool hands the editor one operation at a time; when the first
+        announced operation arrives, all of them go through :meth:`apply_batch`,
+        and each later call returns its share of the result. If any operation
+        fails, that one reports the error, the others report that nothing was
+        written. Operations that do not match the announcement apply one by one.
+        """
+        shared = getattr(context, "context", context)
+        with self._expected_lock:
+            if len(operations) > 1:
+                self._expected[id(shared)] = _ExpectedBatch(shared, list(operations))
+            else:
+                self._expected.pop(id(shared), None)
 
     def create_file(self, operation: ApplyPatchOperation) -> ApplyPatchResult:
-        relative = self._relative_path(operation.path)
-        target = self._resolve(operation.path, ensure_parent=True)
-        diff = operation.diff or ""
-        content = apply_diff("", diff, mode="create")
-        target.write_text(content, encoding="utf-8")
-        return ApplyPatchResult(output=f"Created {relative}")
+        batched = self._from_batch(operation)
+        if batched is not None:
+            return batched
+        self._recover_journal()
+        planned = self._plan(operation)
+        planned.target.parent.mkdir(parents=True, exist_ok=True)
+        self._write_text(planned.target, planned.content, planned.output, planned.text_format)
+        return ApplyPatchResult(output=self._report(planned))
 
     def update_file(self, operation: ApplyPatchOperation) -> ApplyPatchResult:
-        relative = self._relative_path(operation.path)
+        batched = self._from_batch(operation)
+        if batched is not None:
+            return batched
+        self._recover_journal()
         target = self._resolve(operation.path)
-        original = target.read_text(encoding="utf-8")
-        diff = operation.diff or ""
-        patched = apply_diff(original, diff)
-        target.write_text(patched, encoding="utf-8")
-        return ApplyPatchResult(output=f"Updated {relative}")
+        if self.streaming_threshold:
+            if target.stat().st_size >= self.streaming_threshold and self._streamable(target):
+                try:
+                    return self._stream_update(target, operation.diff or "")
+                except StreamingUnsupported:
+                    pass
+        planned = self._plan(operation, target=target)
+        self._write_text(planned.target, planned.content, planned.output, planned.text_format)
+        return ApplyPatchResult(output=self._report(planned))
 
     def delete_file(self, operation: ApplyPatchOperation) -> ApplyPatchResult:
-        relative = self._relative_path(operation.path)
+        batched = self._from_batch(operation)
+        if batched is not None:
+            return batched
+        self._recover_journal()
         target = self._resolve(operation.path)
-        target.unlink(missing_ok=True)
+        relative = self._relative(target)
+        with self._track([target], f"Deleted {relative}"):
+            atomic_delete(target, self.durability)
+        self.content_cache.invalidate(target)
+        bump_workspace_generation()
         return ApplyPatchResult(output=f"Deleted {relative}")
 
-    def _relative_path(self, value: str) -> str:
-        resolved = self._resolve(value)
-        return resolved.relative_to(self._root).as_posix()
+    def apply_batch(
+        self,
+        operations: Sequence[ApplyPatchOperation],
+        max_workers: int | None = None,
+    ) -> PatchBatchResult:
+        """
+        Apply several operations all-or-nothing.
+
+        Every diff is validated and computed in memory first (in a thread pool
+        when no file is touched twice), then all writes are committed together
+        through the journal. If any operation fails, :class:`PatchBatchError`
+        is raised and the workspace is left unchanged.
+        """
+        self._recover_journal()
+        started = time.perf_counter()
+        targets = [self._resolve(operation.path) for operation in operations]
+        if max_workers is None:
+            max_workers = DEFAULT_BATCH_WORKERS
+        if len(set(targets)) == len(targets) and max_workers > 1 and len(operations) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(operations))) as pool:
+                futures = [
+                    pool.submit(self._plan, operation, target=target)
+                    for operation, target in zip(operations, targets)
+                ]
+                planned = [
+                    self._batch_outcome(index, operation, future.result)
+                    for index, (operation, future) in enumerate(zip(operations, futures))
+                ]
+        else:
+            # Later operations on the same file build on the earlier results.
+            overlay: dict[Path, _PlannedChange] = {}
+            planned = []
+            for index, (operation, target) in enumerate(zip(operations, targets)):
+                change = self._batch_outcome(
+                    index, operation, lambda: self._plan(operation, overlay, target)
+                )
+                overlay[change.target] = change
+                planned.append(change)
+        prepared = time.perf_counter()
+
+        changes: dict[Path, _PlannedChange] = {}
+        for change in planned:
+            if change.content is not None:
+                change.target.parent.mkdir(parents=True, exist_ok=True)
+            changes[change.target] = change
+        self._commit(changes, f"Batch of {len(operations)} operations")
+        finished = time.perf_counter()
+
+        return PatchBatchResult(
+            results=[ApplyPatchResult(output=self._report(change)) for change in planned],
+            files_changed=len(changes),
+            prepare_seconds=prepared - started,
+            commit_seconds=finished - prepared,
+        )
+
+    def undo(self, steps: int = 1, force: bool = False) -> list[str]:
+        """
+        Revert the last ``steps`` edits (a batch counts as one) and return their
+        descriptions. Raises ``SnapshotConflict`` if a file was changed since,
+        unless ``force`` is set.
+        """
+        self._recover_journal()
+        return self._history_changed(self._require_snapshots().undo(steps, force))
+
+    def redo(self, steps: int = 1, force: bool = False) -> list[str]:
+        """Re-apply the last ``steps`` undone edits and return their descriptions."""
+        self._recover_journal()
+        return self._history_changed(self._require_snapshots().redo(steps, force))
+
+    def recover_journal(self) -> list[str]:
+        """Finish transactions of this workspace interrupted by a crash."""
+        self._journal_recovered = True
+        if self.journal.journal_dir == self._root / STATE_DIR_NAME / "journal":
+            _ignore_state_dir(self._root / STATE_DIR_NAME)
+        replayed = self.journal.recover()
+        if replayed:
+            self.content_cache.clear()
+            bump_workspace_generation()
+        return replayed
+
+    def _recover_journal(self) -> None:
+        if not self._journal_recovered:
+            self.recover_journal()
+
+    def _require_snapshots(self) -> SnapshotStore:
+        if self.snapshots is None:
+            raise RuntimeError("Edit history is disabled (set CODING_AGENT_PATCH_SNAPSHOTS=1).")
+        return self.snapshots
+
+    def _history_changed(self, records: list[EditRecord]) -> list[str]:
+        for record in records:
+            for change in record.changes:
+                self.content_cache.invalidate(change.path)
+        if records:
+            bump_workspace_generation()
+        return [record.label for record in records]
+
+    def _from_batch(self, operation: ApplyPatchOperation) -> ApplyPatchResult | None:
+        """Result of ``operation`` from its announced batch, or None to apply it alone."""
+        shared = getattr(operation.ctx_wrapper, "context", operation.ctx_wrapper)
+        with self._expected_lock:
+            batch = self._expected.get(id(shared))
+            if batch is None or batch.context is not shared:
+                return None
+            index = batch.position
+            if index >= len(batch.operations) or _signature(
+                batch.operations[index]
+            ) != _signature(operation):
+                del self._expected[id(shared)]
+                return None
+            if index == 0:
+                try:
+                    batch.results = self.apply_batch(batch.operations).results
+                except Exception as exc:
+                    batch.error = exc
+            batch.position += 1
+            if batch.position == len(batch.operations):
+                del self._expected[id(shared)]
+        error = batch.error
+        if error is None:
+            return batch.results[index]
+        # Errors outside of a single operation (journal, paths) go to the first.
+        failed = error.index if isinstance(error, PatchBatchError) else 0
+        if failed == index:
+            raise error.error if isinstance(error, PatchBatchError) else error
+        return ApplyPatchResult(
+            status="failed",
+            output=f"Not applied: {error}; no file of this patch was changed",
+        )
+
+    def _track(
+        self, targets: Iterable[Path], label: str
+    ) -> contextlib.AbstractContextManager:
+        if self.snapshots is None:
+            return contextlib.nullcontext()
+        return self.snapshots.track(targets, label)
+
+    @staticmethod
+    def _batch_outcome(
+        index: int,
+        operation: ApplyPatchOperation,
+        compute: Callable[[], _PlannedChange],
+    ) -> _PlannedChange:
+        try:
+            return compute()
+        except Exception as exc:
+            raise PatchBatchError(index, operation.path, exc) from exc
+
+    def _plan(
+        self,
+        operation: ApplyPatchOperation,
+        overlay: Mapping[Path, _PlannedChange] | None = None,
+        target: Path | None = None,
+    ) -> _PlannedChange:
+        """Compute the new content of one operation without writing it."""
+        if target is None:
+            target = self._resolve(operation.path)
+        relative = self._relative(target)
+        diff = operation.diff or ""
+        if operation.type == "create_file":
+            content = apply_diff_indexed("", diff, mode="create")
+            return _PlannedChange(target, content, f"Created {relative}")
+        if operation.type == "delete_file":
+            return _PlannedChange(target, None, f"Deleted {relative}")
+        if overlay is not None and target in overlay:
+            earlier = overlay[target]
+            if earlier.content is None:
+                raise FileNotFoundError(f"{relative} was deleted earlier in the batch")
+            original, text_format = earlier.content, earlier.text_format
+        else:
+            # Binary files are rejected from their first bytes, before decoding.
+            try:
+                original = self.content_cache.read_text(target)
+            except BinaryFileError as exc:
+                raise BinaryFileError(f"Refusing to patch binary file {relative}: {exc}") from None
+            text_format = self.content_cache.text_format(target)
+        # apply_diff_indexed keeps the newline style of ``original``.
+        patched = apply_diff_indexed(original, diff)
+        return _PlannedChange(target, patched, f"Updated {relative}", text_format)
+
+    def _report(self, change: _PlannedChange) -> str:
+        """Operation output, followed by syntax errors in the written content if any."""
+        if self.validator is None or change.content is None:
+            return change.output
+        diagnostics = self.validator.check(self._relative(change.target), change.content)
+        if not diagnostics:
+            return change.output
+        return "\n".join([change.output, "Syntax check failed:", *diagnostics])
+
+    def _streamable(self, target: Path) -> bool:
+        # The streaming engine matches UTF-8 bytes and LF line endings only; a
+        # UTF-8 BOM is carried through as part of the first line.
+        try:
+            text_format = self.content_cache.text_format(target)
+        except BinaryFileError:
+            return False
+        return text_format.encoding == "utf-8" and text_format.newline == "\n"
+
+    def _stream_update(self, target: Path, diff: str) -> ApplyPatchResult:
+        if requires_reference_parser(diff):
+            # Applied in memory by the SDK's parser, whose handling differs by release.
+            raise StreamingUnsupported("diff needs the SDK's own parser")
+        output = f"Updated {self._relative(target)}"
+        with self._track([target], output), open(target, "rb") as source:
+            atomic_write_stream(
+                target,
+                lambda handle: stream_diff(source.fileno(), diff, handle),
+                self.durability,
+            )
+        self.content_cache.invalidate(target)
+        bump_workspace_generation()
+        return ApplyPatchResult(output=output)
+
+    def _commit(self, changes: Mapping[Path, _PlannedChange], label: str) -> None:
+        with self._track(changes.keys(), label):
+            self.journal.apply(
+                {
+                    target: None
+                    if change.content is None
+                    else change.text_format.encode(change.content)
+                    for target, change in changes.items()
+                }
+            )
+        for target, change in changes.items():
+            if change.content is None:
+                self.content_cache.invalidate(target)
+            else:
+                self.content_cache.store(target, change.content, change.text_format)
+        bump_workspace_generation()
+
+    def _write_text(
+        self,
+        target: Path,
+        content: str,
+        label: str,
+        text_format: TextFormat = DEFAULT_FORMAT,
+    ) -> None:
+        with self._track([target], label):
+            atomic_write_bytes(target, text_format.encode(content), self.durability)
+        self.content_cache.store(target, content, text_format)
+        bump_workspace_generation()
+
+    def _relative(self, target: Path) -> str:
+        return target.relative_to(self._root).as_posix()
 
     def _resolve(self, relative: str, ensure_parent: bool = False) -> Path:
+        # Called once per operation; callers reuse the target it returns.
         candidate = Path(relative)
         target = candidate if candidate.is_absolute() else (self._root / candidate)
         target = target.resolve()
@@ -49,5 +493,29 @@ class WorkspaceEditor:
             target.parent.mkdir(parents=True, exist_ok=True)
         return target
 
+
+def _signature(operation: ApplyPatchOperation) -> tuple:
+    return (operation.type, operation.path, operation.diff or "", operation.move_to)
+
+
+def _ignore_state_dir(state_dir: Path) -> None:
+    # Keep the editor's state out of the user's git status.
+    state_dir.mkdir(exist_ok=True)
+    gitignore = state_dir / ".gitignore"
+    if not gitignore.exists():
+        gitignore.write_text("*\n")
+
+
+def _env_int(name: str) -> int | None:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
 workspace_path = Path("./mnt").resolve()
-apply_patch = ApplyPatchTool(editor=WorkspaceEditor(workspace_path))
\ No newline at end of file
+workspace_editor = WorkspaceEditor(workspace_path)
+apply_patch = ApplyPatchTool(editor=workspace_editor)
@@ -4,7 +4,6 @@ import logging
 import os
 import re
 import shlex
-import time
 from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
@@ -17,10 +16,41 @@ from agents import (
     ShellTool,
 )
 
+from ..util.background_registry import (
+    DEFAULT_FINISHED_RETENTION_SECONDS,
+    DEFAULT_MAX_LOG_BYTES,
+    BackgroundProcessRegistry,
+)
+from ..util.command_cache import (
+    DEFAULT_RESULT_CACHE_SIZE,
+    DEFAULT_RESULT_CACHE_TTL_SECONDS,
+    CommandResultCache,
+    bump_workspace_generation,
+    parse_read_only_command,
+    split_cache_bypass,
+)
+from ..util.command_classifier import CommandClassification, CommandClassifier
+from ..util.deadline_scheduler import get_deadline_scheduler
+from ..util.output_capture import (
+    DEFAULT_HEAD_BYTES,
+    DEFAULT_TAIL_BYTES,
+    OutputCapture,
+)
+from ..util.output_stream import (
+    DEFAULT_STREAM_FLUSH_INTERVAL_SECONDS,
+    ShellOutputStreamer,
+    streamer_for_context,
+)
+from ..util.resource_limits import LimitedCommand, ResourceLimiter, ResourceLimits
+from ..util.resource_usage import ResourceMeter, ResourceUsage
+from ..util.session_state import session_key
+from ..util.shell_session import DEFAULT_SESSION_POOL_SIZE, ShellSessionPool
+from ..util.workspace_watcher import WorkspaceWatcher
+
 
 DEFAULT_COMMAND_TIMEOUT_SECONDS = 120.0
 DEFAULT_INACTIVITY_TIMEOUT_SECONDS = 20.0
-INACTIVITY_POLL_INTERVAL_SECONDS = 0.25
+DEFAULT_MAX_CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +62,10 @@ class _ProcessRunResult:
     exit_code: int | None
     timed_out: bool
     timeout_reason: str | None = None
+    stdout_total: int = 0
+    stderr_total: int = 0
+    resource_usage: ResourceUsage | None = None
+    limit_violation: str | None = None
 
 
 class ShellExecutor:
@@ -46,6 +80,24 @@ class ShellExecutor:
         force_non_interactive: bool | None = None,
         react_compiler_preference: str | None = None,
         inactivity_timeout: float | None = None,
+        persistent_sessions: bool | None = None,
+        session_pool_size: int | None = None,
+        output_head_bytes: int | None = None,
+        output_tail_bytes: int | None = None,
+        output_spill_dir: Path | None = None,
+        stream_output: bool | None = None,
+        stream_flush_interval: float | None = None,
+        parallel_commands: bool | None = None,
+        max_concurrency: int | None = None,
+        fail_fast: bool | None = None,
+        background_log_dir: Path | None = None,
+        background_log_max_bytes: int | None = None,
+        command_limits: ResourceLimits | None = None,
+        session_limits: ResourceLimits | None = None,
+        cache_read_only: bool | None = None,
+        result_cache_size: int | None = None,
+        result_cache_ttl: float | None = None,
+        workspace_watcher: WorkspaceWatcher | None = None,
     ):
         self.cwd = Path(cwd or Path.cwd())
         if default_timeout is None:
@@ -98,6 +150,144 @@ class ShellExecutor:
             inactivity_timeout = None
         self.inactivity_timeout = inactivity_timeout
 
+        if persistent_sessions is None:
+            persistent_sessions = (
+                os.environ.get("CODING_AGENT_SHELL_PERSISTENT_SESSIONS", "0") == "1"
+            )
+        self.persistent_sessions = persistent_sessions
+
+        if session_pool_size is None:
+            session_pool_size = _env_int("CODING_AGENT_SHELL_SESSION_POOL_SIZE")
+        if session_pool_size is None or session_pool_size <= 0:
+            session_pool_size = DEFAULT_SESSION_POOL_SIZE
+        # Resource caps: per-command and per-executor ("session") limits,
+        # enforced with cgroup v2 when available and setrlimit otherwise.
+        if command_limits is None:
+            command_limits = ResourceLimits(
+                memory_mb=_env_int("CODING_AGENT_SHELL_MEMORY_LIMIT_MB"),
+                cpu_seconds=_env_int("CODING_AGENT_SHELL_CPU_LIMIT_SECONDS"),
+                pids=_env_int("CODING_AGENT_SHELL_PIDS_LIMIT"),
+            )
+        if session_limits is None:
+            session_limits = ResourceLimits(
+                memory_mb=_env_int("CODING_AGENT_SHELL_SESSION_MEMORY_LIMIT_MB"),
+                pids=_env_int("CODING_AGENT_SHELL_SESSION_PIDS_LIMIT"),
+            )
+        self.resource_limiter = ResourceLimiter(command_limits, session_limits)
+
+        self.session_pool: ShellSessionPool | None = None
+        if self.persistent_sessions:
+            self.session_pool = ShellSessionPool(
+                self.cwd,
+                max_sessions=session_pool_size,
+                limits_factory=self._session_limits,
+            )
+
+        # Output capture keeps the head and tail of each stream and drops the
+        # middle, so a chatty command cannot grow worker memory without bound.
+        if output_head_bytes is None:
+            output_head_bytes = _env_int("CODING_AGENT_SHELL_OUTPUT_HEAD_BYTES")
+        if output_head_bytes is None or output_head_bytes < 0:
+            output_head_bytes = DEFAULT_HEAD_BYTES
+        self.output_head_bytes = output_head_bytes
+        if output_tail_bytes is None:
+            output_tail_bytes = _env_int("CODING_AGENT_SHELL_OUTPUT_TAIL_BYTES")
+        if output_tail_bytes is None or output_tail_bytes < 0:
+            output_tail_bytes = DEFAULT_TAIL_BYTES
+        self.output_tail_bytes = output_tail_bytes
+        if output_spill_dir is None:
+            env_spill_dir = os.environ.get("CODING_AGENT_SHELL_OUTPUT_SPILL_DIR")
+            if env_spill_dir:
+                output_spill_dir = Path(env_spill_dir)
+        self.output_spill_dir = output_spill_dir
+
+        if stream_output is None:
+            stream_output = (
+                os.environ.get("CODING_AGENT_SHELL_STREAM_OUTPUT", "1") == "1"
+            )
+        self.stream_output = stream_output
+        if stream_flush_interval is None:
+            env_interval = os.environ.get(
+                "CODING_AGENT_SHELL_STREAM_INTERVAL_SECONDS"
+            )
+            if env_interval:
+                try:
+                    stream_flush_interval = float(env_interval)
+                except ValueError:
+                    stream_flush_interval = None
+        if stream_flush_interval is None or stream_flush_interval < 0:
+            stream_flush_interval = DEFAULT_STREAM_FLUSH_INTERVAL_SECONDS
+        self.stream_flush_interval = stream_flush_interval
+
+        # Opt-in concurrent mode for independent commands in one request.
+        if parallel_commands is None:
+            parallel_commands = (
+                os.environ.get("CODING_AGENT_SHELL_PARALLEL_COMMANDS", "0") == "1"
+            )
+        self.parallel_commands = parallel_commands
+        if max_concurrency is None:
+            max_concurrency = _env_int("CODING_AGENT_SHELL_MAX_CONCURRENCY")
+        if max_concurrency is None or max_concurrency <= 0:
+            max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.max_concurrency = max_concurrency
+        if fail_fast is None:
+            fail_fast = os.environ.get("CODING_AGENT_SHELL_FAIL_FAST", "0") == "1"
+        self.fail_fast = fail_fast
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+        if background_log_dir is None:
+            env_log_dir = os.environ.get("CODING_AGENT_SHELL_BACKGROUND_LOG_DIR")
+            if env_log_dir:
+                background_log_dir = Path(env_log_dir)
+        if background_log_max_bytes is None:
+            background_log_max_bytes = _env_int(
+                "CODING_AGENT_SHELL_BACKGROUND_LOG_MAX_BYTES"
+            )
+        if background_log_max_bytes is None or background_log_max_bytes < 0:
+            background_log_max_bytes = DEFAULT_MAX_LOG_BYTES
+        # Finished jobs (and their logs) are forgotten after this many seconds.
+        background_retention = _env_int("CODING_AGENT_SHELL_BACKGROUND_RETENTION_SECONDS")
+        if background_retention is None or background_retention < 0:
+            background_retention = DEFAULT_FINISHED_RETENTION_SECONDS
+        self.background_jobs = BackgroundProcessRegistry(
+            log_dir=background_log_dir,
+            max_log_bytes=background_log_max_bytes,
+            retention_seconds=background_retention,
+        )
+
+        # Opt-in result cache for read-only commands (ls, cat, git status, ...).
+        if cache_read_only is None:
+            cache_read_only = (
+                os.environ.get("CODING_AGENT_SHELL_RESULT_CACHE", "0") == "1"
+            )
+        if result_cache_size is None:
+            result_cache_size = _env_int("CODING_AGENT_SHELL_RESULT_CACHE_SIZE")
+        if result_cache_size is None or result_cache_size < 0:
+            result_cache_size = DEFAULT_RESULT_CACHE_SIZE
+        if result_cache_ttl is None:
+            env_ttl = os.environ.get("CODING_AGENT_SHELL_RESULT_CACHE_TTL_SECONDS")
+            if env_ttl:
+                try:
+                    result_cache_ttl = float(env_ttl)
+                except ValueError:
+                    result_cache_ttl = None
+        if result_cache_ttl is None or result_cache_ttl < 0:
+            result_cache_ttl = DEFAULT_RESULT_CACHE_TTL_SECONDS
+        self.result_cache: CommandResultCache | None = None
+        # Pooled sessions keep per-shell state (cwd, variables) that the cache
+        # key cannot see, so caching is limited to one-shot subprocesses.
+        if cache_read_only and not self.persistent_sessions:
+            self.result_cache = CommandResultCache(
+                max_entries=result_cache_size, ttl_seconds=result_cache_ttl
+            )
+
+        # Change feed of the workspace. Edits made outside the agent (editor,
+        # dev servers) also invalidate cached read-only results through it.
+        self.workspace_watcher = workspace_watcher
+        if workspace_watcher is not None:
+            workspace_watcher.subscribe(lambda events: bump_workspace_generation())
+
         if self.force_non_interactive:
             # Encourage common CLIs (npm, npx, yarn, pnpm, etc.) to auto-select defaults and
             # skip prompts by setting environment variables they respect.
@@ -108,70 +298,231 @@ class ShellExecutor:
             self.env_overrides.setdefault("YARN_ENABLE_IMMUTABLE_INSTALLS", "false")
             self.env_overrides.setdefault("SKIP_PROMPTS", "1")
 
-    async def __call__(self, request: ShellCommandRequest) -> ShellResult:
+    async def __call__(
+        self, request: ShellCommandRequest, bypass_cache: bool = False
+    ) -> ShellResult:
+        """
+        Run every command of the request. ``bypass_cache`` forces read-only
+        commands to run even when a cached result is still valid; the agent
+        gets the same per command by prefixing it with
+        ``CODING_AGENT_SHELL_CACHE=0``, and the whole process by setting that
+        variable in its environment.
+        """
         action = request.data.action
+        self.background_jobs.maintain()
+        if self.workspace_watcher is not None:
+            self.workspace_watcher.start()
 
-        outputs: list[ShellCommandOutput] = []
-        for command in action.commands:
-            env = os.environ.copy()
-            env.update(self.env_overrides)
-            prepared_command = self._prepare_command(command)
-
-            if self._requires_background(prepared_command):
-                if not self._is_backgrounded(prepared_command):
-                    message = (
-                        "Command appears to start a long-running dev server or watcher. "
-                        "Always run such commands in the background by appending ' &' "
-                        "(for example 'npm run dev &' or 'uvicorn app:app --reload &')."
-                    )
-                    outputs.append(
-                        ShellCommandOutput(
-                            command=prepared_command,
-                            stdout="",
-                            stderr=message,
-                            outcome=ShellCallOutcome(type="exit", exit_code=1),
-                        )
-                    )
-                    continue
-                outputs.append(
-                    await self._spawn_detached_background(prepared_command, env)
-                )
-                continue
+        if self.parallel_commands and len(action.commands) > 1:
+            outputs = await self._run_commands_concurrently(request, bypass_cache)
+        else:
+            outputs = []
+            for index, command in enumerate(action.commands):
+                output = await self._run_command(request, index, command, bypass_cache)
+                outputs.append(output)
+                if output.outcome.type == "timeout":
+                    break
+                if self.fail_fast and output.outcome.exit_code != 0:
+                    break
+
+        return ShellResult(
+            output=outputs,
+            provider_data={"working_directory": str(self.cwd)},
+        )
 
-            timeout = None
-            if action.timeout_ms is not None:
-                timeout = max(action.timeout_ms / 1000, 0)
-            elif self.default_timeout is not None:
-                timeout = self.default_timeout
+    async def _run_commands_concurrently(
+        self, request: ShellCommandRequest, bypass_cache: bool = False
+    ) -> list[ShellCommandOutput]:
+        """
+        Run every command of the request concurrently, bounded by the
+        executor-wide semaphore, and return the outputs in input order.
+        """
+        semaphore = self._concurrency_semaphore()
+        commands = request.data.action.commands
+        outputs: list[ShellCommandOutput | None] = [None] * len(commands)
+
+        async def _run(index: int, command: str) -> ShellCommandOutput:
+            async with semaphore:
+                output = await self._run_command(request, index, command, bypass_cache)
+            outputs[index] = output
+            return output
+
+        tasks = [
+            asyncio.create_task(_run(index, command))
+            for index, command in enumerate(commands)
+        ]
+        try:
+            if self.fail_fast:
+                for finished in asyncio.as_completed(tasks):
+                    output = await finished
+                    if (
+                        output.outcome.type == "timeout"
+                        or output.outcome.exit_code != 0
+                    ):
+                        break
+            else:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return [
+            output
+            if output is not None
+            else ShellCommandOutput(
+                command=command,
+                stdout="",
+                stderr="Command cancelled because another command in the batch failed.",
+                outcome=ShellCallOutcome(type="exit", exit_code=None),
+            )
+            for command, output in zip(commands, outputs)
+        ]
+
+    def _concurrency_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _run_command(
+        self,
+        request: ShellCommandRequest,
+        index: int,
+        command: str,
+        bypass_cache: bool = False,
+    ) -> ShellCommandOutput:
+        action = request.data.action
+        env = self._build_env()
+        prepared_command = self._prepare_command(command)
+
+        cacheable = False
+        if self.result_cache is not None:
+            # A bypassed read still runs, and its fresh result replaces the cached one.
+            cache_key, forced = split_cache_bypass(prepared_command)
+            bypass_cache = (
+                bypass_cache or forced or os.environ.get("CODING_AGENT_SHELL_CACHE") == "0"
+            )
+            cacheable = parse_read_only_command(cache_key) is not None
+            if not cacheable:
+                # The command may write to the workspace: drop cached reads.
+                bump_workspace_generation()
+            elif not bypass_cache:
+                # Record outside edits the watcher thread has not drained yet,
+                # so a hit is never older than the latest change on disk.
+                watcher = self.workspace_watcher
+                if watcher is not None and watcher.running:
+                    if watcher.backend == "poll":
+                        await asyncio.to_thread(watcher.sync)
+                    else:
+                        watcher.sync()
+                cached = self.result_cache.lookup(cache_key, self.cwd)
+                if cached is not None:
+                    return ShellCommandOutput(
+                        command=prepared_command,
+                        stdout=cached.stdout,
+                        stderr=cached.stderr,
+                        outcome=ShellCallOutcome(
+                            type="exit", exit_code=cached.exit_code
+                        ),
+                        provider_data={"result_cache": "hit"},
+                    )
 
-            result = await self._execute_with_watchdogs(
-                prepared_command,
-                env,
-                timeout,
+        streamer: ShellOutputStreamer | None = None
+        if self.stream_output:
+            streamer = streamer_for_context(
+                request.ctx_wrapper,
+                request.data.call_id,
+                flush_interval=self.stream_flush_interval,
             )
+            if streamer is not None:
+                streamer.begin_command(prepared_command, index)
 
-            stdout = result.stdout.decode("utf-8", errors="ignore")
-            stderr = result.stderr.decode("utf-8", errors="ignore")
-            outputs.append(
-                ShellCommandOutput(
+        if self._requires_background(prepared_command):
+            if not self._is_backgrounded(prepared_command):
+                message = (
+                    "Command appears to start a long-running dev server or watcher. "
+                    "Always run such commands in the background by appending ' &' "
+                    "(for example 'npm run dev &' or 'uvicorn app:app --reload &')."
+                )
+                return ShellCommandOutput(
                     command=prepared_command,
-                    stdout=stdout,
-                    stderr=stderr,
-                    outcome=ShellCallOutcome(
-                        type="timeout" if result.timed_out else "exit",
-                        exit_code=result.exit_code,
-                    ),
+                    stdout="",
+                    stderr=message,
+                    outcome=ShellCallOutcome(type="exit", exit_code=1),
                 )
+            return await self._spawn_detached_background(
+                prepared_command, env, request
             )
 
-            if result.timed_out:
-                break
+        timeout = None
+        if action.timeout_ms is not None:
+            timeout = max(action.timeout_ms / 1000, 0)
+        elif self.default_timeout is not None:
+            timeout = self.default_timeout
+
+        result = await self._execute_with_watchdogs(
+            prepared_command,
+            env,
+            timeout,
+            streamer,
+        )
 
-        return ShellResult(
-            output=outputs,
-            provider_data={"working_directory": str(self.cwd)},
+        stdout = result.stdout.decode("utf-8", errors="ignore")
+        stderr = result.stderr.decode("utf-8", errors="ignore")
+        provider_data = None
+        if result.resource_usage is not None:
+            provider_data = {"resource_usage": result.resource_usage.as_dict()}
+            logger.debug(
+                "Command '%s' resource usage: %s.", prepared_command, provider_data
+            )
+        if result.limit_violation is not None:
+            provider_data = provider_data or {}
+            provider_data["limit_violation"] = result.limit_violation
+
+        if self.result_cache is not None:
+            if not cacheable:
+                # Also invalidate reads that ran while this command was writing.
+                bump_workspace_generation()
+            elif (
+                not result.timed_out
+                and result.exit_code == 0
+                and result.stdout_total == len(result.stdout)
+                and result.stderr_total == len(result.stderr)
+            ):
+                self.result_cache.store(
+                    cache_key, self.cwd, stdout, stderr, result.exit_code
+                )
+        return ShellCommandOutput(
+            command=prepared_command,
+            stdout=stdout,
+            stderr=stderr,
+            outcome=ShellCallOutcome(
+                type="timeout" if result.timed_out else "exit",
+                exit_code=result.exit_code,
+            ),
+            provider_data=provider_data,
         )
 
+    async def aclose(self) -> None:
+        """Terminate pooled shell sessions and background jobs owned by this executor."""
+        if self.session_pool is not None:
+            await self.session_pool.aclose()
+        await self.background_jobs.stop_all()
+        self.resource_limiter.close()
+
+    def _session_limits(self) -> LimitedCommand | None:
+        if not self.resource_limiter.enabled:
+            return None
+        return self.resource_limiter.limit_shell("session")
+
+    def _build_env(self) -> dict[str, str]:
+        env = os.environ.copy()
+        env.update(self.env_overrides)
+        return env
+
     _YES_FLAG_PATTERNS = (
         r"\bnpm\s+init\b",
         r"\bnpm\s+create\b",
@@ -254,17 +605,42 @@ class ShellExecutor:
     def _has_yes_flag(self, command_lower: str) -> bool:
         return " --yes" in command_lower or " -y" in command_lower
 
+    _COMMAND_TAG_NEEDS_YES = "needs-yes"
+    _COMMAND_TAG_AUTO_CONFIRM = "auto-confirm"
+    _COMMAND_TAG_SCAFFOLD_VITE = "scaffold-vite"
+    _COMMAND_TAG_DEV_SERVER = "dev-server"
+
+    @classmethod
+    def _command_classifier(cls) -> CommandClassifier:
+        """Build the pattern classifier once per class (subclasses get their own)."""
+        classifier = cls.__dict__.get("_classifier")
+        if classifier is None:
+            classifier = CommandClassifier(
+                {
+                    cls._COMMAND_TAG_NEEDS_YES: cls._YES_FLAG_PATTERNS,
+                    cls._COMMAND_TAG_AUTO_CONFIRM: cls._AUTO_CONFIRM_PATTERNS,
+                    cls._COMMAND_TAG_SCAFFOLD_VITE: cls._VITE_CREATE_PATTERNS,
+                    cls._COMMAND_TAG_DEV_SERVER: cls._DEV_SERVER_PATTERNS,
+                }
+            )
+            cls._classifier = classifier
+        return classifier
+
+    def _classify(self, command: str) -> CommandClassification:
+        return self._command_classifier().classify(command)
+
     def _prepare_command(self, command: str) -> str:
         prepared = command.strip()
         lower = prepared.lower()
 
         if self.force_non_interactive:
+            # Flags and the 'yes |' prefix added below never change which
+            # scaffold patterns match, so the original command is classified once.
+            classification = self._classify(prepared)
             if not self._has_yes_flag(lower):
-                for pattern in self._YES_FLAG_PATTERNS:
-                    if re.search(pattern, lower):
-                        prepared = self._append_flag(prepared, "--yes")
-                        lower = prepared.lower()
-                        break
+                if classification.has(self._COMMAND_TAG_NEEDS_YES):
+                    prepared = self._append_flag(prepared, "--yes")
+                    lower = prepared.lower()
 
             if "create-next-app" in lower and "--use-react-compiler" not in lower and "--no-use-react-compiler" not in lower:
                 compiler_flag = (
@@ -272,14 +648,10 @@ class ShellExecutor:
                 )
                 prepared = self._append_flag(prepared, compiler_flag)
 
-            prepared = self._auto_confirm_interactive(prepared, lower)
-            lower = prepared.lower()
-            for pattern in self._VITE_CREATE_PATTERNS:
-                if re.search(pattern, lower):
-                    prepared = self._ensure_subcommand_flag(prepared, "--no-rolldown")
-                    prepared = self._ensure_subcommand_flag(prepared, "--no-interactive")
-                    lower = prepared.lower()
-                    break
+            prepared = self._auto_confirm_interactive(prepared, classification)
+            if classification.has(self._COMMAND_TAG_SCAFFOLD_VITE):
+                prepared = self._ensure_subcommand_flag(prepared, "--no-rolldown")
+                prepared = self._ensure_subcommand_flag(prepared, "--no-interactive")
 
         if self.force_non_interactive and self._requires_background(prepared):
             if self._is_backgrounded(prepared):
@@ -301,9 +673,10 @@ class ShellExecutor:
                 if body.endswith("&"):
                     body = body[:-1].rstrip()
 
+                # Stay in the spawning process group (no setsid) and keep the
+                # inherited stdout/stderr so the registry can log and stop it.
                 detached = (
-                    "(trap '' HUP; setsid sh -c "
-                    f"{shlex.quote(body)} >/dev/null 2>&1 &) && echo $!"
+                    f"(trap '' HUP; exec sh -c {shlex.quote(body)}) & echo $!"
                 )
                 detached_parts.append(detached)
             else:
@@ -312,30 +685,23 @@ class ShellExecutor:
         return " && ".join(detached_parts)
 
     async def _spawn_detached_background(
-        self, command: str, env: dict[str, str]
+        self, command: str, env: dict[str, str], request: ShellCommandRequest
     ) -> ShellCommandOutput:
-        proc = await asyncio.create_subprocess_shell(
-            command,
-            cwd=self.cwd,
-            env=env,
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL,
-            start_new_session=True,
-        )
-        asyncio.create_task(self._reap_background_process(proc))
+        # Jobs belong to the conversation that started them.
+        owner = session_key(request.ctx_wrapper, self.background_jobs)
+        job = await self.background_jobs.spawn(command, self.cwd, env, owner)
         return ShellCommandOutput(
             command=command,
-            stdout=f"Detached background command (pid={proc.pid}).",
+            stdout=(
+                f"Detached background command (job={job.job_id}, pid={job.pid}). "
+                f"Output is logged to {job.log_path}."
+            ),
             stderr="",
             outcome=ShellCallOutcome(type="exit", exit_code=0),
         )
 
     def _requires_background(self, command: str) -> bool:
-        normalized = command.strip().lower()
-        for pattern in self._DEV_SERVER_PATTERNS:
-            if re.search(pattern, normalized):
-                return True
-        return False
+        return self._classify(command).has(self._COMMAND_TAG_DEV_SERVER)
 
     def _is_backgrounded(self, command: str) -> bool:
         stripped = command.rstrip()
@@ -364,12 +730,13 @@ class ShellExecutor:
                 return True
         return False
 
-    def _auto_confirm_interactive(self, command: str, command_lower: str) -> str:
+    def _auto_confirm_interactive(
+        self, command: str, classification: CommandClassification
+    ) -> str:
         if self._starts_with_yes_pipe(command):
             return command
-        for pattern in self._AUTO_CONFIRM_PATTERNS:
-            if re.search(pattern, command_lower):
-                return f"yes | {command}"
+        if classification.has(self._COMMAND_TAG_AUTO_CONFIRM):
+            return f"yes | {command}"
         return command
 
     def _starts_with_yes_pipe(self, command: str) -> bool:
@@ -377,95 +744,175 @@ class ShellExecutor:
         return stripped.startswith("yes |")
 
     async def _execute_with_watchdogs(
-        self, command: str, env: dict[str, str], timeout: float | None
+        self,
+        command: str,
+        env: dict[str, str],
+        timeout: float | None,
+        streamer: ShellOutputStreamer | None = None,
     ) -> _ProcessRunResult:
-        proc = await asyncio.create_subprocess_shell(
-            command,
-            cwd=self.cwd,
-            env=env,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+        limited: LimitedCommand | None = None
+        if self.resource_limiter.enabled and self.session_pool is None:
+            # Pooled sessions are limited when they are spawned.
+            limited = self.resource_limiter.limit_command()
+        meter = ResourceMeter(reaped_by_us=self.session_pool is None)
+        try:
+            if self.session_pool is not None:
+                result = await self._execute_in_session(
+                    self.session_pool, command, env, timeout, streamer
+                )
+            else:
+                proc = await asyncio.create_subprocess_shell(
+                    command,
+                    cwd=self.cwd,
+                    env=env,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    preexec_fn=limited.preexec_fn if limited else None,
+                )
+                result = await self._monitor_process(
+                    proc, command, timeout, streamer
+                )
+        except BaseException:
+            meter.close()
+            if limited is not None:
+                limited.cleanup()
+            raise
+        result.resource_usage = meter.stop(result.stdout_total, result.stderr_total)
+
+        if limited is not None:
+            usage = result.resource_usage
+            cpu_seconds = None
+            if usage.user_cpu_seconds is not None and usage.system_cpu_seconds is not None:
+                cpu_seconds = usage.user_cpu_seconds + usage.system_cpu_seconds
+            self._record_limit_violation(command, result, limited, cpu_seconds)
+            limited.cleanup()
+        return result
+
+    def _record_limit_violation(
+        self,
+        command: str,
+        result: _ProcessRunResult,
+        limited: LimitedCommand,
+        cpu_seconds: float | None = None,
+    ) -> None:
+        violation = limited.violation(
+            result.exit_code, result.timed_out, result.stderr, cpu_seconds
         )
-        return await self._monitor_process(proc, command, timeout)
+        if violation:
+            logger.warning("Command '%s' hit a resource limit: %s", command, violation)
+            result.limit_violation = violation
+            encoded = violation.encode("utf-8")
+            result.stderr = result.stderr + b"\n" + encoded if result.stderr else encoded
+
+    async def _execute_in_session(
+        self,
+        pool: ShellSessionPool,
+        command: str,
+        env: dict[str, str],
+        timeout: float | None,
+        streamer: ShellOutputStreamer | None = None,
+    ) -> _ProcessRunResult:
+        """Run ``command`` inside a warm pooled shell instead of a fresh /bin/sh."""
+        session = await pool.acquire(env)
+        if session.limits is not None:
+            session.limits.mark()
+        try:
+            proc = await session.start(command)
+            result = await self._monitor_process(proc, command, timeout, streamer)
+            if session.limits is not None:
+                # Read the shell's cgroup before release may kill the shell.
+                self._record_limit_violation(command, result, session.limits)
+            return result
+        finally:
+            pool.release(session)
 
     async def _monitor_process(
         self,
         proc: asyncio.subprocess.Process,
         command: str,
         timeout: float | None,
+        streamer: ShellOutputStreamer | None = None,
     ) -> _ProcessRunResult:
-        stdout_chunks: list[bytes] = []
-        stderr_chunks: list[bytes] = []
-        last_activity = time.monotonic()
+        stdout_capture = self._new_capture("stdout")
+        stderr_capture = self._new_capture("stderr")
+
+        # Timeouts are deadlines on the loop-wide scheduler rather than
+        # per-command sleeping tasks; output re-arms the inactivity deadline.
+        scheduler = get_deadline_scheduler()
+        expired: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+
+        def expire(reason: str) -> Callable[[], None]:
+            def _callback() -> None:
+                if not expired.done():
+                    expired.set_result(reason)
+
+            return _callback
+
+        timeout_deadline = None
+        if timeout is not None:
+            timeout_deadline = scheduler.call_later(timeout, expire("duration"))
+        inactivity_deadline = None
+        if self.inactivity_timeout is not None:
+            inactivity_deadline = scheduler.call_later(
+                self.inactivity_timeout, expire("inactivity")
+            )
 
         def mark_activity() -> None:
-            nonlocal last_activity
-            last_activity = time.monotonic()
+            if inactivity_deadline is not None:
+                inactivity_deadline.rearm(
+                    scheduler.time() + self.inactivity_timeout
+                )
 
         stdout_task = asyncio.create_task(
-            self._pump_stream(proc.stdout, stdout_chunks, mark_activity)
+            self._pump_stream(
+                proc.stdout, stdout_capture, mark_activity, streamer, "stdout"
+            )
         )
         stderr_task = asyncio.create_task(
-            self._pump_stream(proc.stderr, stderr_chunks, mark_activity)
+            self._pump_stream(
+                proc.stderr, stderr_capture, mark_activity, streamer, "stderr"
+            )
         )
 
         wait_task = asyncio.create_task(proc.wait())
-        timeout_task: asyncio.Task[None] | None = None
-        if timeout is not None:
-            timeout_task = asyncio.create_task(asyncio.sleep(timeout))
-
-        inactivity_task: asyncio.Task[bool] | None = None
-        if self.inactivity_timeout is not None:
-            async def _watch_inactivity() -> bool:
-                while True:
-                    await asyncio.sleep(INACTIVITY_POLL_INTERVAL_SECONDS)
-                    if (
-                        time.monotonic() - last_activity
-                        > self.inactivity_timeout
-                    ):
-                        return True
-
-            inactivity_task = asyncio.create_task(_watch_inactivity())
 
         timed_out = False
         inactivity_triggered = False
         background_detached = False
 
-        while True:
-            pending: set[asyncio.Task[object]] = {wait_task}
-            if timeout_task is not None:
-                pending.add(timeout_task)
-            if inactivity_task is not None:
-                pending.add(inactivity_task)
-
+        try:
             done, _ = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
+                {wait_task, expired}, return_when=asyncio.FIRST_COMPLETED
             )
-
-            if wait_task in done:
-                break
-
-            if timeout_task and timeout_task in done:
+        except asyncio.CancelledError:
+            # Cancelled by a fail-fast batch: do not leave the process behind.
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+            for deadline in (timeout_deadline, inactivity_deadline):
+                if deadline is not None:
+                    deadline.cancel()
+            await asyncio.gather(wait_task, return_exceptions=True)
+            for task in (stdout_task, stderr_task):
+                task.cancel()
+            await asyncio.gather(stdout_task, stderr_task, return_exceptions=True)
+            raise
+        if wait_task not in done:
+            if expired.result() == "duration":
                 timed_out = True
                 if self.background_on_timeout:
                     background_detached = True
-                    break
-                proc.kill()
-                await wait_task
-                break
-
-            if inactivity_task and inactivity_task in done:
+                else:
+                    proc.kill()
+                    await wait_task
+            else:
                 inactivity_triggered = True
                 proc.kill()
                 await wait_task
-                break
 
-        for task in (timeout_task, inactivity_task):
-            if task is not None and not task.done():
-                task.cancel()
-            if task is not None:
-                with contextlib.suppress(asyncio.CancelledError):
-                    await task
+        for deadline in (timeout_deadline, inactivity_deadline):
+            if deadline is not None:
+                deadline.cancel()
+        expired.cancel()
 
         if background_detached and not wait_task.done():
             wait_task.cancel()
@@ -481,12 +928,19 @@ class ShellExecutor:
                 with contextlib.suppress(asyncio.CancelledError):
                     await task
             stdout_bytes = b""
-            stderr_bytes = b"".join(stderr_chunks)
+            stdout_capture.close()
+            stderr_capture.close()
+            stderr_bytes = stderr_capture.getvalue()
         else:
             await stdout_task
             await stderr_task
-            stdout_bytes = b"".join(stdout_chunks)
-            stderr_bytes = b"".join(stderr_chunks)
+            stdout_capture.close()
+            stderr_capture.close()
+            stdout_bytes = stdout_capture.getvalue()
+            stderr_bytes = stderr_capture.getvalue()
+
+        if streamer is not None:
+            streamer.flush()
 
         exit_code = proc.returncode
         message: str | None = None
@@ -543,13 +997,17 @@ class ShellExecutor:
             exit_code=exit_code,
             timed_out=timed_out_event,
             timeout_reason=timeout_reason,
+            stdout_total=stdout_capture.total_bytes,
+            stderr_total=stderr_capture.total_bytes,
         )
 
     async def _pump_stream(
         self,
         stream: asyncio.StreamReader | None,
-        container: list[bytes],
+        capture: OutputCapture,
         mark_activity: Callable[[], None],
+        streamer: ShellOutputStreamer | None = None,
+        stream_name: str = "stdout",
     ) -> None:
         if stream is None:
             return
@@ -557,8 +1015,18 @@ class ShellExecutor:
             chunk = await stream.read(4096)
             if not chunk:
                 break
-            container.append(chunk)
+            capture.append(chunk)
             mark_activity()
+            if streamer is not None:
+                streamer.feed(stream_name, chunk)
+
+    def _new_capture(self, label: str) -> OutputCapture:
+        return OutputCapture(
+            head_bytes=self.output_head_bytes,
+            tail_bytes=self.output_tail_bytes,
+            spill_dir=self.output_spill_dir,
+            label=label,
+        )
 
     async def _reap_background_process(
         self, proc: asyncio.subprocess.Process
@@ -575,5 +1043,20 @@ class ShellExecutor:
                 "Failed to reap background process (pid=%s).", proc.pid
             )
 
+def _env_int(name: str) -> int | None:
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
 workspace_path = Path("./mnt").resolve()
-shell_tool = ShellTool(executor=ShellExecutor(cwd=workspace_path))
\ No newline at end of file
+# Started on the first shell command; "off", "poll" or "inotify" override "auto".
+workspace_watcher = WorkspaceWatcher(
+    workspace_path, backend=os.environ.get("CODING_AGENT_WORKSPACE_WATCHER", "auto")
+)
+shell_executor = ShellExecutor(cwd=workspace_path, workspace_watcher=workspace_watcher)
+shell_tool = ShellTool(executor=shell_executor)
\ No newline at end of file
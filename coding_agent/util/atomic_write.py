@@ -0,0 +1,97 @@
+import contextlib
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from typing import BinaryIO
+
+
+DURABILITY_NONE = "none"
+DURABILITY_FDATASYNC = "fdatasync"
+DURABILITY_FULL = "full"
+DURABILITY_LEVELS = (DURABILITY_NONE, DURABILITY_FDATASYNC, DURABILITY_FULL)
+DEFAULT_DURABILITY = DURABILITY_FDATASYNC
+
+
+def normalize_durability(value: str | None) -> str:
+    value = (value or "").strip().lower()
+    return value if value in DURABILITY_LEVELS else DEFAULT_DURABILITY
+
+
+def atomic_write_bytes(
+    target: Path, data: bytes, durability: str = DEFAULT_DURABILITY
+) -> None:
+    atomic_write_stream(target, lambda handle: handle.write(data), durability)
+
+
+def atomic_write_stream(
+    target: Path,
+    write: Callable[[BinaryIO], object],
+    durability: str = DEFAULT_DURABILITY,
+) -> None:
+    """
+    Replace ``target`` with what ``write`` produces so readers see either the
+    old or the new content, never a truncated file.
+
+    ``write`` fills a temporary file in the same directory, which is then
+    renamed over the target. ``durability`` controls syncing: ``none`` relies on the
+    page cache, ``fdatasync`` flushes the file before the rename, and ``full``
+    additionally fsyncs the directory so the rename itself survives a crash.
+    Existing permission bits are preserved.
+    """
+    target = Path(target)
+    try:
+        mode = target.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = None
+
+    fd, temp_name = tempfile.mkstemp(
+        prefix=f".{target.name}.", suffix=".tmp", dir=target.parent
+    )
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            write(handle)
+            handle.flush()
+            if durability != DURABILITY_NONE:
+                _fdatasync(handle.fileno())
+        if mode is not None:
+            os.chmod(temp_name, mode)
+        else:
+            os.chmod(temp_name, 0o666 & ~_umask())
+        os.replace(temp_name, target)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_name)
+        raise
+    if durability == DURABILITY_FULL:
+        fsync_directory(target.parent)
+
+
+def atomic_delete(target: Path, durability: str = DEFAULT_DURABILITY) -> None:
+    Path(target).unlink(missing_ok=True)
+    if durability == DURABILITY_FULL:
+        fsync_directory(Path(target).parent)
+
+
+def fsync_directory(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        with contextlib.suppress(OSError):
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fdatasync(fd: int) -> None:
+    # macOS has no fdatasync; fsync is the closest equivalent.
+    sync = getattr(os, "fdatasync", os.fsync)
+    sync(fd)
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
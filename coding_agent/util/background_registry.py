@@ -0,0 +1,306 @@
+import asyncio
+import atexit
+import contextlib
+import itertools
+import logging
+import os
+import re
+import signal
+import tempfile
+import time
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+DEFAULT_MAX_LOG_BYTES = 2 * 1024 * 1024
+DEFAULT_STOP_GRACE_SECONDS = 3.0
+DEFAULT_PORT_PROBE_TIMEOUT_SECONDS = 0.5
+DEFAULT_FINISHED_RETENTION_SECONDS = 10 * 60
+DEFAULT_MAINTAIN_INTERVAL_SECONDS = 5.0
+
+_PORT_PATTERN = re.compile(r"(?:--port[ =]|-p\s+|\bport=)(\d{2,5})\b", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class BackgroundJob:
+    job_id: str
+    pid: int
+    command: str
+    cwd: str
+    started_at: float
+    log_path: Path
+    ports: list[int] = field(default_factory=list)
+    # Conversation that started the job (see ``session_key``); None = shared.
+    owner: Hashable | None = None
+    exit_code: int | None = None
+    stopped: bool = False
+    # When the registry first saw the process group gone.
+    finished_at: float | None = None
+    process: asyncio.subprocess.Process | None = field(default=None, repr=False)
+
+    @property
+    def running(self) -> bool:
+        # The launching shell usually exits right away; the job is alive for
+        # as long as anything in its process group is.
+        return _process_group_alive(self.pid)
+
+    def describe(self) -> str:
+        status = "running" if self.running else "exited"
+        uptime = int(time.time() - self.started_at)
+        ports = ",".join(str(port) for port in self.ports) or "-"
+        return (
+            f"{self.job_id} pid={self.pid} status={status} uptime={uptime}s "
+            f"ports={ports} log={self.log_path} command={self.command}"
+        )
+
+
+class BackgroundProcessRegistry:
+    """
+    Tracks background commands (dev servers, watchers) started by the shell.
+
+    Each job runs as the leader of its own process group with stdout/stderr
+    appended to a per-job log file, so it can be listed, tailed, port-probed
+    and stopped as a unit. Jobs belong to the conversation (``owner``) that
+    started them; lookups with an owner never see other conversations' jobs,
+    and a conversation's jobs are killed once its thread manager is garbage
+    collected. While jobs exist, a timer task runs :meth:`maintain` every
+    ``maintain_interval`` seconds: logs are rolled (copy + truncate) once they
+    exceed ``max_log_bytes``, and jobs that finished more than
+    ``retention_seconds`` ago are forgotten and their logs deleted. Process
+    groups still alive at interpreter exit are killed so dev servers do not
+    outlive the worker.
+    """
+
+    def __init__(
+        self,
+        log_dir: Path | None = None,
+        max_log_bytes: int = DEFAULT_MAX_LOG_BYTES,
+        retention_seconds: float = DEFAULT_FINISHED_RETENTION_SECONDS,
+        maintain_interval: float = DEFAULT_MAINTAIN_INTERVAL_SECONDS,
+    ) -> None:
+        self.log_dir = Path(
+            log_dir or Path(tempfile.gettempdir()) / "coding-agent-background"
+        )
+        self.max_log_bytes = max(max_log_bytes, 0)
+        self.retention_seconds = retention_seconds
+        self.maintain_interval = maintain_interval
+        self._jobs: dict[str, BackgroundJob] = {}
+        self._ids = itertools.count(1)
+        self._maintainer: asyncio.Task | None = None
+        atexit.register(self._kill_all_sync)
+
+    async def spawn(
+        self,
+        command: str,
+        cwd: Path,
+        env: dict[str, str],
+        owner: Hashable | None = None,
+    ) -> BackgroundJob:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        job_id = f"bg-{next(self._ids)}"
+        log_path = self.log_dir / f"{job_id}-{os.getpid()}.log"
+        with open(log_path, "ab") as log_file:
+            process = await asyncio.create_subprocess_shell(
+                command,
+                cwd=cwd,
+                env=env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=log_file,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=True,
+            )
+        job = BackgroundJob(
+            job_id=job_id,
+            pid=process.pid,
+            command=command,
+            cwd=str(cwd),
+            started_at=time.time(),
+            log_path=log_path,
+            ports=[int(port) for port in _PORT_PATTERN.findall(command)],
+            owner=owner,
+            process=process,
+        )
+        self._jobs[job_id] = job
+        asyncio.create_task(self._reap(job))
+        self._start_maintainer()
+        return job
+
+    def get(self, job_id: str, owner: Hashable | None = None) -> BackgroundJob | None:
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def list_jobs(self, owner: Hashable | None = None) -> list[BackgroundJob]:
+        self.maintain()
+        return [
+            job for job in self._jobs.values() if owner is None or job.owner == owner
+        ]
+
+    def tail(self, job_id: str, lines: int = 50, owner: Hashable | None = None) -> str:
+        job = self._require(job_id, owner)
+        self.maintain()
+        return _tail_file(job.log_path, lines)
+
+    async def stop(
+        self,
+        job_id: str,
+        grace_seconds: float = DEFAULT_STOP_GRACE_SECONDS,
+        owner: Hashable | None = None,
+    ) -> BackgroundJob:
+        """Send SIGTERM to the job's process group, then SIGKILL after a grace period."""
+        job = self._require(job_id, owner)
+        job.stopped = True
+        if not _process_group_alive(job.pid):
+            return job
+        _signal_group(job.pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace_seconds
+        while _process_group_alive(job.pid) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if _process_group_alive(job.pid):
+            _signal_group(job.pid, signal.SIGKILL)
+        return job
+
+    async def stop_all(self) -> None:
+        for job in list(self._jobs.values()):
+            if job.running:
+                await self.stop(job.job_id)
+
+    async def probe_port(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        timeout: float = DEFAULT_PORT_PROBE_TIMEOUT_SECONDS,
+    ) -> bool:
+        """Return True when something accepts TCP connections on ``host:port``."""
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        with contextlib.suppress(OSError):
+            await writer.wait_closed()
+        return True
+
+    def __contains__(self, owner: Hashable) -> bool:
+        return any(job.owner == owner for job in list(self._jobs.values()))
+
+    def discard(self, owner: Hashable) -> None:
+        """Kill and forget the jobs of a conversation that no longer exists."""
+        for job in [job for job in self._jobs.values() if job.owner == owner]:
+            if _process_group_alive(job.pid):
+                _signal_group(job.pid, signal.SIGKILL)
+            self._forget(job)
+
+    def maintain(self) -> None:
+        """
+        Roll oversized job logs (copy the tail aside, then truncate in place)
+        and forget jobs that finished more than ``retention_seconds`` ago.
+        """
+        now = time.time()
+        for job in list(self._jobs.values()):
+            if job.running:
+                continue
+            if job.finished_at is None:
+                job.finished_at = now
+            elif now - job.finished_at > self.retention_seconds:
+                self._forget(job)
+        if not self.max_log_bytes:
+            return
+        for job in list(self._jobs.values()):
+            try:
+                size = job.log_path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size <= self.max_log_bytes:
+                continue
+            rolled = job.log_path.with_suffix(".log.1")
+            with open(job.log_path, "rb") as source:
+                source.seek(max(size - self.max_log_bytes, 0))
+                rolled.write_bytes(source.read())
+            # The job writes with O_APPEND, so it continues at the new end.
+            os.truncate(job.log_path, 0)
+
+    def _require(self, job_id: str, owner: Hashable | None = None) -> BackgroundJob:
+        job = self.get(job_id, owner)
+        if job is None:
+            raise KeyError(f"Unknown background job: {job_id}")
+        return job
+
+    def _forget(self, job: BackgroundJob) -> None:
+        self._jobs.pop(job.job_id, None)
+        for path in (job.log_path, job.log_path.with_suffix(".log.1")):
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+    def _start_maintainer(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = self._maintainer
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._maintainer = loop.create_task(self._maintain_periodically())
+
+    async def _maintain_periodically(self) -> None:
+        # Runs while jobs exist, so logs stay bounded between tool calls.
+        while self._jobs:
+            await asyncio.sleep(self.maintain_interval)
+            try:
+                self.maintain()
+            except OSError:
+                logger.exception("Background job maintenance failed.")
+
+    async def _reap(self, job: BackgroundJob) -> None:
+        if job.process is None:
+            return
+        try:
+            job.exit_code = await job.process.wait()
+            logger.debug(
+                "Background job %s (pid=%s) exited with %s.",
+                job.job_id,
+                job.pid,
+                job.exit_code,
+            )
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to reap background job %s.", job.job_id)
+
+    def _kill_all_sync(self) -> None:
+        for job in self._jobs.values():
+            if _process_group_alive(job.pid):
+                _signal_group(job.pid, signal.SIGKILL)
+
+
+def _process_group_alive(pgid: int) -> bool:
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _signal_group(pgid: int, sig: signal.Signals) -> None:
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pgid, sig)
+
+
+def _tail_file(path: Path, lines: int, block_size: int = 8192) -> str:
+    try:
+        with open(path, "rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            position = handle.tell()
+            data = b""
+            while position > 0 and data.count(b"\n") <= lines:
+                step = min(block_size, position)
+                position -= step
+                handle.seek(position)
+                data = handle.read(step) + data
+    except FileNotFoundError:
+        return ""
+    text = data.decode("utf-8", errors="ignore")
+    return "\n".join(text.splitlines()[-lines:])
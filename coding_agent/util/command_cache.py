@@ -0,0 +1,333 @@
+import itertools
+import os
+import re
+import shlex
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+
+DEFAULT_RESULT_CACHE_SIZE = 128
+DEFAULT_RESULT_CACHE_TTL_SECONDS = 30.0
+# Recursive commands are fingerprinted by walking the trees they read; larger
+# trees are not cached.
+DEFAULT_MAX_WALK_ENTRIES = 20_000
+
+# Programs whose output depends only on the files they read. Commands are
+# cacheable when every pipeline/list segment starts with one of these and no
+# segment redirects, substitutes or backgrounds.
+_READ_ONLY_PROGRAMS = frozenset(
+    {
+        "cat",
+        "du",
+        "egrep",
+        "fgrep",
+        "file",
+        "find",
+        "grep",
+        "head",
+        "ls",
+        "pwd",
+        "rg",
+        "stat",
+        "tail",
+        "tree",
+        "wc",
+    }
+)
+_READ_ONLY_GIT_SUBCOMMANDS = frozenset(
+    {"blame", "diff", "log", "ls-files", "rev-parse", "show", "status"}
+)
+_SEGMENT_SEPARATORS = frozenset({"|", "||", "&&", ";"})
+_UNSAFE_FIND_ACTIONS = frozenset(
+    {"-delete", "-exec", "-execdir", "-ok", "-okdir", "-fprint", "-fprint0", "-fprintf", "-fls"}
+)
+# Options that write files or run other programs, so replaying stdout would
+# skip a side effect. Long options also match their ``--opt=value`` form;
+# single-letter ones also match inside a cluster such as ``-ao``.
+_UNSAFE_LONG_OPTIONS = {
+    "git": ("--output", "--ext-diff"),
+    "rg": ("--pre", "--pre-glob"),
+    "tree": ("--output",),
+    "file": ("--compile",),
+}
+_UNSAFE_SHORT_OPTIONS = {"tree": "o", "file": "C"}
+# Programs that descend into directory arguments (or the cwd without any).
+_RECURSIVE_PROGRAMS = frozenset({"du", "find", "rg", "tree"})
+_RECURSIVE_OPTIONS = {"grep": "rR", "egrep": "rR", "fgrep": "rR", "ls": "R"}
+_UNSAFE_CHARACTERS = re.compile(r"[`$<>]|\bsudo\b")
+_GIT_STATE_FILES = (".git/HEAD", ".git/index")
+# Kernel-generated files change without their stat changing.
+_VOLATILE_ROOTS = ("/proc", "/sys", "/dev")
+# Leading assignment that makes the shell tool run a read-only command instead
+# of replaying its cached result; the shell just exports it to the command.
+CACHE_BYPASS_ASSIGNMENT = "CODING_AGENT_SHELL_CACHE=0"
+
+_generation = itertools.count(1)
+_current_generation = 0
+
+
+def bump_workspace_generation() -> int:
+    """Record that the workspace may have changed; invalidates cached results."""
+    global _current_generation
+    _current_generation = next(_generation)
+    return _current_generation
+
+
+def workspace_generation() -> int:
+    return _current_generation
+
+
+@dataclass(slots=True, frozen=True)
+class CachedResult:
+    stdout: str
+    stderr: str
+    exit_code: int
+    fingerprint: tuple
+    stored_at: float
+
+
+@dataclass(slots=True, frozen=True)
+class ReadOnlyCommand:
+    """Parsed view of a cacheable command: the paths it reads and whether it uses git."""
+
+    paths: tuple[str, ...]
+    uses_git: bool
+    # Paths whose whole tree is read, e.g. by ``grep -r`` or ``find``.
+    trees: tuple[str, ...] = ()
+
+
+class CommandResultCache:
+    """
+    LRU cache of results for read-only shell commands.
+
+    Entries are keyed by command and working directory and validated against a
+    cheap workspace fingerprint: the process-wide workspace generation (bumped
+    whenever a non-read-only command runs or a file is patched), the
+    ``(mtime, size, inode)`` of the working directory and every path argument,
+    and git's ``HEAD``/``index`` for git commands. Recursive commands
+    (``grep -r``, ``rg``, ``find``, ``tree``, ``du``, ``ls -R``) also stat
+    every entry below the directories they read, so in-place edits made
+    outside the agent deep in a tree are seen; trees with more than
+    ``max_walk_entries`` entries are not cached. Entries also expire after
+    ``ttl_seconds`` to bound staleness from edits the fingerprint cannot see
+    (e.g. a rewrite that keeps size and mtime).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_RESULT_CACHE_SIZE,
+        ttl_seconds: float = DEFAULT_RESULT_CACHE_TTL_SECONDS,
+        max_walk_entries: int = DEFAULT_MAX_WALK_ENTRIES,
+    ) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.ttl_seconds = ttl_seconds
+        self.max_walk_entries = max_walk_entries
+        self._entries: OrderedDict[tuple[str, str], CachedResult] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, command: str, cwd: Path) -> CachedResult | None:
+        parsed = parse_read_only_command(command)
+        if parsed is None:
+            return None
+        key = (command, str(cwd))
+        entry = self._entries.get(key)
+        if entry is not None:
+            fresh = time.monotonic() - entry.stored_at <= self.ttl_seconds
+            if fresh and entry.fingerprint == self._fingerprint(parsed, cwd):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def store(
+        self, command: str, cwd: Path, stdout: str, stderr: str, exit_code: int
+    ) -> bool:
+        parsed = parse_read_only_command(command)
+        if parsed is None or not self.max_entries:
+            return False
+        fingerprint = self._fingerprint(parsed, cwd)
+        if fingerprint is None:
+            return False
+        key = (command, str(cwd))
+        self._entries[key] = CachedResult(
+            stdout=stdout,
+            stderr=stderr,
+            exit_code=exit_code,
+            fingerprint=fingerprint,
+            stored_at=time.monotonic(),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _fingerprint(self, parsed: ReadOnlyCommand, cwd: Path) -> tuple | None:
+        paths = [".", *parsed.paths]
+        if parsed.uses_git:
+            paths.extend(_GIT_STATE_FILES)
+        trees = []
+        for path in parsed.trees:
+            tree = _tree_signature(os.path.join(cwd, path), self.max_walk_entries)
+            if tree is None:
+                return None
+            trees.append(tree)
+        return (
+            _current_generation,
+            tuple(_stat_signature(os.path.join(cwd, path)) for path in paths),
+            tuple(trees),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def split_cache_bypass(command: str) -> tuple[str, bool]:
+    """``command`` without a leading ``CODING_AGENT_SHELL_CACHE=0``, and whether it had one."""
+    stripped = command.lstrip()
+    rest = stripped[len(CACHE_BYPASS_ASSIGNMENT) :]
+    if stripped.startswith(CACHE_BYPASS_ASSIGNMENT) and rest[:1].isspace() and rest.strip():
+        return rest.lstrip(), True
+    return command, False
+
+
+@lru_cache(maxsize=512)
+def parse_read_only_command(command: str) -> ReadOnlyCommand | None:
+    """Return the paths a read-only command reads, or None if it may have side effects."""
+    if _UNSAFE_CHARACTERS.search(command):
+        return None
+    try:
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    if not tokens:
+        return None
+
+    segments: list[list[str]] = [[]]
+    for token in tokens:
+        if token in _SEGMENT_SEPARATORS:
+            segments.append([])
+        elif set(token) <= set("&|;()"):
+            # Backgrounding, subshells and anything else we do not model.
+            return None
+        else:
+            segments[-1].append(token)
+
+    paths: list[str] = []
+    trees: list[str] = []
+    uses_git = False
+    for segment in segments:
+        if not segment:
+            return None
+        program, arguments = segment[0], segment[1:]
+        if "=" in program:
+            return None
+        if _has_unsafe_option(program, arguments):
+            return None
+        if program == "git":
+            subcommand = next((arg for arg in arguments if not arg.startswith("-")), None)
+            if subcommand not in _READ_ONLY_GIT_SUBCOMMANDS:
+                return None
+            uses_git = True
+            continue
+        if program not in _READ_ONLY_PROGRAMS:
+            return None
+        if program == "find" and _UNSAFE_FIND_ACTIONS.intersection(arguments):
+            return None
+        operands = [arg for arg in arguments if not arg.startswith("-")]
+        if any(_is_volatile(operand) for operand in operands):
+            return None
+        paths.extend(operands)
+        if _is_recursive(program, arguments):
+            # Without operands the cwd is read (find, rg, grep -r, tree, du).
+            trees.extend(operands or ["."])
+    return ReadOnlyCommand(
+        paths=tuple(dict.fromkeys(paths)),
+        uses_git=uses_git,
+        trees=tuple(dict.fromkeys(trees)),
+    )
+
+
+def _is_volatile(path: str) -> bool:
+    normalized = os.path.normpath(path) if path.startswith("/") else ""
+    return any(
+        normalized == root or normalized.startswith(root + "/") for root in _VOLATILE_ROOTS
+    )
+
+
+def _options(arguments: list[str]) -> tuple[list[str], str]:
+    """Long options and the letters of all short-option clusters."""
+    long_options = [arg for arg in arguments if arg.startswith("--")]
+    letters = "".join(
+        arg[1:] for arg in arguments if arg.startswith("-") and not arg.startswith("--")
+    )
+    return long_options, letters
+
+
+def _has_unsafe_option(program: str, arguments: list[str]) -> bool:
+    long_options, letters = _options(arguments)
+    for option in _UNSAFE_LONG_OPTIONS.get(program, ()):
+        for argument in long_options:
+            if argument == option or argument.startswith(f"{option}="):
+                return True
+            if program == "git" and argument.startswith(option):
+                return True  # Any --output* spelling, to be safe.
+    return any(letter in letters for letter in _UNSAFE_SHORT_OPTIONS.get(program, ""))
+
+
+def _is_recursive(program: str, arguments: list[str]) -> bool:
+    if program in _RECURSIVE_PROGRAMS:
+        return True
+    long_options, letters = _options(arguments)
+    if program in _RECURSIVE_OPTIONS:
+        if any(letter in letters for letter in _RECURSIVE_OPTIONS[program]):
+            return True
+        return any(
+            option in ("--recursive", "--dereference-recursive") for option in long_options
+        )
+    return False
+
+
+def _tree_signature(root: str, max_entries: int) -> tuple[int, int, int] | None:
+    """(entries, newest mtime, total size) below ``root``; None past ``max_entries``."""
+    entries = newest = total = 0
+    pending = [root]
+    while pending:
+        try:
+            iterator = os.scandir(pending.pop())
+        except (NotADirectoryError, FileNotFoundError, PermissionError):
+            continue
+        except (OSError, ValueError):
+            return None
+        with iterator:
+            for entry in iterator:
+                entries += 1
+                if entries > max_entries:
+                    return None
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                except OSError:
+                    continue
+                newest = max(newest, stat.st_mtime_ns, stat.st_ctime_ns)
+                total += stat.st_size
+    return entries, newest, total
+
+
+def _stat_signature(path: str) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
@@ -0,0 +1,77 @@
+import re
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+
+
+DEFAULT_CLASSIFIER_CACHE_SIZE = 512
+
+
+@dataclass(slots=True, frozen=True)
+class CommandClassification:
+    """Tags assigned to a command, with the pattern that produced each tag."""
+
+    tags: frozenset[str]
+    reasons: dict[str, str] = field(default_factory=dict)
+
+    def has(self, tag: str) -> bool:
+        return tag in self.tags
+
+
+class CommandClassifier:
+    """
+    Tags shell commands using precompiled pattern groups.
+
+    Each tag's patterns are merged into a single alternation with one named
+    group per pattern, so classifying a command costs one lowercase and one
+    regex search per tag regardless of how many patterns a tag has. The
+    matching group identifies the pattern that fired (the match reason).
+    Results are memoized in a bounded LRU because the executor classifies the
+    same command several times while preparing and dispatching it.
+    """
+
+    def __init__(
+        self,
+        rules: Mapping[str, Iterable[str]],
+        cache_size: int = DEFAULT_CLASSIFIER_CACHE_SIZE,
+    ) -> None:
+        self._compiled: list[tuple[str, re.Pattern[str], dict[str, str]]] = []
+        for tag_index, (tag, patterns) in enumerate(rules.items()):
+            group_patterns: dict[str, str] = {}
+            alternatives: list[str] = []
+            for pattern_index, pattern in enumerate(patterns):
+                group = f"t{tag_index}p{pattern_index}"
+                group_patterns[group] = pattern
+                alternatives.append(f"(?P<{group}>{pattern})")
+            if alternatives:
+                self._compiled.append(
+                    (tag, re.compile("|".join(alternatives)), group_patterns)
+                )
+        self._cache: OrderedDict[str, CommandClassification] = OrderedDict()
+        self._cache_size = max(cache_size, 0)
+
+    def classify(self, command: str) -> CommandClassification:
+        cached = self._cache.get(command)
+        if cached is not None:
+            self._cache.move_to_end(command)
+            return cached
+
+        normalized = command.strip().lower()
+        tags: set[str] = set()
+        reasons: dict[str, str] = {}
+        for tag, regex, group_patterns in self._compiled:
+            match = regex.search(normalized)
+            if match is None:
+                continue
+            tags.add(tag)
+            group = next(
+                name for name in group_patterns if match.group(name) is not None
+            )
+            reasons[tag] = group_patterns[group]
+        classification = CommandClassification(frozenset(tags), reasons)
+
+        if self._cache_size:
+            self._cache[command] = classification
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return classification
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_MAX_CONTEXT_TOKENS = 150_000
+DEFAULT_MIN_OUTPUT_AGE = 8
+DEFAULT_MIN_OUTPUT_CHARS = 4_000
+DEFAULT_EXCERPT_CHARS = 800
+DEFAULT_ARCHIVE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+# Rough average for code and logs; good enough to decide when to compact.
+CHARS_PER_TOKEN = 4
+
+_TEXT_FIELDS = ("content", "output", "arguments", "text")
+
+
+def default_archive_dir() -> Path:
+    state_home = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(state_home) / "coding-agent" / "tool-outputs"
+
+
+class ToolOutputArchive:
+    """
+    Original tool outputs, one file per call_id.
+
+    Compacted outputs point to their file, so the agent can page through the
+    full text with the shell and code can load it with :meth:`get`. The
+    excerpts stay in the saved thread, so the archive lives in a persistent
+    directory with one subdirectory per thread (see :meth:`session`);
+    :meth:`prune` removes the subdirectories of threads unused for a while.
+    """
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = Path(root or default_archive_dir())
+
+    def session(self, name: str) -> "ToolOutputArchive":
+        """Archive of the thread ``name``; marks it as used for :meth:`prune`."""
+        archive = ToolOutputArchive(self.root / name)
+        try:
+            os.utime(archive.root)
+        except FileNotFoundError:
+            pass  # Created by the first put.
+        return archive
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Remove thread archives unused for ``max_age_seconds``; return how many."""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if not entry.is_dir(follow_symlinks=False) or entry.stat().st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def path(self, call_id: str) -> Path:
+        # call_ids come from the model provider; never use them as file names.
+        name = hashlib.sha256(call_id.encode("utf-8")).hexdigest()[:32]
+        return self.root / f"{name}.txt"
+
+    def put(self, call_id: str, text: str) -> Path:
+        path = self.path(call_id)
+        if not path.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix(f".{os.getpid()}.tmp")
+            temp.write_text(text, encoding="utf-8")
+            os.replace(temp, path)
+        return path
+
+    def get(self, call_id: str) -> str | None:
+        try:
+            return self.path(call_id).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, call_id: str) -> bool:
+        return self.path(call_id).exists()
+
+
+@dataclass(slots=True)
+class CompactionStats:
+    tokens_before: int
+    tokens_after: int
+    compacted: int
+
+
+def estimate_tokens(item) -> int:
+    """Approximate token count of one thread item from its text fields."""
+    if not isinstance(item, dict):
+        return 0
+    chars = 0
+    for key in _TEXT_FIELDS:
+        value = item.get(key)
+        if isinstance(value, str):
+            chars += len(value)
+        elif isinstance(value, list):
+            for part in value:
+                if isinstance(part, dict) and isinstance(part.get("text"), str):
+                    chars += len(part["text"])
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def excerpt(text: str, excerpt_chars: int, archived_at: Path) -> str:
+    """Head and tail of ``text`` with a one-line summary of what was left out."""
+    omitted = len(text) - 2 * excerpt_chars
+    lines = text.count("\n") + 1
+    errors = sum(1 for line in text.splitlines() if "error" in line.lower())
+    summary = f"[{omitted} of {len(text)} chars ({lines} lines"
+    if errors:
+        summary += f", {errors} mentioning errors"
+    summary += f") compacted; full output saved to {archived_at}]"
+    return f"{text[:excerpt_chars]}\n... {summary} ...\n{text[-excerpt_chars:]}"
+
+
+class ContextBudget:
+    """
+    Keeps the tool outputs of a thread within an approximate token budget.
+
+    ``function_call_output`` items are replaced by a head/tail excerpt once
+    at least ``min_age`` newer outputs follow them and they are longer than
+    ``min_chars``; the original goes to the :class:`ToolOutputArchive`. When
+    the thread is still above ``max_tokens`` afterwards, older outputs are
+    compacted regardless of size (the newest one is always kept), oldest
+    first, until it fits. Only plain-string outputs are compacted.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+        min_age: int = DEFAULT_MIN_OUTPUT_AGE,
+        min_chars: int = DEFAULT_MIN_OUTPUT_CHARS,
+        excerpt_chars: int = DEFAULT_EXCERPT_CHARS,
+        archive: ToolOutputArchive | None = None,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.min_age = max(min_age, 1)
+        self.min_chars = min_chars
+        self.excerpt_chars = excerpt_chars
+        self.archive = archive or ToolOutputArchive()
+
+    def compact(self, items: list, archive: ToolOutputArchive | None = None) -> CompactionStats:
+        """
+        Compact ``items`` in place and return the token estimate before and after.
+
+        Originals go to ``archive``, by default the budget's own archive.
+        """
+        archive = archive or self.archive
+        outputs = []
+        total = 0
+        for item in items:
+            total += estimate_tokens(item)
+            if (
+                isinstance(item, dict)
+                and item.get("type") == "function_call_output"
+                and item.get("call_id")
+                and isinstance(item.get("output"), str)
+            ):
+                outputs.append(item)
+        before = total
+
+        # Anything at or below this length would not get shorter.
+        worth_compacting = 2 * self.excerpt_chars + 512
+        compacted = 0
+        old_outputs = outputs[: -self.min_age]
+        for item in old_outputs:
+            if len(item["output"]) >= max(self.min_chars, worth_compacting):
+                total -= self._compact_item(item, archive)
+                compacted += 1
+        if total > self.max_tokens:
+            for item in outputs[:-1]:
+                if total <= self.max_tokens:
+                    break
+                if len(item["output"]) > worth_compacting:
+                    total -= self._compact_item(item, archive)
+                    compacted += 1
+        return CompactionStats(before, total, compacted)
+
+    def _compact_item(self, item: dict, archive: ToolOutputArchive) -> int:
+        """Replace the output of ``item``; return the estimated tokens saved."""
+        text = item["output"]
+        path = archive.put(item["call_id"], text)
+        item["output"] = excerpt(text, self.excerpt_chars, path)
+        return (len(text) - len(item["output"])) // CHARS_PER_TOKEN
@@ -0,0 +1,126 @@
+import asyncio
+import heapq
+import itertools
+import weakref
+from collections.abc import Callable
+
+
+class Deadline:
+    """
+    A single deadline registered with a ``DeadlineScheduler``.
+
+    ``rearm`` is O(1): it only moves ``when``. The scheduler notices the new
+    value when the old heap entry comes due and re-queues it, so frequent
+    re-arming (e.g. on every output chunk) costs no heap operations.
+    """
+
+    __slots__ = ("when", "callback", "cancelled", "_scheduler")
+
+    def __init__(
+        self,
+        scheduler: "DeadlineScheduler",
+        when: float,
+        callback: Callable[[], None],
+    ) -> None:
+        self._scheduler = scheduler
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def rearm(self, when: float) -> None:
+        previous = self.when
+        self.when = when
+        if when < previous:
+            # Moving a deadline earlier needs a fresh heap entry.
+            self._scheduler._push(self)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class DeadlineScheduler:
+    """
+    Deadline heap shared by every command running on an event loop.
+
+    A single loop timer is armed for the earliest pending deadline, so the
+    number of wakeups is bounded by the number of deadlines that actually come
+    due rather than by a polling interval per command.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._heap: list[tuple[float, int, Deadline]] = []
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_when: float | None = None
+
+    def time(self) -> float:
+        return self._loop.time()
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> Deadline:
+        deadline = Deadline(self, when, callback)
+        self._push(deadline)
+        return deadline
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Deadline:
+        return self.call_at(self._loop.time() + delay, callback)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _push(self, deadline: Deadline) -> None:
+        heapq.heappush(self._heap, (deadline.when, next(self._counter), deadline))
+        self._arm()
+
+    def _arm(self) -> None:
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = self._timer_when = None
+            return
+        when = self._heap[0][0]
+        if self._timer is not None and self._timer_when is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer = self._loop.call_at(when, self._run)
+        self._timer_when = when
+
+    def _run(self) -> None:
+        # The loop may run a timer slightly before its nominal time (clock
+        # resolution); treat the scheduled time as reached.
+        now = max(self._loop.time(), self._timer_when or 0.0)
+        self._timer = self._timer_when = None
+        due: list[Deadline] = []
+        while self._heap and self._heap[0][0] <= now:
+            scheduled, _, deadline = heapq.heappop(self._heap)
+            if deadline.cancelled or deadline.when < scheduled:
+                # Cancelled, or a stale entry superseded by an earlier re-arm.
+                continue
+            if deadline.when > now:
+                heapq.heappush(
+                    self._heap, (deadline.when, next(self._counter), deadline)
+                )
+                continue
+            deadline.cancelled = True
+            due.append(deadline)
+        self._arm()
+        for deadline in due:
+            deadline.callback()
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, DeadlineScheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_deadline_scheduler() -> DeadlineScheduler:
+    """Return the scheduler shared by all callers on the running event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = DeadlineScheduler(loop)
+        _schedulers[loop] = scheduler
+    return scheduler
@@ -0,0 +1,558 @@
+"""
+Indexed V4A diff application.
+
+Produces the same output (and the same errors) as ``agents.apply_diff`` but
+avoids its per-line Python comparisons, which dominate on multi-megabyte
+files. The fast path (:class:`TextIndex`) never splits the file: hunk
+context and ``@@`` anchors are located with a substring search for the
+newline-delimited block, and a sparse line-offset index (line numbers of
+the positions found so far) converts between line numbers and offsets.
+The output is assembled from slices of the original text. When a hunk
+only matches after whitespace normalization, the diff is re-applied with
+:class:`LineIndex`, which hashes every line into a position index (built
+per normalization level on demand) and probes the rarest context line.
+Diffs using syntax whose meaning changed between SDK releases (stacked
+``@@`` headers, ``*** End of File``) are handed to ``agents.apply_diff``
+itself, so they behave exactly like the installed SDK.
+
+:func:`stream_diff` applies a diff to a memory-mapped file and writes the
+result to a binary stream, copying untouched byte ranges in bounded windows
+so peak memory tracks hunk size rather than file size.
+"""
+
+import mmap
+import re
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from agents import apply_diff as _reference_apply_diff
+
+
+END_PATCH = "*** End Patch"
+END_FILE = "*** End of File"
+_SECTION_TERMINATORS = (
+    END_PATCH,
+    "*** Update File:",
+    "*** Delete File:",
+    "*** Add File:",
+)
+_END_SECTION_MARKERS = (*_SECTION_TERMINATORS, END_FILE)
+STREAM_WINDOW_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
+class _Chunk:
+    orig_index: int
+    del_lines: list[str]
+    ins_lines: list[str]
+
+
+class _NeedsLineIndex(Exception):
+    """Raised by the fast path when a hunk needs whitespace-insensitive matching."""
+
+
+class StreamingUnsupported(Exception):
+    """The diff cannot be streamed (CRLF file or fuzzy match); apply it in memory."""
+
+
+class TextIndex:
+    """Exact-match locator working on the unsplit text."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        # Every line, including the first and last, is wrapped in newlines,
+        # so a match of "\n" + block + "\n" always starts at a line boundary.
+        self._padded = "\n" + text + "\n"
+        self.line_count = text.count("\n") + 1
+        self._lines = [0, self.line_count]
+        self._offsets = [0, len(text) + 1]
+
+    def advance_anchor(self, anchor: str, cursor: int) -> int:
+        needle = "\n" + anchor + "\n"
+        cursor_offset = self.offset_of(cursor)
+        if self._padded.find(needle, 0, cursor_offset - 1 + len(needle)) != -1:
+            return cursor
+        found = self._padded.find(needle, cursor_offset)
+        if found == -1:
+            raise _NeedsLineIndex
+        return self._line_at(found) + 1
+
+    def find_context(self, context: list[str], start: int, eof: bool) -> int:
+        if not context:
+            return max(0, self.line_count - len(context)) if eof else start
+        if eof:
+            start = max(0, self.line_count - len(context))
+        if start > self.line_count:
+            raise _NeedsLineIndex
+        needle = "\n" + "\n".join(context) + "\n"
+        found = self._padded.find(needle, self.offset_of(start))
+        if found == -1:
+            raise _NeedsLineIndex
+        return self._line_at(found)
+
+    def render(self, chunks: list[_Chunk], newline: str) -> str:
+        pieces: list[str] = []
+        cursor = 0
+        for chunk in chunks:
+            _check_chunk(chunk, cursor, self.line_count)
+            if chunk.orig_index > cursor:
+                pieces.append(self._slice(cursor, chunk.orig_index))
+            if chunk.ins_lines:
+                pieces.append("\n".join(chunk.ins_lines))
+            cursor = chunk.orig_index + len(chunk.del_lines)
+        if cursor < self.line_count:
+            pieces.append(self._slice(cursor, self.line_count))
+        output = "\n".join(pieces)
+        return output if newline == "\n" else output.replace("\n", newline)
+
+    def offset_of(self, line: int) -> int:
+        """Character offset where ``line`` starts (``len(text) + 1`` past the end)."""
+        if line >= self.line_count:
+            return len(self.text) + 1
+        slot = bisect_right(self._lines, line)
+        lower, upper = self._lines[slot - 1], self._lines[slot]
+        if lower == line:
+            return self._offsets[slot - 1]
+        if line - lower <= upper - line:
+            offset = self._offsets[slot - 1]
+            for _ in range(line - lower):
+                offset = self.text.index("\n", offset) + 1
+        else:
+            offset = self._offsets[slot]
+            for _ in range(upper - line):
+                offset = self.text.rfind("\n", 0, offset - 1) + 1
+        self._remember(line, offset)
+        return offset
+
+    def _line_at(self, offset: int) -> int:
+        slot = bisect_right(self._offsets, offset) - 1
+        line = self._lines[slot] + self.text.count("\n", self._offsets[slot], offset)
+        self._remember(line, offset)
+        return line
+
+    def _remember(self, line: int, offset: int) -> None:
+        slot = bisect_left(self._lines, line)
+        if slot < len(self._lines) and self._lines[slot] == line:
+            return
+        self._lines.insert(slot, line)
+        self._offsets.insert(slot, offset)
+
+    def _slice(self, start: int, end: int) -> str:
+        return self.text[self.offset_of(start) : self.offset_of(end) - 1]
+
+
+class MappedIndex:
+    """Exact-match locator over a memory-mapped UTF-8 file (LF line endings)."""
+
+    def __init__(self, data: mmap.mmap) -> None:
+        self.data = data
+        self.size = len(data)
+        self.line_count = self._count_newlines(0, self.size) + 1
+        self._lines = [0, self.line_count]
+        self._offsets = [0, self.size + 1]
+
+    def advance_anchor(self, anchor: str, cursor: int) -> int:
+        block = anchor.encode("utf-8")
+        cursor_offset = self.offset_of(cursor)
+        if self._find_block(block, 0, cursor_offset) != -1:
+            return cursor
+        found = self._find_block(block, cursor_offset)
+        if found == -1:
+            raise _NeedsLineIndex
+        return self._line_at(found) + 1
+
+    def find_context(self, context: list[str], start: int, eof: bool) -> int:
+        if not context:
+            return max(0, self.line_count - len(context)) if eof else start
+        if eof:
+            start = max(0, self.line_count - len(context))
+        if start > self.line_count:
+            raise _NeedsLineIndex
+        found = self._find_block(
+            "\n".join(context).encode("utf-8"), self.offset_of(start)
+        )
+        if found == -1:
+            raise _NeedsLineIndex
+        return self._line_at(found)
+
+    def write(self, chunks: list[_Chunk], output: BinaryIO) -> None:
+        separator = b""
+        cursor = 0
+        for chunk in chunks:
+            _check_chunk(chunk, cursor, self.line_count)
+            if chunk.orig_index > cursor:
+                output.write(separator)
+                self._copy(cursor, chunk.orig_index, output)
+                separator = b"\n"
+            if chunk.ins_lines:
+                output.write(separator)
+                output.write("\n".join(chunk.ins_lines).encode("utf-8"))
+                separator = b"\n"
+            cursor = chunk.orig_index + len(chunk.del_lines)
+        if cursor < self.line_count:
+            output.write(separator)
+            self._copy(cursor, self.line_count, output)
+
+    def offset_of(self, line: int) -> int:
+        if line >= self.line_count:
+            return self.size + 1
+        slot = bisect_right(self._lines, line)
+        lower, upper = self._lines[slot - 1], self._lines[slot]
+        if lower == line:
+            return self._offsets[slot - 1]
+        if line - lower <= upper - line:
+            offset = self._offsets[slot - 1]
+            for _ in range(line - lower):
+                offset = self.data.find(b"\n", offset) + 1
+        else:
+            offset = self._offsets[slot]
+            for _ in range(upper - line):
+                offset = self.data.rfind(b"\n", 0, offset - 1) + 1
+        self._remember(line, offset)
+        return offset
+
+    def _find_block(self, block: bytes, start: int, end: int | None = None) -> int:
+        """First line start in ``[start, end)`` whose lines spell ``block``, or -1."""
+        end = self.size + 1 if end is None else end
+        candidates = []
+        if start == 0 and self._block_at(block, 0):
+            candidates.append(0)
+        found = self.data.find(b"\n" + block + b"\n", max(start - 1, 0))
+        if found != -1:
+            candidates.append(found + 1)
+        # The last line has no trailing newline.
+        last = self.size - len(block)
+        if last >= start and (last == 0 or self.data[last - 1] == 0x0A):
+            if self.data[last:] == block:
+                candidates.append(last)
+        found = min(candidates, default=-1)
+        return found if found != -1 and found < end else -1
+
+    def _block_at(self, block: bytes, offset: int) -> bool:
+        stop = offset + len(block)
+        if self.data[offset:stop] != block:
+            return False
+        return stop == self.size or self.data[stop] == 0x0A
+
+    def _line_at(self, offset: int) -> int:
+        slot = bisect_right(self._offsets, offset) - 1
+        line = self._lines[slot] + self._count_newlines(self._offsets[slot], offset)
+        self._remember(line, offset)
+        return line
+
+    def _remember(self, line: int, offset: int) -> None:
+        slot = bisect_left(self._lines, line)
+        if slot < len(self._lines) and self._lines[slot] == line:
+            return
+        self._lines.insert(slot, line)
+        self._offsets.insert(slot, offset)
+
+    def _count_newlines(self, start: int, end: int) -> int:
+        total = 0
+        for position in range(start, end, STREAM_WINDOW_BYTES):
+            total += self.data[position : min(position + STREAM_WINDOW_BYTES, end)].count(b"\n")
+        return total
+
+    def _copy(self, start_line: int, end_line: int, output: BinaryIO) -> None:
+        start = self.offset_of(start_line)
+        end = self.offset_of(end_line) - 1
+        for position in range(start, end, STREAM_WINDOW_BYTES):
+            output.write(self.data[position : min(position + STREAM_WINDOW_BYTES, end)])
+
+
+class LineIndex:
+    """Lines of a text plus lazily built position indexes per normalization."""
+
+    _NORMALIZERS: dict[str, Callable[[str], str] | None] = {
+        "exact": None,
+        "rstrip": str.rstrip,
+        "strip": str.strip,
+    }
+
+    def __init__(self, text: str) -> None:
+        self.lines = text.split("\n")
+        self._views: dict[str, tuple[list[str], dict[str, list[int]]]] = {}
+
+    def view(self, level: str) -> tuple[list[str], dict[str, list[int]]]:
+        view = self._views.get(level)
+        if view is None:
+            normalize = self._NORMALIZERS[level]
+            lines = self.lines if normalize is None else list(map(normalize, self.lines))
+            positions: dict[str, list[int]] = {}
+            for number, line in enumerate(lines):
+                found = positions.get(line)
+                if found is None:
+                    positions[line] = [number]
+                else:
+                    found.append(number)
+            view = (lines, positions)
+            self._views[level] = view
+        return view
+
+    def find(self, context: list[str], start: int, level: str) -> int:
+        """First index >= ``start`` where ``context`` matches at ``level``, or -1."""
+        lines, positions = self.view(level)
+        normalize = self._NORMALIZERS[level]
+        if normalize is not None:
+            context = [normalize(line) for line in context]
+        size = len(context)
+        anchor_offset = -1
+        anchor_positions: list[int] = []
+        for offset, line in enumerate(context):
+            found = positions.get(line)
+            if found is None:
+                return -1
+            if anchor_offset < 0 or len(found) < len(anchor_positions):
+                anchor_offset, anchor_positions = offset, found
+        last_start = len(lines) - size
+        slot = bisect_left(anchor_positions, start + anchor_offset)
+        while slot < len(anchor_positions):
+            candidate = anchor_positions[slot] - anchor_offset
+            if candidate > last_start:
+                break
+            if lines[candidate : candidate + size] == context:
+                return candidate
+            slot += 1
+        return -1
+
+    def first_at_or_after(self, line: str, start: int, level: str) -> int:
+        _, positions = self.view(level)
+        found = positions.get(line)
+        if not found:
+            return -1
+        slot = bisect_left(found, start)
+        return found[slot] if slot < len(found) else -1
+
+    def occurs_before(self, line: str, end: int, level: str) -> bool:
+        _, positions = self.view(level)
+        found = positions.get(line)
+        return bool(found) and found[0] < end
+
+    def advance_anchor(self, anchor: str, cursor: int) -> int:
+        found = False
+        if not self.occurs_before(anchor, cursor, "exact"):
+            match = self.first_at_or_after(anchor, cursor, "exact")
+            if match != -1:
+                cursor = match + 1
+                found = True
+        stripped = anchor.strip()
+        if not found and not self.occurs_before(stripped, cursor, "strip"):
+            match = self.first_at_or_after(stripped, cursor, "strip")
+            if match != -1:
+                cursor = match + 1
+        return cursor
+
+    def find_context(self, context: list[str], start: int, eof: bool) -> int:
+        if eof:
+            found = self._find_any_level(
+                context, max(0, len(self.lines) - len(context))
+            )
+            if found != -1:
+                return found
+        return self._find_any_level(context, start)
+
+    def render(self, chunks: list[_Chunk], newline: str) -> str:
+        output: list[str] = []
+        cursor = 0
+        for chunk in chunks:
+            _check_chunk(chunk, cursor, len(self.lines))
+            output.extend(self.lines[cursor : chunk.orig_index])
+            output.extend(chunk.ins_lines)
+            cursor = chunk.orig_index + len(chunk.del_lines)
+        output.extend(self.lines[cursor:])
+        return newline.join(output)
+
+    def _find_any_level(self, context: list[str], start: int) -> int:
+        if not context:
+            return start
+        for level in ("exact", "rstrip", "strip"):
+            found = self.find(context, start, level)
+            if found != -1:
+                return found
+        return -1
+
+
+def apply_diff_indexed(text: str, diff: str, mode: str = "default") -> str:
+    """Apply a V4A diff to ``text``; drop-in replacement for ``agents.apply_diff``."""
+    if mode != "create" and requires_reference_parser(diff):
+        return _reference_apply_diff(text, diff)
+    text_has_crlf = mode != "create" and "\r\n" in text
+    if mode != "create" and "\n" in text:
+        newline = "\r\n" if text_has_crlf else "\n"
+    else:
+        newline = "\r\n" if "\r\n" in diff else "\n"
+    diff_lines = _split_diff_lines(diff)
+    if mode == "create":
+        return _parse_create_diff(diff_lines, newline)
+
+    normalized = text.replace("\r\n", "\n") if text_has_crlf else text
+    try:
+        locator: TextIndex | LineIndex = TextIndex(normalized)
+        chunks = _parse_update_diff(diff_lines, locator)
+    except _NeedsLineIndex:
+        locator = LineIndex(normalized)
+        chunks = _parse_update_diff(diff_lines, locator)
+    return locator.render(chunks, newline)
+
+
+def stream_diff(source: int, diff: str, output: BinaryIO) -> None:
+    """
+    Apply an update diff to the file open on descriptor ``source`` and write
+    the patched content to ``output`` without loading the file.
+
+    Raises :class:`StreamingUnsupported` when the result would differ from
+    the in-memory path's handling (CRLF files, whitespace-fuzzy hunks,
+    diffs that need the SDK's own parser).
+    """
+    if requires_reference_parser(diff):
+        raise StreamingUnsupported("diff needs the SDK's own parser")
+    with mmap.mmap(source, 0, access=mmap.ACCESS_READ) as data:
+        if data.find(b"\r\n") != -1:
+            raise StreamingUnsupported("file uses CRLF line endings")
+        if data.find(b"\n") == -1 and "\r\n" in diff:
+            raise StreamingUnsupported("newline style comes from the diff")
+        index = MappedIndex(data)
+        try:
+            chunks = _parse_update_diff(_split_diff_lines(diff), index)
+        except _NeedsLineIndex:
+            raise StreamingUnsupported("hunk needs fuzzy matching") from None
+        index.write(chunks, output)
+
+
+def requires_reference_parser(diff: str) -> bool:
+    """
+    Whether ``diff`` has stacked ``@@`` headers, an empty ``@@ `` header or
+    an ``*** End of File`` marker; their handling differs between ``agents``
+    releases.
+    """
+    if END_FILE not in diff and "@@" not in diff:
+        return False
+    header = False
+    for line in _split_diff_lines(diff):
+        if line.startswith(END_FILE) or line == "@@ ":
+            return True
+        is_header = line == "@@" or line.startswith("@@ ")
+        if is_header and header:
+            return True
+        header = is_header
+    return False
+
+
+def _split_diff_lines(diff: str) -> list[str]:
+    lines = [line.rstrip("\r") for line in re.split(r"\r?\n", diff)]
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+def _parse_create_diff(lines: list[str], newline: str) -> str:
+    output = []
+    for line in lines:
+        if line.startswith(_SECTION_TERMINATORS):
+            break
+        if not line.startswith("+"):
+            raise ValueError(f"Invalid Add File Line: {line}")
+        output.append(line[1:])
+    return newline.join(output)
+
+
+def _parse_update_diff(
+    diff_lines: list[str], locator: "TextIndex | MappedIndex | LineIndex"
+) -> list[_Chunk]:
+    lines = [*diff_lines, END_PATCH]
+    position = 0
+    cursor = 0
+    chunks: list[_Chunk] = []
+
+    while position < len(lines) and not lines[position].startswith(_END_SECTION_MARKERS):
+        anchor = ""
+        if lines[position].startswith("@@ "):
+            anchor = lines[position][3:]
+            position += 1
+        bare_anchor = anchor == "" and lines[position] == "@@"
+        if bare_anchor:
+            position += 1
+        if not (anchor or bare_anchor or cursor == 0):
+            raise ValueError(f"Invalid Line:\n{lines[position]}")
+
+        if anchor.strip():
+            cursor = locator.advance_anchor(anchor, cursor)
+
+        context, section_chunks, end, eof = _read_section(lines, position)
+        found = locator.find_context(context, cursor, eof)
+        if found == -1:
+            context_text = "\n".join(context)
+            if eof:
+                raise ValueError(f"Invalid EOF Context {cursor}:\n{context_text}")
+            raise ValueError(f"Invalid Context {cursor}:\n{context_text}")
+
+        cursor = found + len(context)
+        position = end
+        for chunk in section_chunks:
+            chunk.orig_index += found
+            chunks.append(chunk)
+    return chunks
+
+
+def _read_section(
+    lines: list[str], start: int
+) -> tuple[list[str], list[_Chunk], int, bool]:
+    context: list[str] = []
+    del_lines: list[str] = []
+    ins_lines: list[str] = []
+    chunks: list[_Chunk] = []
+    mode = "keep"
+    position = start
+
+    while position < len(lines):
+        raw = lines[position]
+        if raw.startswith(("@@", *_END_SECTION_MARKERS)) or raw == "***":
+            break
+        if raw.startswith("***"):
+            raise ValueError(f"Invalid Line: {raw}")
+        position += 1
+        last_mode = mode
+        line = raw or " "
+        prefix = line[0]
+        if prefix == "+":
+            mode = "add"
+        elif prefix == "-":
+            mode = "delete"
+        elif prefix == " ":
+            mode = "keep"
+        else:
+            raise ValueError(f"Invalid Line: {line}")
+
+        content = line[1:]
+        if mode == "keep" and last_mode != mode and (del_lines or ins_lines):
+            chunks.append(_Chunk(len(context) - len(del_lines), del_lines, ins_lines))
+            del_lines, ins_lines = [], []
+        if mode == "delete":
+            del_lines.append(content)
+            context.append(content)
+        elif mode == "add":
+            ins_lines.append(content)
+        else:
+            context.append(content)
+
+    if del_lines or ins_lines:
+        chunks.append(_Chunk(len(context) - len(del_lines), del_lines, ins_lines))
+    if position < len(lines) and lines[position] == END_FILE:
+        return context, chunks, position + 1, True
+    if position == start:
+        following = lines[position] if position < len(lines) else ""
+        raise ValueError(f"Nothing in this section - index={position} {following}")
+    return context, chunks, position, False
+
+
+def _check_chunk(chunk: _Chunk, cursor: int, line_count: int) -> None:
+    if chunk.orig_index > line_count:
+        raise ValueError(
+            f"applyDiff: chunk.origIndex {chunk.orig_index} > input length {line_count}"
+        )
+    if cursor > chunk.orig_index:
+        raise ValueError(
+            f"applyDiff: overlapping chunk at {chunk.orig_index} (cursor {cursor})"
+        )
@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from .text_encoding import DEFAULT_FORMAT, TextFormat, read_text_file, sniff_file
+
+
+DEFAULT_CACHE_ENTRIES = 64
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+# Detected formats are tiny, so far more of them are kept than contents.
+_FORMAT_ENTRIES = 1024
+
+StatSignature = tuple[int, int, int]
+
+
+class FileContentCache:
+    """
+    Bounded LRU of decoded file contents validated by stat signature.
+
+    An entry is served only while the file's ``(inode, mtime_ns, size)``
+    still matches the signature recorded when it was read or written, so
+    edits made outside the editor (including atomic renames, which change
+    the inode) are picked up on the next read. Writers call :meth:`store`
+    after writing so the next patch of a hot file skips the read and decode.
+    Entries are evicted by count and by total cached characters.
+
+    The on-disk :class:`TextFormat` (encoding, BOM, newline style) of each
+    file is cached separately under the same signature, so files too large
+    to cache whole are still only sniffed once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_CACHE_ENTRIES,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        self.max_entries = max(max_entries, 0)
+        self.max_bytes = max(max_bytes, 0)
+        self._entries: OrderedDict[Path, tuple[StatSignature, str]] = OrderedDict()
+        self._formats: OrderedDict[Path, tuple[StatSignature, TextFormat]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read_text(self, path: Path) -> str:
+        signature = _signature(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        content, text_format = read_text_file(path)
+        # Re-stat after reading so a concurrent write is never cached as current.
+        if _signature(path) == signature:
+            self._put_format(path, signature, text_format)
+            self._put(path, signature, content)
+        return content
+
+    def text_format(self, path: Path) -> TextFormat:
+        """Return the on-disk format of ``path``; raises ``BinaryFileError`` for binary files."""
+        signature = _signature(path)
+        with self._lock:
+            entry = self._formats.get(path)
+            if entry is not None and entry[0] == signature:
+                self._formats.move_to_end(path)
+                return entry[1]
+        text_format = sniff_file(path)
+        if _signature(path) == signature:
+            self._put_format(path, signature, text_format)
+        return text_format
+
+    def store(
+        self, path: Path, content: str, text_format: TextFormat = DEFAULT_FORMAT
+    ) -> None:
+        """Record ``content`` as the current content of ``path`` (after a write)."""
+        try:
+            signature = _signature(path)
+        except OSError:
+            self.invalidate(path)
+            return
+        self._put_format(path, signature, text_format)
+        self._put(path, signature, content)
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            self._formats.pop(path, None)
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._size -= len(entry[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._formats.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, path: Path, signature: StatSignature, content: str) -> None:
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            if not self.max_entries or len(content) > self.max_bytes:
+                return
+            self._entries[path] = (signature, content)
+            self._size += len(content)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _put_format(
+        self, path: Path, signature: StatSignature, text_format: TextFormat
+    ) -> None:
+        with self._lock:
+            self._formats[path] = (signature, text_format)
+            self._formats.move_to_end(path)
+            if len(self._formats) > _FORMAT_ENTRIES:
+                self._formats.popitem(last=False)
+
+
+def _signature(path: Path) -> StatSignature:
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from pathlib import Path
+
+
+DEFAULT_HEAD_BYTES = 64 * 1024
+DEFAULT_TAIL_BYTES = 64 * 1024
+
+
+class OutputCapture:
+    """
+    Bounded capture of a process output stream.
+
+    Keeps the first ``head_bytes`` and the last ``tail_bytes`` of the stream
+    and counts everything dropped in between, so memory stays constant no
+    matter how much a command prints. When ``spill_dir`` is given, the full
+    stream is also written to a temporary file whose path is reported in the
+    truncation marker.
+    """
+
+    def __init__(
+        self,
+        head_bytes: int = DEFAULT_HEAD_BYTES,
+        tail_bytes: int = DEFAULT_TAIL_BYTES,
+        spill_dir: Path | None = None,
+        label: str = "output",
+    ) -> None:
+        self.head_bytes = max(head_bytes, 0)
+        self.tail_bytes = max(tail_bytes, 0)
+        self.spill_dir = spill_dir
+        self.label = label
+        self.total_bytes = 0
+        self.spill_path: Path | None = None
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._spill_file = None
+
+    @property
+    def dropped_bytes(self) -> int:
+        return max(self.total_bytes - len(self._head) - len(self._tail), 0)
+
+    def append(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.total_bytes += len(chunk)
+        if self.spill_dir is not None:
+            self._spill(chunk)
+
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk or self.tail_bytes == 0:
+            return
+        if len(chunk) >= self.tail_bytes:
+            self._tail[:] = chunk[-self.tail_bytes:]
+            return
+        self._tail += chunk
+        excess = len(self._tail) - self.tail_bytes
+        if excess > 0:
+            del self._tail[:excess]
+
+    def getvalue(self) -> bytes:
+        """Return the retained bytes, with a marker where output was dropped."""
+        dropped = self.dropped_bytes
+        if not dropped:
+            return bytes(self._head) + bytes(self._tail)
+        marker = f"\n... [{dropped} bytes of {self.label} truncated"
+        if self.spill_path is not None:
+            marker += f"; full {self.label} saved to {self.spill_path}"
+        marker += "] ...\n"
+        return bytes(self._head) + marker.encode("utf-8") + bytes(self._tail)
+
+    def close(self) -> None:
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self.spill_path is not None and not self.dropped_bytes:
+            # Nothing was truncated, so the spill file adds no information.
+            self.spill_path.unlink(missing_ok=True)
+            self.spill_path = None
+
+    def _spill(self, chunk: bytes) -> None:
+        if self._spill_file is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(
+                prefix=f"coding-agent-{self.label}-", suffix=".log", dir=self.spill_dir
+            )
+            self._spill_file = os.fdopen(fd, "wb")
+            self.spill_path = Path(name)
+        self._spill_file.write(chunk)
@@ -0,0 +1,110 @@
+import asyncio
+import codecs
+import time
+from collections.abc import Callable
+from typing import Any
+
+
+DEFAULT_STREAM_FLUSH_INTERVAL_SECONDS = 0.1
+DEFAULT_STREAM_MAX_BATCH_BYTES = 16 * 1024
+
+
+class ShellOutputStreamer:
+    """
+    Forwards shell output to a streaming client while a command is running.
+
+    Chunks are decoded incrementally and batched per stream. The first batch is
+    sent immediately so the client sees output within milliseconds; after that,
+    batches are flushed at most once per ``flush_interval`` seconds, or as soon
+    as ``max_batch_bytes`` have accumulated.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[dict[str, Any]], None],
+        call_id: str | None,
+        flush_interval: float = DEFAULT_STREAM_FLUSH_INTERVAL_SECONDS,
+        max_batch_bytes: int = DEFAULT_STREAM_MAX_BATCH_BYTES,
+    ) -> None:
+        self._sink = sink
+        self.call_id = call_id
+        self.flush_interval = max(flush_interval, 0.0)
+        self.max_batch_bytes = max(max_batch_bytes, 1)
+        self.command: str | None = None
+        self.command_index = 0
+        self.events_sent = 0
+        self._decoders: dict[str, codecs.IncrementalDecoder] = {}
+        self._pending: dict[str, list[str]] = {}
+        self._pending_bytes = 0
+        self._last_flush: float | None = None
+        self._timer: asyncio.TimerHandle | None = None
+
+    def begin_command(self, command: str, index: int) -> None:
+        self.flush()
+        self.command = command
+        self.command_index = index
+        self._decoders.clear()
+        self._last_flush = None
+
+    def feed(self, stream: str, chunk: bytes) -> None:
+        decoder = self._decoders.get(stream)
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+            self._decoders[stream] = decoder
+        text = decoder.decode(chunk)
+        if not text:
+            return
+        self._pending.setdefault(stream, []).append(text)
+        self._pending_bytes += len(chunk)
+
+        now = time.monotonic()
+        if (
+            self._last_flush is None
+            or self._pending_bytes >= self.max_batch_bytes
+            or now - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+        elif self._timer is None:
+            delay = self.flush_interval - (now - self._last_flush)
+            self._timer = asyncio.get_running_loop().call_later(delay, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        for stream, parts in pending.items():
+            self._sink(
+                {
+                    "type": "shell_output_delta",
+                    "call_id": self.call_id,
+                    "command_index": self.command_index,
+                    "command": self.command,
+                    "stream": stream,
+                    "delta": "".join(parts),
+                }
+            )
+            self.events_sent += 1
+
+
+def streamer_for_context(
+    ctx_wrapper: Any,
+    call_id: str | None,
+    flush_interval: float = DEFAULT_STREAM_FLUSH_INTERVAL_SECONDS,
+) -> ShellOutputStreamer | None:
+    """Return a streamer bound to the run's streaming context, if it has one."""
+    context = getattr(ctx_wrapper, "context", None)
+    # agency-swarm 1.2.x keeps it in the private ``_streaming_context``.
+    streaming_context = getattr(context, "streaming_context", None) or getattr(
+        context, "_streaming_context", None
+    )
+    event_queue = getattr(streaming_context, "event_queue", None)
+    if event_queue is None:
+        return None
+    return ShellOutputStreamer(
+        event_queue.put_nowait, call_id, flush_interval=flush_interval
+    )
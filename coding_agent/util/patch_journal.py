@@ -0,0 +1,218 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import logging
+import os
+import shutil
+from collections.abc import Mapping
+from pathlib import Path
+
+from .atomic_write import (
+    DEFAULT_DURABILITY,
+    DURABILITY_NONE,
+    atomic_delete,
+    atomic_write_bytes,
+    fsync_directory,
+)
+
+
+MANIFEST_NAME = "manifest.json"
+STATE_PREPARED = "prepared"
+STATE_APPLYING = "applying"
+
+logger = logging.getLogger(__name__)
+
+
+class PatchJournal:
+    """
+    Write-ahead journal for multi-file workspace changes.
+
+    ``apply`` first records, per file, the pre-image (current content or
+    absence) and the post-image in a transaction directory, then marks the
+    transaction ``applying``, writes every file atomically and finally drops
+    the transaction. A transaction found on disk later was interrupted:
+    ``recover`` replays ``applying`` transactions (all post-images are in
+    the journal) and discards ``prepared`` ones (no file was touched yet).
+    ``rollback`` restores the pre-images of an interrupted transaction instead.
+
+    The journal must survive a reboot, so it defaults to the user's state
+    directory rather than a (often tmpfs) temp directory. Transactions record
+    the workspace ``root`` they belong to; with a ``root``, ``recover`` only
+    touches that workspace's transactions.
+    """
+
+    def __init__(
+        self,
+        journal_dir: Path | None = None,
+        durability: str = DEFAULT_DURABILITY,
+        root: Path | None = None,
+    ) -> None:
+        self.journal_dir = Path(journal_dir or default_journal_dir())
+        self.durability = durability
+        self.root = Path(root) if root is not None else None
+        self._ids = itertools.count(1)
+
+    def apply(self, changes: Mapping[Path, bytes | None]) -> None:
+        """Write ``changes`` (``None`` deletes the file) all-or-nothing."""
+        if not changes:
+            return
+        transaction = self._prepare(changes)
+        self._set_state(transaction, STATE_APPLYING)
+        try:
+            self._write_images(transaction, "after")
+        except BaseException:
+            logger.warning("Patch transaction %s failed; rolling back.", transaction.name)
+            self._write_images(transaction, "before")
+            self._discard(transaction)
+            raise
+        self._discard(transaction)
+
+    def pending(self) -> list[Path]:
+        if not self.journal_dir.is_dir():
+            return []
+        return sorted(
+            path
+            for path in self.journal_dir.iterdir()
+            if (path / MANIFEST_NAME).is_file()
+        )
+
+    def recover(self) -> list[str]:
+        """Finish or discard interrupted transactions; return the replayed ids."""
+        replayed = []
+        for transaction in self.pending():
+            if _owner_alive(transaction):
+                continue
+            manifest = _read_manifest(transaction)
+            if (
+                self.root is not None
+                and manifest is not None
+                and manifest.get("root") != str(self.root)
+            ):
+                continue  # Another workspace's transaction.
+            if manifest is not None and manifest.get("state") == STATE_APPLYING:
+                self.replay(transaction)
+                replayed.append(transaction.name)
+            else:
+                self._discard(transaction)
+        return replayed
+
+    def replay(self, transaction: Path) -> None:
+        self._write_images(transaction, "after")
+        self._discard(transaction)
+
+    def rollback(self, transaction: Path) -> None:
+        self._write_images(transaction, "before")
+        self._discard(transaction)
+
+    def _prepare(self, changes: Mapping[Path, bytes | None]) -> Path:
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        transaction = self.journal_dir / f"txn-{os.getpid()}-{next(self._ids)}"
+        transaction.mkdir()
+        try:
+            entries = []
+            for index, (path, content) in enumerate(changes.items()):
+                path = Path(path)
+                try:
+                    before = path.read_bytes()
+                except FileNotFoundError:
+                    before = None
+                entries.append(
+                    {
+                        "path": str(path),
+                        "before": self._store_blob(
+                            transaction, f"{index}.before", before
+                        ),
+                        "after": self._store_blob(
+                            transaction, f"{index}.after", content
+                        ),
+                    }
+                )
+            manifest = {
+                "state": STATE_PREPARED,
+                "root": str(self.root) if self.root is not None else None,
+                "entries": entries,
+            }
+            atomic_write_bytes(
+                transaction / MANIFEST_NAME,
+                json.dumps(manifest).encode("utf-8"),
+                self.durability,
+            )
+        except BaseException:
+            shutil.rmtree(transaction, ignore_errors=True)
+            raise
+        return transaction
+
+    def _store_blob(self, transaction: Path, name: str, content: bytes | None) -> dict | None:
+        if content is None:
+            return None
+        blob = transaction / name
+        with open(blob, "wb") as handle:
+            handle.write(content)
+            if self.durability != DURABILITY_NONE:
+                handle.flush()
+                os.fsync(handle.fileno())
+        return {"blob": name, "sha256": hashlib.sha256(content).hexdigest()}
+
+    def _set_state(self, transaction: Path, state: str) -> None:
+        manifest = _read_manifest(transaction) or {"entries": []}
+        manifest["state"] = state
+        atomic_write_bytes(
+            transaction / MANIFEST_NAME,
+            json.dumps(manifest).encode("utf-8"),
+            self.durability,
+        )
+
+    def _write_images(self, transaction: Path, side: str) -> None:
+        manifest = _read_manifest(transaction)
+        if manifest is None:
+            return
+        for entry in manifest["entries"]:
+            target = Path(entry["path"])
+            image = entry[side]
+            if image is None:
+                atomic_delete(target, self.durability)
+                continue
+            content = (transaction / image["blob"]).read_bytes()
+            if hashlib.sha256(content).hexdigest() != image["sha256"]:
+                raise RuntimeError(
+                    f"Corrupt journal blob for {target} in {transaction.name}"
+                )
+            target.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_bytes(target, content, self.durability)
+
+    def _discard(self, transaction: Path) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            (transaction / MANIFEST_NAME).unlink()
+        shutil.rmtree(transaction, ignore_errors=True)
+        if self.durability != DURABILITY_NONE:
+            fsync_directory(self.journal_dir)
+
+
+def default_journal_dir() -> Path:
+    state_home = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(state_home) / "coding-agent" / "journal"
+
+
+def _read_manifest(transaction: Path) -> dict | None:
+    try:
+        return json.loads((transaction / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _owner_alive(transaction: Path) -> bool:
+    # Transactions are named txn-<pid>-<n>; skip ones a live process is applying.
+    try:
+        pid = int(transaction.name.split("-")[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,294 @@
+import contextlib
+import itertools
+import logging
+import os
+import resource
+import signal
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+
+CGROUP_V2_MOUNT = Path("/sys/fs/cgroup")
+_ALLOCATION_FAILURE_MARKERS = (
+    b"MemoryError",
+    b"Cannot allocate memory",
+    b"out of memory",
+    b"bad_alloc",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True, frozen=True)
+class ResourceLimits:
+    memory_mb: int | None = None
+    cpu_seconds: int | None = None
+    pids: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            value is not None for value in (self.memory_mb, self.cpu_seconds, self.pids)
+        )
+
+
+class LimitedCommand:
+    """
+    Limits applied to one spawned process: a ``preexec_fn`` to pass to the
+    subprocess call and a post-exit check that explains limit kills.
+    """
+
+    def __init__(
+        self, limits: ResourceLimits, cgroup: Path | None, backend: str
+    ) -> None:
+        self.limits = limits
+        self.cgroup = cgroup
+        self.backend = backend
+        self._baseline = _read_cgroup_events(cgroup)
+
+    def mark(self) -> None:
+        """Start a new command in the same process (e.g. a pooled shell)."""
+        self._baseline = _read_cgroup_events(self.cgroup)
+
+    @property
+    def preexec_fn(self) -> Callable[[], None] | None:
+        if not self.limits.enabled:
+            return None
+        limits = self.limits
+        procs_file = str(self.cgroup / "cgroup.procs") if self.cgroup else None
+
+        def _apply() -> None:
+            # Runs in the forked child before exec: keep it syscall-only.
+            if procs_file is not None:
+                with open(procs_file, "w") as handle:
+                    handle.write("0")
+            elif limits.memory_mb is not None:
+                limit_bytes = limits.memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+            if limits.cpu_seconds is not None:
+                # SIGXCPU at the soft limit, SIGKILL one second later.
+                resource.setrlimit(
+                    resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1)
+                )
+
+        return _apply
+
+    def violation(
+        self,
+        exit_code: int | None,
+        timed_out: bool = False,
+        stderr: bytes = b"",
+        cpu_seconds: float | None = None,
+    ) -> str | None:
+        """
+        Describe which limit terminated the process, if any.
+
+        ``cpu_seconds`` is the CPU time the command used; a kill is only
+        blamed on the CPU limit when it reached that limit.
+        """
+        events = _read_cgroup_events(self.cgroup)
+        if events.get("oom_kill", 0) > self._baseline.get("oom_kill", 0):
+            return (
+                f"Command was killed after exceeding the memory limit of "
+                f"{self.limits.memory_mb} MB."
+            )
+        if events.get("pids_max", 0) > self._baseline.get("pids_max", 0):
+            return (
+                f"Command hit the process limit of {self.limits.pids} and could "
+                "not start more processes."
+            )
+        if (
+            self.limits.cpu_seconds is not None
+            and exit_code is not None
+            and cpu_seconds is not None
+            # Accounting is tick-based; allow for one tick of rounding.
+            and cpu_seconds >= self.limits.cpu_seconds - 0.01
+        ):
+            # SIGKILL is the hard CPU limit unless a watchdog killed the command.
+            if _killed_by(exit_code, signal.SIGXCPU) or (
+                not timed_out and _killed_by(exit_code, signal.SIGKILL)
+            ):
+                return (
+                    f"Command was terminated after using more than "
+                    f"{self.limits.cpu_seconds} seconds of CPU time."
+                )
+        if (
+            self.backend == "rlimit"
+            and self.limits.memory_mb is not None
+            and exit_code not in (None, 0)
+            and any(marker in stderr for marker in _ALLOCATION_FAILURE_MARKERS)
+        ):
+            return (
+                f"Command failed to allocate memory while limited to "
+                f"{self.limits.memory_mb} MB of address space."
+            )
+        return None
+
+    def cleanup(self) -> None:
+        if self.cgroup is not None:
+            with contextlib.suppress(OSError):
+                self.cgroup.rmdir()
+
+
+class ResourceLimiter:
+    """
+    Applies per-command and per-session resource caps to shell commands.
+
+    With a writable cgroup v2 hierarchy, the executor gets a session cgroup
+    (``memory.max``/``pids.max`` from ``session_limits``) and every
+    command runs in a child cgroup with ``command_limits``; kills are detected
+    from ``memory.events`` and ``pids.events``. Without cgroup v2 the limiter
+    falls back to ``setrlimit``: ``RLIMIT_AS`` for memory and ``RLIMIT_CPU``
+    for CPU time. Pids and per-session caps need cgroups and are skipped in
+    that mode. CPU time is always capped with ``RLIMIT_CPU``.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        command_limits: ResourceLimits,
+        session_limits: ResourceLimits | None = None,
+        cgroup_root: Path | None = None,
+    ) -> None:
+        self.command_limits = command_limits
+        self.session_limits = session_limits or ResourceLimits()
+        self._session_cgroup: Path | None = None
+        self._children = itertools.count(1)
+        self.backend = "none"
+        if not (self.command_limits.enabled or self.session_limits.enabled):
+            return
+        self._session_cgroup = self._create_session_cgroup(cgroup_root)
+        self.backend = "cgroup" if self._session_cgroup is not None else "rlimit"
+        if self.backend == "rlimit":
+            skipped = [
+                name
+                for name, value in (
+                    ("pids", self.command_limits.pids),
+                    ("session memory", self.session_limits.memory_mb),
+                    ("session pids", self.session_limits.pids),
+                )
+                if value is not None
+            ]
+            if skipped:
+                logger.warning(
+                    "cgroup v2 is not available; ignoring %s limits.",
+                    ", ".join(skipped),
+                )
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "none"
+
+    def limit_command(self, label: str = "cmd") -> LimitedCommand:
+        return self._limited(label, self.command_limits)
+
+    def limit_shell(self, label: str = "session") -> LimitedCommand:
+        """
+        Limits for a long-lived shell that runs many commands one at a time.
+
+        The shell gets the memory and pids caps (the tighter of the command
+        and session limits), so each command it runs is still bounded, but
+        no CPU limit: ``RLIMIT_CPU`` would add up across every command the
+        shell runs.
+        """
+        limits = ResourceLimits(
+            memory_mb=_tighter(self.command_limits.memory_mb, self.session_limits.memory_mb),
+            pids=_tighter(self.command_limits.pids, self.session_limits.pids),
+        )
+        return self._limited(label, limits)
+
+    def _limited(self, label: str, limits: ResourceLimits) -> LimitedCommand:
+        cgroup = None
+        if self._session_cgroup is not None:
+            cgroup = self._session_cgroup / f"{label}-{next(self._children)}"
+            try:
+                cgroup.mkdir()
+                _write_cgroup_limits(cgroup, limits)
+            except OSError:
+                logger.warning("Could not create command cgroup %s.", cgroup)
+                with contextlib.suppress(OSError):
+                    cgroup.rmdir()
+                cgroup = None
+        backend = "cgroup" if cgroup is not None else "rlimit"
+        return LimitedCommand(limits, cgroup, backend)
+
+    def close(self) -> None:
+        """Remove the session cgroup once all of its command cgroups are gone."""
+        if self._session_cgroup is None:
+            return
+        for child in self._session_cgroup.iterdir():
+            if child.is_dir():
+                with contextlib.suppress(OSError):
+                    child.rmdir()
+        with contextlib.suppress(OSError):
+            self._session_cgroup.rmdir()
+
+    def _create_session_cgroup(self, cgroup_root: Path | None) -> Path | None:
+        base = cgroup_root or _own_cgroup_v2()
+        if base is None:
+            return None
+        session = base / f"coding-agent-{os.getpid()}-{next(self._ids)}"
+        try:
+            session.mkdir(exist_ok=True)
+            _write_cgroup_limits(session, self.session_limits)
+            controllers = (session / "cgroup.controllers").read_text().split()
+            wanted = [c for c in ("memory", "pids") if c in controllers]
+            (session / "cgroup.subtree_control").write_text(
+                " ".join(f"+{controller}" for controller in wanted)
+            )
+        except OSError as exc:
+            logger.info("cgroup v2 limits unavailable (%s); using rlimits.", exc)
+            with contextlib.suppress(OSError):
+                session.rmdir()
+            return None
+        return session
+
+
+def _own_cgroup_v2() -> Path | None:
+    if not (CGROUP_V2_MOUNT / "cgroup.controllers").exists():
+        return None
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                return CGROUP_V2_MOUNT / line[3:].lstrip("/")
+    except OSError:
+        return None
+    return None
+
+
+def _write_cgroup_limits(cgroup: Path, limits: ResourceLimits) -> None:
+    if limits.memory_mb is not None:
+        (cgroup / "memory.max").write_text(str(limits.memory_mb * 1024 * 1024))
+        with contextlib.suppress(OSError):
+            (cgroup / "memory.swap.max").write_text("0")
+    if limits.pids is not None:
+        (cgroup / "pids.max").write_text(str(limits.pids))
+
+
+def _read_cgroup_events(cgroup: Path | None) -> dict[str, int]:
+    if cgroup is None:
+        return {}
+    events: dict[str, int] = {}
+    for filename, prefix in (("memory.events", ""), ("pids.events", "pids_")):
+        try:
+            lines = (cgroup / filename).read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, _, value = line.partition(" ")
+            with contextlib.suppress(ValueError):
+                events[f"{prefix}{key}"] = int(value)
+    return events
+
+
+def _tighter(first: int | None, second: int | None) -> int | None:
+    if first is None or second is None:
+        return first if second is None else second
+    return min(first, second)
+
+
+def _killed_by(exit_code: int, sig: signal.Signals) -> bool:
+    # asyncio reports signals as negative codes; /bin/sh reports 128 + signal.
+    return exit_code in (-sig, 128 + sig)
@@ -0,0 +1,85 @@
+import resource
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+_MAXRSS_TO_KB = 1 / 1024 if sys.platform == "darwin" else 1
+
+
+@dataclass(slots=True)
+class ResourceUsage:
+    wall_seconds: float
+    user_cpu_seconds: float | None
+    system_cpu_seconds: float | None
+    max_rss_kb: int | None
+    stdout_bytes: int
+    stderr_bytes: int
+    attribution: str
+
+    def as_dict(self) -> dict[str, object]:
+        return asdict(self)
+
+
+class ResourceMeter:
+    """
+    Measures wall clock and child rusage for one command.
+
+    CPU time comes from the ``RUSAGE_CHILDREN`` delta across the command, which
+    is exact only when no other child was reaped in between. Meters track
+    whether their lifetime overlapped another meter and report
+    ``attribution="shared"`` in that case so callers can discount the numbers.
+    ``max_rss_kb`` is only reported when the command raised the process-wide
+    children high-water mark, which is the only case where it is attributable.
+    Commands run inside a pooled shell are reaped by that shell, so their CPU
+    and RSS are unavailable (``attribution="unavailable"``).
+    """
+
+    _active = 0
+    _started = 0
+
+    def __init__(self, reaped_by_us: bool = True) -> None:
+        self.reaped_by_us = reaped_by_us
+        self._wall_start = time.perf_counter()
+        self._usage_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._overlapped = ResourceMeter._active > 0
+        ResourceMeter._active += 1
+        ResourceMeter._started += 1
+        self._started_snapshot = ResourceMeter._started
+        self._stopped = False
+
+    def close(self) -> None:
+        """Release the meter without producing a measurement (e.g. on cancel)."""
+        if not self._stopped:
+            self._stopped = True
+            ResourceMeter._active -= 1
+
+    def stop(self, stdout_bytes: int, stderr_bytes: int) -> ResourceUsage:
+        wall = time.perf_counter() - self._wall_start
+        self.close()
+        overlapped = (
+            self._overlapped or ResourceMeter._started != self._started_snapshot
+        )
+
+        user = system = None
+        max_rss = None
+        if self.reaped_by_us:
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            user = round(usage.ru_utime - self._usage_start.ru_utime, 6)
+            system = round(usage.ru_stime - self._usage_start.ru_stime, 6)
+            if usage.ru_maxrss > self._usage_start.ru_maxrss:
+                max_rss = int(usage.ru_maxrss * _MAXRSS_TO_KB)
+            attribution = "shared" if overlapped else "exclusive"
+        else:
+            attribution = "unavailable"
+
+        return ResourceUsage(
+            wall_seconds=round(wall, 6),
+            user_cpu_seconds=user,
+            system_cpu_seconds=system,
+            max_rss_kb=max_rss,
+            stdout_bytes=stdout_bytes,
+            stderr_bytes=stderr_bytes,
+            attribution=attribution,
+        )
@@ -0,0 +1,118 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, Protocol, TypeVar
+
+
+DEFAULT_MAX_SESSIONS = 1024
+DEFAULT_SESSION_IDLE_SECONDS = 60 * 60
+
+T = TypeVar("T")
+
+
+class SessionScoped(Protocol):
+    """Anything holding per-session entries that can be dropped by key."""
+
+    def __contains__(self, key: Hashable) -> bool: ...
+
+    def discard(self, key: Hashable) -> None: ...
+
+
+class SessionStateStore(Generic[T]):
+    """
+    Per-conversation state for objects shared by many sessions (agent hooks).
+
+    State is created on first use by ``factory`` and kept in an LRU bounded to
+    ``max_sessions``; sessions idle for more than ``idle_seconds`` are
+    dropped on the next access, and ``on_evict`` is called with the key and
+    state of every dropped or discarded session. Hook callbacks update their state without
+    awaiting in between, so each update is atomic on the event loop; the
+    lock additionally covers hooks called from worker threads.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_SESSION_IDLE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Callable[[Hashable, T], None] | None = None,
+    ) -> None:
+        self.factory = factory
+        self.max_sessions = max(max_sessions, 1)
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self.on_evict = on_evict
+        self._sessions: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> T:
+        now = self._clock()
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+            state = entry[1] if entry is not None else self.factory()
+            self._sessions[key] = (now, state)
+            evicted = self._evict(now)
+        self._notify(evicted)
+        return state
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry is not None:
+            self._notify([(key, entry[1])])
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float) -> list[tuple[Hashable, T]]:
+        # Entries are in last-used order, so idle ones are at the front.
+        evicted = []
+        while len(self._sessions) > self.max_sessions:
+            key, (_, state) = self._sessions.popitem(last=False)
+            evicted.append((key, state))
+        cutoff = now - self.idle_seconds
+        while self._sessions:
+            last_used, _ = next(iter(self._sessions.values()))
+            if last_used >= cutoff:
+                break
+            key, (_, state) = self._sessions.popitem(last=False)
+            evicted.append((key, state))
+        return evicted
+
+    def _notify(self, evicted: list[tuple[Hashable, T]]) -> None:
+        # Outside the lock: callbacks may do I/O or touch the store.
+        if self.on_evict is None:
+            return
+        for key, state in evicted:
+            self.on_evict(key, state)
+
+
+def session_key(context, store: SessionScoped | None = None) -> Hashable:
+    """
+    Key identifying the conversation of a hook ``context``.
+
+    Agency runs share one ThreadManager per conversation, so its identity is
+    the key. When ``store`` is given, the entry is discarded as soon as the
+    thread manager is garbage collected, before its id can be reused. Runs
+    without a thread manager fall back to the run id.
+    """
+    shared = getattr(context, "context", context)
+    thread_manager = getattr(shared, "thread_manager", None)
+    if thread_manager is not None:
+        key = ("thread", id(thread_manager))
+        if store is not None and key not in store:
+            try:
+                weakref.finalize(thread_manager, store.discard, key)
+            except TypeError:
+                pass  # Not weak-referenceable; idle eviction still applies.
+        return key
+    run_id = getattr(shared, "_current_agent_run_id", None)
+    if run_id:
+        return ("run", run_id)
+    return ("context", id(shared))
@@ -0,0 +1,373 @@
+import asyncio
+import contextlib
+import os
+import shlex
+import shutil
+import signal
+import tempfile
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from .resource_limits import LimitedCommand
+
+
+DEFAULT_SESSION_POOL_SIZE = 4
+_READ_CHUNK_SIZE = 4096
+
+
+class _SentinelStream:
+    """
+    Reads one command's framing from a long-lived shell pipe.
+
+    Behaves like ``asyncio.StreamReader.read`` for the duration of a single
+    command and reports EOF once the command's sentinel has been consumed (or
+    the shell itself has exited).
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, sentinel: bytes) -> None:
+        self._reader = reader
+        self._sentinel = sentinel
+        self._buffer = b""
+        self._done = asyncio.Event()
+        self.trailer: bytes | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    async def wait_finished(self) -> None:
+        await self._done.wait()
+
+    async def read(self, n: int = -1) -> bytes:
+        while not self._done.is_set():
+            index = self._buffer.find(self._sentinel)
+            if index != -1:
+                data = self._buffer[:index]
+                remainder = self._buffer[index + len(self._sentinel):]
+                self._buffer = b""
+                self.trailer = await self._read_trailer(remainder)
+                self._done.set()
+                if data:
+                    return data
+                break
+
+            # Hold back a possible partial sentinel at the end of the buffer.
+            keep = len(self._sentinel) - 1
+            if len(self._buffer) > keep:
+                data = self._buffer[:-keep] if keep else self._buffer
+                self._buffer = self._buffer[len(data):]
+                return data
+
+            chunk = await self._reader.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                data, self._buffer = self._buffer, b""
+                self._done.set()
+                if data:
+                    return data
+                break
+            self._buffer += chunk
+        return b""
+
+    async def _read_trailer(self, remainder: bytes) -> bytes:
+        while b"\n" not in remainder:
+            chunk = await self._reader.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            remainder += chunk
+        return remainder.split(b"\n", 1)[0]
+
+
+class _CommandFifo:
+    """
+    A FIFO one output stream of one command is redirected to.
+
+    The read end is attached to the event loop. A write end is held open as
+    well until the shell reports the command done, so the reader cannot see
+    EOF before the shell opened the FIFO; afterwards EOF arrives once the
+    command and every background job that inherited the stream closed it,
+    exactly like the stdout pipe of a fresh ``/bin/sh -c``.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        os.mkfifo(path, 0o600)
+        self.reader = asyncio.StreamReader()
+        self._read_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self._hold_fd: int | None = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+
+    async def connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(self.reader),
+            os.fdopen(self._read_fd, "rb", buffering=0),
+        )
+
+    def release(self) -> None:
+        if self._hold_fd is not None:
+            os.close(self._hold_fd)
+            self._hold_fd = None
+        with contextlib.suppress(OSError):
+            self.path.unlink()
+
+
+class SessionProcess:
+    """
+    Process-like handle for a single command running inside a ``ShellSession``.
+
+    Exposes the subset of ``asyncio.subprocess.Process`` used by the shell
+    executor (``stdout``, ``stderr``, ``pid``, ``returncode``, ``wait`` and
+    ``kill``) so the same watchdog code can monitor pooled commands. Output
+    goes through per-command FIFOs; the shell's own stdout only carries the
+    sentinel with the exit code, so output of background jobs never leaks
+    into the next command run by the session.
+    """
+
+    def __init__(self, session: "ShellSession", sentinel: bytes, fifo_prefix: Path) -> None:
+        self._session = session
+        self._control = _SentinelStream(session.process.stdout, sentinel + b":")
+        self._fifos = [
+            _CommandFifo(fifo_prefix.with_suffix(".out")),
+            _CommandFifo(fifo_prefix.with_suffix(".err")),
+        ]
+        self.stdout = self._fifos[0].reader
+        self.stderr = self._fifos[1].reader
+        self._watcher: asyncio.Future | None = None
+
+    async def open(self) -> None:
+        try:
+            for fifo in self._fifos:
+                await fifo.connect()
+        except BaseException:
+            self._release_fifos()
+            raise
+        self._watcher = asyncio.ensure_future(self._watch_control())
+
+    @property
+    def stdout_path(self) -> Path:
+        return self._fifos[0].path
+
+    @property
+    def stderr_path(self) -> Path:
+        return self._fifos[1].path
+
+    @property
+    def pid(self) -> int:
+        return self._session.process.pid
+
+    @property
+    def returncode(self) -> int | None:
+        if self._control.finished and self._control.trailer:
+            with contextlib.suppress(ValueError):
+                return int(self._control.trailer.strip())
+        return self._session.process.returncode
+
+    @property
+    def finished(self) -> bool:
+        """True once the shell is done with the command (sentinel seen or shell gone)."""
+        return self._control.finished
+
+    @property
+    def completed(self) -> bool:
+        """True when the sentinel was seen, i.e. the shell is ready for more."""
+        return self._control.trailer is not None
+
+    async def wait(self) -> int | None:
+        # Also watch the shell itself so a detached or killed command can
+        # still be reaped.
+        finished = asyncio.ensure_future(self._control.wait_finished())
+        try:
+            await asyncio.wait(
+                {finished, self._session.exited},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            finished.cancel()
+        if self._control.trailer is None:
+            # The shell exited before printing the sentinel (e.g. ``exit 3``).
+            await self._session.exited
+        return self.returncode
+
+    def kill(self) -> None:
+        self._session.kill()
+
+    async def _watch_control(self) -> None:
+        try:
+            while await self._control.read():
+                pass  # Command output never goes to the shell's own stdout.
+        finally:
+            self._release_fifos()
+
+    def _release_fifos(self) -> None:
+        for fifo in self._fifos:
+            fifo.release()
+
+
+class ShellSession:
+    """A warm, long-lived shell process that runs commands one at a time."""
+
+    def __init__(
+        self, process: asyncio.subprocess.Process, limits: LimitedCommand | None = None
+    ) -> None:
+        self.process = process
+        # Resource limits the shell was spawned with; its cgroup (if any)
+        # reports limit kills of every command the shell runs.
+        self.limits = limits
+        self.exited: asyncio.Future[int] = asyncio.ensure_future(process.wait())
+        self.current: SessionProcess | None = None
+        self.commands_run = 0
+        self.fifo_dir = Path(tempfile.mkdtemp(prefix="coding-agent-session-"))
+        self.exited.add_done_callback(self._cleanup)
+
+    @classmethod
+    async def spawn(
+        cls,
+        cwd: Path,
+        env: dict[str, str],
+        shell: str,
+        limits: LimitedCommand | None = None,
+    ) -> "ShellSession":
+        process = await asyncio.create_subprocess_exec(
+            shell,
+            *_shell_arguments(shell),
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            # Commands write to their own FIFOs; errors of eval itself too.
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+            preexec_fn=limits.preexec_fn if limits else None,
+        )
+        return cls(process, limits)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None and not self.exited.done()
+
+    @property
+    def idle(self) -> bool:
+        return self.current is None or self.current.completed
+
+    @property
+    def finished(self) -> bool:
+        return self.current is None or self.current.finished
+
+    async def start(self, command: str) -> SessionProcess:
+        """Send ``command`` to the shell, framed by a unique sentinel."""
+        if not self.alive or self.process.stdin is None:
+            raise RuntimeError("Shell session is no longer running.")
+        sentinel = f"__CODING_AGENT_{uuid.uuid4().hex}__"
+        self.commands_run += 1
+        current = SessionProcess(
+            self, sentinel.encode("ascii"), self.fifo_dir / str(self.commands_run)
+        )
+        await current.open()
+        self.current = current
+        script = (
+            f"eval {shlex.quote(command)} < /dev/null"
+            f" > {shlex.quote(str(current.stdout_path))}"
+            f" 2> {shlex.quote(str(current.stderr_path))}\n"
+            "__coding_agent_rc=$?\n"
+            f"printf '%s:%s\\n' '{sentinel}' \"$__coding_agent_rc\"\n"
+        )
+        self.process.stdin.write(script.encode("utf-8"))
+        await self.process.stdin.drain()
+        return current
+
+    def detach(self) -> None:
+        """Let the current command finish on its own and then exit the shell."""
+        if self.process.stdin is not None and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+
+    def kill(self) -> None:
+        with contextlib.suppress(ProcessLookupError, PermissionError):
+            os.killpg(self.process.pid, signal.SIGKILL)
+
+    def _cleanup(self, _exited: asyncio.Future) -> None:
+        shutil.rmtree(self.fifo_dir, ignore_errors=True)
+        if self.limits is not None:
+            self.limits.cleanup()
+
+
+class ShellSessionPool:
+    """
+    Pool of warm shell sessions for a single workspace.
+
+    Sessions keep their working directory and exported variables between
+    commands. A session is only handed back to the pool when its last command
+    finished cleanly; sessions whose command was killed, detached, or which
+    exited are discarded and replaced lazily.
+    """
+
+    def __init__(
+        self,
+        cwd: Path,
+        max_sessions: int = DEFAULT_SESSION_POOL_SIZE,
+        shell: str | None = None,
+        limits_factory: Callable[[], LimitedCommand | None] | None = None,
+    ) -> None:
+        self.cwd = Path(cwd)
+        # Called once per spawned session to apply resource limits.
+        self.limits_factory = limits_factory
+        self.max_sessions = max(1, max_sessions)
+        self.shell = shell or shutil.which("bash") or "/bin/sh"
+        self._idle: list[ShellSession] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.spawned = 0
+        self.reused = 0
+
+    async def acquire(self, env: dict[str, str]) -> ShellSession:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Subprocess transports are bound to the loop that created them.
+            self._discard_all()
+            self._loop = loop
+
+        while self._idle:
+            session = self._idle.pop()
+            if session.alive:
+                self.reused += 1
+                return session
+        self.spawned += 1
+        limits = self.limits_factory() if self.limits_factory else None
+        try:
+            return await ShellSession.spawn(self.cwd, env, self.shell, limits)
+        except BaseException:
+            if limits is not None:
+                limits.cleanup()
+            raise
+
+    def release(self, session: ShellSession) -> None:
+        if not session.alive:
+            return
+        if not session.finished:
+            # The command is still running (detached after a timeout).
+            session.detach()
+            return
+        if not session.idle:
+            session.kill()
+            return
+        if len(self._idle) >= self.max_sessions:
+            session.kill()
+            return
+        self._idle.append(session)
+
+    async def aclose(self) -> None:
+        """Kill every idle session owned by the pool and wait for them to exit."""
+        sessions = list(self._idle)
+        self._discard_all()
+        for session in sessions:
+            with contextlib.suppress(ProcessLookupError):
+                await session.exited
+
+    def _discard_all(self) -> None:
+        for session in self._idle:
+            session.kill()
+        self._idle.clear()
+
+
+def _shell_arguments(shell: str) -> list[str]:
+    if os.path.basename(shell) == "bash":
+        return ["--noprofile", "--norc"]
+    return []
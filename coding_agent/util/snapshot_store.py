@@ -0,0 +1,321 @@
+import contextlib
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+import weakref
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+try:  # Optional: compress blobs when the zstandard package is installed.
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+DEFAULT_HISTORY_LIMIT = 200
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_COPY_BLOCK_BYTES = 1024 * 1024
+_ZSTD_SUFFIX = ".zst"
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotConflict(RuntimeError):
+    """Raised when a file changed after the edit that is being undone or redone."""
+
+
+class BlobStore:
+    """
+    Content-addressed, deduplicating blob directory.
+
+    Blobs are stored under their SHA-256 digest (``ab/cdef...``), so storing
+    the same content twice costs one hash. With ``compress=True`` and the
+    ``zstandard`` package available, blobs are written zstd-compressed.
+    """
+
+    def __init__(self, root: Path, compress: bool = False) -> None:
+        self.root = Path(root)
+        if compress and zstandard is None:
+            logger.warning("zstandard is not installed; snapshot blobs are stored uncompressed.")
+            compress = False
+        self.compress = compress
+
+    def put_file(self, path: Path) -> str:
+        """Store the content of ``path`` without loading it whole; return its digest."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_name = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with open(path, "rb") as source, os.fdopen(fd, "wb") as raw:
+                compressor = None
+                if self.compress:
+                    compressor = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+                sink = compressor or raw
+                while block := source.read(_COPY_BLOCK_BYTES):
+                    digest.update(block)
+                    sink.write(block)
+                if compressor is not None:
+                    compressor.close()
+            key = digest.hexdigest()
+            blob = self._path(key, self.compress)
+            if self.exists(key):
+                os.unlink(temp_name)
+            else:
+                blob.parent.mkdir(exist_ok=True)
+                os.replace(temp_name, blob)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_name)
+            raise
+        return key
+
+    def restore(self, key: str, target: Path) -> None:
+        """Write blob ``key`` to ``target`` atomically."""
+        compressed = self._path(key, True)
+        source_path = compressed if compressed.exists() else self._path(key, False)
+        fd, temp_name = tempfile.mkstemp(
+            prefix=f".{target.name}.", suffix=".tmp", dir=target.parent
+        )
+        try:
+            with open(source_path, "rb") as raw, os.fdopen(fd, "wb") as output:
+                source = raw
+                if source_path == compressed:
+                    source = zstandard.ZstdDecompressor().stream_reader(raw)
+                while block := source.read(_COPY_BLOCK_BYTES):
+                    output.write(block)
+            with contextlib.suppress(FileNotFoundError):
+                os.chmod(temp_name, target.stat().st_mode & 0o7777)
+            os.replace(temp_name, target)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_name)
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._path(key, True).exists() or self._path(key, False).exists()
+
+    def size(self, key: str) -> int:
+        for path in (self._path(key, True), self._path(key, False)):
+            with contextlib.suppress(FileNotFoundError):
+                return path.stat().st_size
+        return 0
+
+    def delete(self, key: str) -> None:
+        for path in (self._path(key, True), self._path(key, False)):
+            path.unlink(missing_ok=True)
+
+    def keys(self) -> Iterator[str]:
+        if not self.root.is_dir():
+            return
+        for bucket in self.root.iterdir():
+            if bucket.is_dir():
+                for blob in bucket.iterdir():
+                    yield bucket.name + blob.name.removesuffix(_ZSTD_SUFFIX)
+
+    def _path(self, key: str, compressed: bool) -> Path:
+        suffix = _ZSTD_SUFFIX if compressed else ""
+        return self.root / key[:2] / f"{key[2:]}{suffix}"
+
+
+@dataclass(slots=True)
+class FileChange:
+    path: Path
+    before: str | None
+    after: str | None
+    # (inode, mtime_ns, size) before and after the edit; None when absent.
+    before_signature: tuple[int, int, int] | None = None
+    after_signature: tuple[int, int, int] | None = None
+
+
+@dataclass(slots=True)
+class EditRecord:
+    edit_id: int
+    label: str
+    created_at: float
+    changes: list[FileChange] = field(default_factory=list)
+
+    def blob_keys(self) -> set[str]:
+        return {
+            key
+            for change in self.changes
+            for key in (change.before, change.after)
+            if key is not None
+        }
+
+
+class SnapshotStore:
+    """
+    Undo/redo history of workspace edits backed by a :class:`BlobStore`.
+
+    ``track`` captures the pre-image of every file an edit touches and, once
+    the edit succeeded, its post-image; one tracked edit (a single patch
+    operation or a whole batch) is one undo step. Undo and redo restore the
+    recorded blobs directly, so reverting costs one file copy per touched
+    file regardless of workspace size. A step is refused when the file's
+    stat signature no longer matches the state the step expects, i.e. it
+    was changed outside the history. ``collect`` drops history older than
+    ``max_age_seconds`` or beyond ``max_bytes`` of blobs and deletes
+    unreferenced blobs; it runs after every tracked edit, so the blobs never
+    stay above ``max_bytes``.
+
+    The history only lives in memory, so every store writes its blobs to
+    its own directory under ``root`` and removes it when it is garbage
+    collected or the process exits; stores sharing a root never delete each
+    other's blobs.
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        compress: bool = False,
+        history_limit: int = DEFAULT_HISTORY_LIMIT,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.root = Path(
+            root or Path(tempfile.gettempdir()) / "coding-agent-snapshots"
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        blob_root = Path(tempfile.mkdtemp(prefix=f"blobs-{os.getpid()}-", dir=self.root))
+        self.blobs = BlobStore(blob_root, compress=compress)
+        weakref.finalize(self, shutil.rmtree, blob_root, True)
+        self.history_limit = max(history_limit, 1)
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self._undo: deque[EditRecord] = deque()
+        self._redo: list[EditRecord] = []
+        self._ids = itertools.count(1)
+        # Digest of each file as last written by a tracked edit, keyed by its
+        # stat signature, so the next edit's pre-image needs no read.
+        self._known: dict[Path, tuple[tuple[int, int, int], str]] = {}
+        # Size of every blob this store wrote and has not deleted yet.
+        self._sizes: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def track(self, paths: Iterable[Path], label: str = "edit") -> Iterator[EditRecord]:
+        record = EditRecord(next(self._ids), label, time.time())
+        for path in dict.fromkeys(Path(path) for path in paths):
+            signature = _signature(path)
+            record.changes.append(
+                FileChange(
+                    path=path,
+                    before=self._store(path, signature),
+                    after=None,
+                    before_signature=signature,
+                )
+            )
+        yield record
+        for change in record.changes:
+            change.after_signature = _signature(change.path)
+            change.after = self._store(change.path, change.after_signature)
+        self._undo.append(record)
+        self._redo.clear()
+        if len(self._undo) > self.history_limit:
+            self._undo.popleft()
+        self.collect()
+
+    def undo(self, steps: int = 1, force: bool = False) -> list[EditRecord]:
+        undone = []
+        for _ in range(steps):
+            if not self._undo:
+                break
+            record = self._undo[-1]
+            self._apply(record, "before", force)
+            self._redo.append(self._undo.pop())
+            undone.append(record)
+        return undone
+
+    def redo(self, steps: int = 1, force: bool = False) -> list[EditRecord]:
+        redone = []
+        for _ in range(steps):
+            if not self._redo:
+                break
+            record = self._redo[-1]
+            self._apply(record, "after", force)
+            self._undo.append(self._redo.pop())
+            redone.append(record)
+        return redone
+
+    def history(self) -> list[EditRecord]:
+        return list(self._undo)
+
+    def collect(
+        self, max_age_seconds: float | None = None, max_bytes: int | None = None
+    ) -> int:
+        """Drop old history and unreferenced blobs; return the number of blobs deleted."""
+        max_age_seconds = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        cutoff = time.time() - max_age_seconds
+        while self._undo and self._undo[0].created_at < cutoff:
+            self._undo.popleft()
+        self._redo = [record for record in self._redo if record.created_at >= cutoff]
+
+        sizes = {
+            key: self._sizes.get(key, 0)
+            for record in (*self._undo, *self._redo)
+            for key in record.blob_keys()
+        }
+        while self._undo and sum(sizes.values()) > max_bytes:
+            dropped = self._undo.popleft()
+            still_used = set().union(
+                *(record.blob_keys() for record in (*self._undo, *self._redo))
+            )
+            for key in dropped.blob_keys() - still_used:
+                sizes.pop(key, None)
+
+        deleted = 0
+        for key in [key for key in self._sizes if key not in sizes]:
+            self.blobs.delete(key)
+            del self._sizes[key]
+            deleted += 1
+        return deleted
+
+    def _store(self, path: Path, signature: tuple[int, int, int] | None) -> str | None:
+        if signature is None or not path.is_file():
+            return None
+        known = self._known.get(path)
+        if known is not None and known[0] == signature and known[1] in self._sizes:
+            return known[1]
+        key = self.blobs.put_file(path)
+        if key not in self._sizes:
+            self._sizes[key] = self.blobs.size(key)
+        self._known[path] = (signature, key)
+        return key
+
+    def _apply(self, record: EditRecord, side: str, force: bool) -> None:
+        expected = "after_signature" if side == "before" else "before_signature"
+        if not force:
+            for change in record.changes:
+                if _signature(change.path) != getattr(change, expected):
+                    raise SnapshotConflict(
+                        f"{change.path} changed outside edit {record.edit_id} ({record.label})"
+                    )
+        for change in record.changes:
+            key = getattr(change, side)
+            if key is None:
+                change.path.unlink(missing_ok=True)
+            else:
+                change.path.parent.mkdir(parents=True, exist_ok=True)
+                self.blobs.restore(key, change.path)
+            signature = _signature(change.path)
+            setattr(change, _SIGNATURE_FIELDS[side], signature)
+            if key is not None and signature is not None:
+                self._known[change.path] = (signature, key)
+
+
+_SIGNATURE_FIELDS = {"before": "before_signature", "after": "after_signature"}
+
+
+def _signature(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,188 @@
+import ast
+import fnmatch
+import json
+import tomllib
+import warnings
+from collections.abc import Callable, Iterable
+from pathlib import PurePath
+
+try:  # Optional: YAML files are only checked when PyYAML is installed.
+    import yaml
+except ImportError:  # pragma: no cover - depends on the environment
+    yaml = None
+
+
+DEFAULT_MAX_CHECK_BYTES = 2 * 1024 * 1024
+
+# A checker receives the new text and the display path and returns
+# diagnostics ("path:line:col: message"); an empty list means the file is valid.
+SyntaxChecker = Callable[[str, str], list[str]]
+
+# ".json" files that tools read as JSON with comments and trailing commas.
+JSONC_FILE_PATTERNS = (
+    "tsconfig*.json",
+    "jsconfig*.json",
+    ".vscode/*.json",
+    "*.code-workspace",
+    "devcontainer.json",
+    ".devcontainer/*.json",
+    ".eslintrc.json",
+    ".babelrc.json",
+    ".swcrc",
+    "deno.json",
+    "api-extractor.json",
+)
+
+
+class SyntaxValidator:
+    """
+    In-process syntax checks for files written by the editor, keyed by suffix
+    (extensionless JSONC configs such as ``.swcrc`` are matched by name).
+
+    Only parsing is done (no imports, no type checking), so a check costs
+    about as much as reading the file. Python, JSON and TOML are built in,
+    YAML when PyYAML is available; other languages (e.g. a JS/TS parser) are
+    added with :meth:`register`. A checker that crashes is reported, never
+    raised, so validation cannot fail an edit that was already written.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_CHECK_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._checkers: dict[str, SyntaxChecker] = {}
+        self.register((".py", ".pyi"), check_python)
+        self.register((".json",), check_json)
+        self.register((".jsonc", ".code-workspace"), check_jsonc)
+        self.register((".toml",), check_toml)
+        if yaml is not None:
+            self.register((".yaml", ".yml"), check_yaml)
+
+    def register(self, suffixes: Iterable[str], checker: SyntaxChecker) -> None:
+        for suffix in suffixes:
+            self._checkers[suffix.lower()] = checker
+
+    def unregister(self, suffixes: Iterable[str]) -> None:
+        for suffix in suffixes:
+            self._checkers.pop(suffix.lower(), None)
+
+    def supports(self, path: str) -> bool:
+        return self._checker_for(path) is not None
+
+    def check(self, path: str, text: str) -> list[str]:
+        checker = self._checker_for(path)
+        if checker is None or len(text) > self.max_bytes:
+            return []
+        try:
+            return checker(text, path)
+        except Exception as exc:  # noqa: BLE001 - third-party checkers
+            return [f"{path}: syntax checker failed: {exc}"]
+
+    def _checker_for(self, path: str) -> SyntaxChecker | None:
+        suffix = PurePath(path).suffix.lower()
+        if not suffix and is_jsonc_path(path):
+            return check_jsonc
+        return self._checkers.get(suffix)
+
+
+def check_python(text: str, path: str) -> list[str]:
+    try:
+        with warnings.catch_warnings():
+            # Invalid escape sequences and the like are warnings, not errors.
+            warnings.simplefilter("ignore")
+            compile(text, path, "exec", flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+    except SyntaxError as exc:
+        return [f"{path}:{exc.lineno or 0}:{exc.offset or 0}: {type(exc).__name__}: {exc.msg}"]
+    except ValueError as exc:  # e.g. source contains NUL bytes
+        return [f"{path}: {exc}"]
+    return []
+
+
+def check_json(text: str, path: str) -> list[str]:
+    if is_jsonc_path(path):
+        return check_jsonc(text, path)
+    try:
+        json.loads(text)
+    except json.JSONDecodeError as exc:
+        return [f"{path}:{exc.lineno}:{exc.colno}: {exc.msg}"]
+    return []
+
+
+def check_jsonc(text: str, path: str) -> list[str]:
+    """JSON that may contain ``//`` and ``/* */`` comments and trailing commas."""
+    try:
+        json.loads(strip_jsonc(text))
+    except json.JSONDecodeError as exc:
+        return [f"{path}:{exc.lineno}:{exc.colno}: {exc.msg}"]
+    return []
+
+
+def is_jsonc_path(path: str) -> bool:
+    posix = PurePath(path).as_posix().lower()
+    return any(
+        fnmatch.fnmatchcase(posix, pattern) or fnmatch.fnmatchcase(posix, f"*/{pattern}")
+        for pattern in JSONC_FILE_PATTERNS
+    )
+
+
+def strip_jsonc(text: str) -> str:
+    """
+    Blank out comments and trailing commas so ``json`` can parse the text.
+
+    Removed characters are replaced by spaces (newlines are kept), so line and
+    column numbers of the remaining errors still match the original file.
+    """
+    out = list(text)
+    index, length = 0, len(text)
+    last_comma = None  # position of a comma not yet followed by a value
+    while index < length:
+        char = text[index]
+        if char == '"':
+            index += 1
+            while index < length and text[index] != '"':
+                index += 2 if text[index] == "\\" else 1
+            last_comma = None
+        elif text.startswith("//", index):
+            end = text.find("\n", index)
+            end = length if end == -1 else end
+            out[index:end] = " " * (end - index)
+            index = end
+            continue
+        elif text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            out[index:end] = [c if c == "\n" else " " for c in text[index:end]]
+            index = end
+            continue
+        elif char == ",":
+            last_comma = index
+        elif char in "]}":
+            if last_comma is not None:
+                out[last_comma] = " "
+            last_comma = None
+        elif not char.isspace():
+            last_comma = None
+        index += 1
+    return "".join(out)
+
+
+def check_toml(text: str, path: str) -> list[str]:
+    try:
+        tomllib.loads(text)
+    except tomllib.TOMLDecodeError as exc:
+        return [f"{path}: {exc}"]
+    return []
+
+
+def check_yaml(text: str, path: str) -> list[str]:
+    try:
+        # Compose only: application tags such as CloudFormation's ``!Ref``
+        # are valid syntax even though no constructor knows them.
+        # Multi-document files (e.g. Kubernetes manifests) are common.
+        for _ in yaml.compose_all(text, Loader=yaml.SafeLoader):
+            pass
+    except yaml.YAMLError as exc:
+        mark = getattr(exc, "problem_mark", None)
+        problem = getattr(exc, "problem", None) or str(exc)
+        if mark is not None:
+            return [f"{path}:{mark.line + 1}:{mark.column + 1}: {problem}"]
+        return [f"{path}: {problem}"]
+    return []
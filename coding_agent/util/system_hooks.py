@@ -1,6 +1,57 @@
+import contextlib
+import hashlib
+import json
+import os
+import weakref
+from dataclasses import dataclass
 from typing import Optional
 
 from agents import AgentHooks, RunContextWrapper
+from agents.editor import ApplyPatchOperation
+
+from .context_budget import (
+    DEFAULT_ARCHIVE_RETENTION_SECONDS,
+    DEFAULT_EXCERPT_CHARS,
+    DEFAULT_MAX_CONTEXT_TOKENS,
+    DEFAULT_MIN_OUTPUT_AGE,
+    DEFAULT_MIN_OUTPUT_CHARS,
+    CompactionStats,
+    ContextBudget,
+    ToolOutputArchive,
+)
+from .session_state import (
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_SESSION_IDLE_SECONDS,
+    SessionStateStore,
+    session_key,
+)
+
+_REMINDER_HEADER = """<system-reminder>
+# important-instruction-reminders
+Do what has been asked; nothing more, nothing less.
+NEVER create files unless they're absolutely necessary for achieving your goal.
+ALWAYS prefer editing an existing file to creating a new one.
+NEVER proactively create documentation files (*.md) or README files. Only create documentation files if explicitly requested by the User.
+
+"""
+_REMINDER_FOOTER = (
+    "\nIMPORTANT: this context may or may not be relevant to your tasks. You should not respond to this context or otherwise consider it in your response unless it is highly relevant to your task. Most of the time, it is not relevant.\n</system-reminder>"
+)
+_REMINDER_WITHOUT_TODOS = (
+    _REMINDER_HEADER
+    + "# TODO List\nConsider using the TodoWrite tool to plan and track your tasks.\n"
+    + _REMINDER_FOOTER
+)
+
+
+@dataclass
+class _ReminderSession:
+    """Reminder state of one conversation."""
+
+    tool_call_count: int = 0
+    # (todo list, version, rendered reminder) of the last reminder
+    rendered: Optional[tuple[list, int, str]] = None
+
 
 class SystemReminderHook(AgentHooks):
     """
@@ -13,10 +64,23 @@ class SystemReminderHook(AgentHooks):
     Reminders include:
     - Important instruction reminders
     - Current TODO list status
+
+    One hook serves every conversation of the process, so counters are kept per
+    conversation (thread) in a bounded LRU; idle conversations are dropped.
     """
 
-    def __init__(self):
-        self.tool_call_count = 0
+    def __init__(self, max_sessions: Optional[int] = None, idle_seconds: Optional[int] = None):
+        self.sessions: SessionStateStore[_ReminderSession] = SessionStateStore(
+            _ReminderSession,
+            max_sessions=max_sessions
+            or _env_int("CODING_AGENT_HOOK_MAX_SESSIONS", DEFAULT_MAX_SESSIONS),
+            idle_seconds=idle_seconds
+            or _env_int("CODING_AGENT_HOOK_SESSION_IDLE_SECONDS", DEFAULT_SESSION_IDLE_SECONDS),
+        )
+
+    def session(self, context: RunContextWrapper) -> _ReminderSession:
+        """Reminder state of the conversation ``context`` belongs to."""
+        return self.sessions.get(session_key(context, self.sessions))
 
     async def on_start(self, context: RunContextWrapper, agent) -> None:
         """Called when agent starts processing a user message or is activated."""
@@ -46,12 +110,13 @@ class SystemReminderHook(AgentHooks):
         self, context: RunContextWrapper, agent, tool, result: str
     ) -> None:
         """Called after each tool execution."""
-        self.tool_call_count += 1
+        session = self.session(context)
+        session.tool_call_count += 1
 
         # Check if we should trigger a reminder after 15 tool calls
-        if self.tool_call_count >= 15:
+        if session.tool_call_count >= 15:
+            session.tool_call_count = 0
             self._inject_reminder(context, "tool_call_limit")
-            self.tool_call_count = 0
 
     async def on_llm_start(
         self,
@@ -104,12 +169,12 @@ class SystemReminderHook(AgentHooks):
             trigger_type: Either "tool_call_limit" or "user_message"
         """
         try:
-            # Get current todos from context
-            current_todos = self._get_current_todos(ctx)
+            # Get current todos (and the version UpdatePlan stored with them) from context
+            current_todos, version = self._get_todos_and_version(ctx)
 
-            # Create the reminder message
-            reminder_message = self._create_reminder_message(
-                trigger_type, current_todos
+            # Create the reminder message, reusing the last rendering of this todo list
+            reminder_message = self._render_reminder(
+                self.session(ctx), trigger_type, current_todos, version
             )
 
             # Inject the reminder into the conversation history
@@ -121,54 +186,67 @@ class SystemReminderHook(AgentHooks):
 
     def _get_current_todos(self, ctx: RunContextWrapper) -> Optional[list]:
         """Get current todos from shared context."""
+        return self._get_todos_and_version(ctx)[0]
+
+    def _get_todos_and_version(self, ctx: RunContextWrapper) -> tuple[Optional[list], Optional[int]]:
+        """Get current todos and their version from shared context."""
         try:
             if hasattr(ctx, "context"):
                 todos_payload = ctx.context.get("todos", {})
-                return todos_payload.get("todos", [])
+                # UpdatePlan stores {"todos": [...], "version": n}; older threads hold a bare list.
+                if isinstance(todos_payload, list):
+                    return todos_payload, None
+                return todos_payload.get("todos", []), todos_payload.get("version")
         except Exception:
             pass
-        return None
+        return None, None
+
+    def _render_reminder(
+        self,
+        session: _ReminderSession,
+        trigger_type: str,
+        todos: Optional[list],
+        version: Optional[int],
+    ) -> str:
+        """Reminder for ``todos``, memoized per conversation by todo list and version."""
+        if not todos:
+            return _REMINDER_WITHOUT_TODOS
+        if version is None:
+            return self._create_reminder_message(trigger_type, todos)
+        cached = session.rendered
+        if cached is not None and cached[0] is todos and cached[1] == version:
+            return cached[2]
+        reminder = self._create_reminder_message(trigger_type, todos)
+        session.rendered = (todos, version, reminder)
+        return reminder
 
     def _create_reminder_message(self, trigger_type: str, todos: Optional[list]) -> str:
         """Create the system reminder message."""
-        reminder = """<system-reminder>
-# important-instruction-reminders
-Do what has been asked; nothing more, nothing less.
-NEVER create files unless they're absolutely necessary for achieving your goal.
-ALWAYS prefer editing an existing file to creating a new one.
-NEVER proactively create documentation files (*.md) or README files. Only create documentation files if explicitly requested by the User.
-
-"""
-
-        # Add current TODO status if available
-        if todos:
-            reminder += "# Current TODO List Status\n"
-            pending_count = sum(1 for todo in todos if todo.get("status") == "pending")
-            in_progress_count = sum(
-                1 for todo in todos if todo.get("status") == "in_progress"
-            )
-            completed_count = sum(
-                1 for todo in todos if todo.get("status") == "completed"
-            )
-
-            reminder += f"- {pending_count} pending tasks\n"
-            reminder += f"- {in_progress_count} in-progress tasks\n"
-            reminder += f"- {completed_count} completed tasks\n"
-
-            if in_progress_count > 0:
-                reminder += "\nCurrent in-progress tasks:\n"
-                for todo in todos:
-                    if todo.get("status") == "in_progress":
-                        reminder += f"- {todo.get('task', 'Unknown task')}\n"
-        else:
-            reminder += "# TODO List\nConsider using the TodoWrite tool to plan and track your tasks.\n"
-
-        reminder += (
-            "\nIMPORTANT: this context may or may not be relevant to your tasks. You should not respond to this context or otherwise consider it in your response unless it is highly relevant to your task. Most of the time, it is not relevant.\n</system-reminder>"
-            ""
-        )
-
-        return reminder
+        if not todos:
+            return _REMINDER_WITHOUT_TODOS
+
+        # Add current TODO status in a single pass over the list
+        counts = {"pending": 0, "in_progress": 0, "completed": 0}
+        in_progress = []
+        for todo in todos:
+            status = todo.get("status")
+            if status in counts:
+                counts[status] += 1
+            if status == "in_progress":
+                in_progress.append(f"- {todo.get('task', 'Unknown task')}\n")
+
+        parts = [
+            _REMINDER_HEADER,
+            "# Current TODO List Status\n",
+            f"- {counts['pending']} pending tasks\n",
+            f"- {counts['in_progress']} in-progress tasks\n",
+            f"- {counts['completed']} completed tasks\n",
+        ]
+        if in_progress:
+            parts.append("\nCurrent in-progress tasks:\n")
+            parts.extend(in_progress)
+        parts.append(_REMINDER_FOOTER)
+        return "".join(parts)
 
     def _add_system_reminder_to_thread(
         self, ctx: RunContextWrapper, reminder_message: str
@@ -203,57 +281,325 @@ class MessageFilterHook(AgentHooks):
         filter_duplicates(context)
 
 
+@dataclass
+class _BudgetSession:
+    """Context budget state of one conversation."""
+
+    last_stats: Optional[CompactionStats] = None
+
+
+class ContextBudgetHook(AgentHooks):
+    """
+    Context budget hook for Agency Code to keep long sessions within the context window.
+
+    Before every LLM call, old and large function_call_output bodies (install logs, test
+    runs, file dumps) in the request and in the stored thread are replaced by head/tail
+    excerpts; the originals stay retrievable by call_id from ``original_output``.
+
+    Originals are archived per thread, keyed by the first message of the thread so a
+    thread reloaded after a restart finds its files again. Archives of threads unused
+    for the retention period are removed on first use and whenever a conversation is
+    evicted from ``sessions``.
+
+    Thresholds come from the environment when no budget is given:
+    - CODING_AGENT_CONTEXT_MAX_TOKENS: approximate token budget per thread
+    - CODING_AGENT_CONTEXT_MIN_OUTPUT_AGE: number of newer outputs before one may be compacted
+    - CODING_AGENT_CONTEXT_MIN_OUTPUT_CHARS: outputs shorter than this are kept
+    - CODING_AGENT_CONTEXT_EXCERPT_CHARS: characters kept from the head and from the tail
+    - CODING_AGENT_CONTEXT_ARCHIVE_DIR: where originals are kept
+      (default ``$XDG_STATE_HOME/coding-agent/tool-outputs``)
+    - CODING_AGENT_CONTEXT_ARCHIVE_RETENTION_SECONDS: how long unused thread archives are kept
+    """
+
+    def __init__(
+        self, budget: Optional[ContextBudget] = None, retention_seconds: Optional[int] = None
+    ):
+        self.budget = budget or ContextBudget(
+            max_tokens=_env_int("CODING_AGENT_CONTEXT_MAX_TOKENS", DEFAULT_MAX_CONTEXT_TOKENS),
+            min_age=_env_int("CODING_AGENT_CONTEXT_MIN_OUTPUT_AGE", DEFAULT_MIN_OUTPUT_AGE),
+            min_chars=_env_int("CODING_AGENT_CONTEXT_MIN_OUTPUT_CHARS", DEFAULT_MIN_OUTPUT_CHARS),
+            excerpt_chars=_env_int("CODING_AGENT_CONTEXT_EXCERPT_CHARS", DEFAULT_EXCERPT_CHARS),
+            archive=ToolOutputArchive(os.environ.get("CODING_AGENT_CONTEXT_ARCHIVE_DIR")),
+        )
+        self.retention_seconds = retention_seconds or _env_int(
+            "CODING_AGENT_CONTEXT_ARCHIVE_RETENTION_SECONDS", DEFAULT_ARCHIVE_RETENTION_SECONDS
+        )
+        self._pruned = False
+        # Last compaction result of each conversation.
+        self.sessions: SessionStateStore[_BudgetSession] = SessionStateStore(
+            _BudgetSession,
+            max_sessions=_env_int("CODING_AGENT_HOOK_MAX_SESSIONS", DEFAULT_MAX_SESSIONS),
+            idle_seconds=_env_int(
+                "CODING_AGENT_HOOK_SESSION_IDLE_SECONDS", DEFAULT_SESSION_IDLE_SECONDS
+            ),
+            on_evict=lambda key, session: self.prune_archive(),
+        )
+
+    async def on_llm_start(
+        self,
+        context: RunContextWrapper,
+        agent,
+        system_prompt: Optional[str],
+        input_items: list,
+    ) -> None:
+        """Compact old tool outputs in the request and in the stored thread."""
+        try:
+            if not self._pruned:
+                self._pruned = True
+                self.prune_archive()
+            archive = self.archive(context)
+            stats = self.budget.compact(input_items, archive)
+            self.sessions.get(session_key(context, self.sessions)).last_stats = stats
+            # Also compact the stored thread so later turns start from the short form.
+            thread_manager = getattr(context.context, "thread_manager", None)
+            if thread_manager is not None:
+                self.budget.compact(thread_manager._store.messages, archive)
+        except Exception as e:
+            # Do not interrupt the flow if compaction fails
+            print(f"Warning: Failed to compact tool outputs: {e}")
+
+    def stats(self, context: RunContextWrapper) -> Optional[CompactionStats]:
+        """Token estimate of the last LLM request of the conversation ``context`` belongs to."""
+        return self.sessions.get(session_key(context, self.sessions)).last_stats
+
+    def archive(self, context: RunContextWrapper) -> ToolOutputArchive:
+        """Archive of the thread ``context`` belongs to."""
+        return self.budget.archive.session(_archive_name(context))
+
+    def original_output(self, context: RunContextWrapper, call_id: str) -> Optional[str]:
+        """Full output of a compacted tool call of the thread ``context`` belongs to."""
+        return self.archive(context).get(call_id)
+
+    def prune_archive(self) -> int:
+        """Remove thread archives unused for ``retention_seconds``; return how many."""
+        try:
+            return self.budget.archive.prune(self.retention_seconds)
+        except OSError as e:
+            print(f"Warning: Failed to prune tool output archive: {e}")
+            return 0
+
+
+class PatchBatchHook(AgentHooks):
+    """
+    Patch batching hook for Agency Code to apply multi-file patches all-or-nothing.
+
+    ApplyPatchTool runs the apply_patch calls of a model response one operation at a
+    time. After each LLM response this hook announces all of its operations to the
+    editor (``WorkspaceEditor.expect_batch``), which then applies them together
+    through ``apply_batch`` when the first one runs.
+    """
+
+    def __init__(self, editor):
+        self.editor = editor
+
+    async def on_llm_end(self, context: RunContextWrapper, agent, response) -> None:
+        """Announce the apply_patch operations of ``response`` to the editor."""
+        try:
+            operations = []
+            for item in getattr(response, "output", None) or []:
+                if _field(item, "type") == "apply_patch_call":
+                    raw = _field(item, "operations") or [_field(item, "operation")]
+                    operations.extend(
+                        ApplyPatchOperation(
+                            type=_field(operation, "type"),
+                            path=_field(operation, "path"),
+                            diff=_field(operation, "diff"),
+                            move_to=_field(operation, "move_to"),
+                        )
+                        for operation in raw
+                        if operation is not None
+                    )
+            self.editor.expect_batch(context, operations)
+        except Exception as e:
+            # Operations then apply one by one
+            print(f"Warning: Failed to announce patch batch: {e}")
+
+
+class CompositeHooks(AgentHooks):
+    """Runs several agent hooks in order, since an Agent takes a single ``hooks`` object."""
+
+    def __init__(self, hooks: list[AgentHooks]):
+        self.hooks = list(hooks)
+
+    async def on_start(self, context, agent) -> None:
+        for hook in self.hooks:
+            await hook.on_start(context, agent)
+
+    async def on_end(self, context, agent, output) -> None:
+        for hook in self.hooks:
+            await hook.on_end(context, agent, output)
+
+    async def on_handoff(self, context, *args, **kwargs) -> None:
+        for hook in self.hooks:
+            await hook.on_handoff(context, *args, **kwargs)
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        for hook in self.hooks:
+            await hook.on_tool_start(context, agent, tool)
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        for hook in self.hooks:
+            await hook.on_tool_end(context, agent, tool, result)
+
+    async def on_llm_start(self, context, agent, system_prompt, input_items) -> None:
+        for hook in self.hooks:
+            await hook.on_llm_start(context, agent, system_prompt, input_items)
+
+    async def on_llm_end(self, context, agent, response) -> None:
+        for hook in self.hooks:
+            await hook.on_llm_end(context, agent, response)
+
+
+def _field(item, name: str):
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def _archive_name(context) -> str:
+    """
+    Stable name of the thread of ``context``, also across restarts.
+
+    ThreadManagers have no id of their own, so the first chat message (role,
+    content and timestamp, which compaction and filtering never change)
+    identifies the thread; runs without one fall back to the run id.
+    """
+    shared = getattr(context, "context", context)
+    thread_manager = getattr(shared, "thread_manager", None)
+    identity = None
+    if thread_manager is not None:
+        for message in thread_manager._store.messages:
+            if isinstance(message, dict) and "role" in message:
+                identity = [message.get(field) for field in ("role", "content", "timestamp")]
+                break
+    if identity is None:
+        identity = ["run", getattr(shared, "_current_agent_run_id", None) or "default"]
+    encoded = json.dumps(identity, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+class _FilterState:
+    """What filter_duplicates knows about the already-filtered prefix of a thread."""
+
+    def __init__(self) -> None:
+        self.messages: list | None = None
+        self.watermark = 0
+        self.last_message = None
+        self.calls_seen: set = set()
+        self.outputs_seen: set = set()
+        # Calls in the prefix whose output has not arrived yet.
+        self.pending_calls: dict = {}
+        # Outputs in the prefix whose call has not been seen.
+        self.orphan_outputs: set = set()
+
+    def is_valid_for(self, messages: list) -> bool:
+        # The store may have been replaced, cleared or truncated since the last run.
+        return (
+            self.messages is messages
+            and len(messages) >= self.watermark
+            and (self.watermark == 0 or messages[self.watermark - 1] is self.last_message)
+        )
+
+
+# Per thread manager; entries go away with their thread.
+_filter_states: "weakref.WeakKeyDictionary[object, _FilterState]" = weakref.WeakKeyDictionary()
+
+
 def filter_duplicates(context) -> None:
-    """Filter duplicates and reorder messages."""
+    """
+    Filter duplicates and reorder messages.
+
+    Duplicate function calls (and repeated outputs) are dropped, and every
+    function_call is moved right before its function_call_output. Only the
+    messages appended since the previous run are processed: the call_ids of
+    the already-filtered prefix are kept per thread, so a turn costs the same
+    on a long thread as on a short one. The prefix is rebuilt from scratch
+    when the store was replaced or truncated, or when a late function_call
+    belongs to an output that is already in the prefix.
+    """
 
     thread_manager = context.context.thread_manager
-    
-    # Access the message store directly
     messages = thread_manager._store.messages
-    
+
+    try:
+        state = _filter_states.get(thread_manager)
+    except TypeError:  # Not weak-referenceable: filter the whole thread every time.
+        state = None
+    if state is None or not state.is_valid_for(messages):
+        state = _FilterState()
+    if not _filter_tail(messages, state):
+        state = _FilterState()
+        _filter_tail(messages, state)
+    state.messages = messages
+    state.watermark = len(messages)
+    state.last_message = messages[-1] if messages else None
+    with contextlib.suppress(TypeError):
+        _filter_states[thread_manager] = state
+
+
+def _filter_tail(messages: list, state: _FilterState) -> bool:
+    """
+    Filter ``messages[state.watermark:]`` in place and update ``state``.
+
+    Returns False, without changing anything, when the new messages would
+    require moving a message inside the already-filtered prefix.
+    """
+    tail = messages[state.watermark :]
+
     # Step 1: Filter duplicates based on call_id for function calls
-    call_ids_seen = set()
+    function_calls = {}  # call_id -> first function_call message of the tail
+    function_outputs = set()  # call_ids with a function_call_output in the tail
     deduplicated_messages = []
-    
-    for message in messages:
-        call_id = message.get("call_id")
-        
-        if call_id and message.get("type") == "function_call":
-            if call_id in call_ids_seen:
-                continue
-            else:
-                call_ids_seen.add(call_id)
-                deduplicated_messages.append(message)
-        else:
-            # Messages without call_id or non-function calls are always included
-            deduplicated_messages.append(message)
-    
-    # Step 2: Reorder messages so function_call is immediately followed by function_call_output
-    reordered_messages = []
-    function_calls = {}  # call_id -> function_call message
-    function_outputs = {}  # call_id -> function_call_output message
-    
-    # Separate messages by type
-    for message in deduplicated_messages:
+    for message in tail:
         msg_type = message.get("type")
         call_id = message.get("call_id")
-        
         if msg_type == "function_call" and call_id:
+            if call_id in state.calls_seen or call_id in function_calls:
+                continue
+            if call_id in state.orphan_outputs:
+                return False  # The call belongs before an output in the prefix.
             function_calls[call_id] = message
         elif msg_type == "function_call_output" and call_id:
-            function_outputs[call_id] = message
-    
-    # Build the reordered list: keep function_call_outputs in place, move function_calls to come before their outputs
-    processed_call_ids = set()
-    
+            function_outputs.add(call_id)
+        deduplicated_messages.append(message)
+
+    # A call left pending in the prefix moves down to its output.
+    moved_calls = {}
+    for call_id in function_outputs:
+        pending = state.pending_calls.get(call_id)
+        if pending is not None and call_id not in state.outputs_seen:
+            moved_calls[call_id] = pending
+    if moved_calls:
+        # Pending calls are usually near the end of the prefix.
+        remaining = {id(message) for message in moved_calls.values()}
+        for index in range(state.watermark - 1, -1, -1):
+            if id(messages[index]) in remaining:
+                remaining.discard(id(messages[index]))
+                del messages[index]
+                state.watermark -= 1
+                if not remaining:
+                    break
+        for call_id, message in moved_calls.items():
+            del state.pending_calls[call_id]
+            function_calls[call_id] = message
+
+    # Step 2: Reorder messages so function_call is immediately followed by function_call_output
+    reordered_messages = []
     for message in deduplicated_messages:
         msg_type = message.get("type")
         call_id = message.get("call_id")
-        
+
         # If it's a function output, add the corresponding call before it
-        if msg_type == "function_call_output" and call_id and call_id not in processed_call_ids:
-            processed_call_ids.add(call_id)
-            
+        if msg_type == "function_call_output" and call_id and call_id not in state.outputs_seen:
+            state.outputs_seen.add(call_id)
+
             if call_id in function_calls:
                 function_call_msg = function_calls[call_id]
                 # Adjust timestamps to avoid collisions with same-timestamp reasoning
@@ -268,24 +614,25 @@ def filter_duplicates(context) -> None:
                 reordered_messages.append(function_call_msg)
             else:
                 print(f"[WARNING] No function_call found for call_id: {call_id}")
-            
+                state.orphan_outputs.add(call_id)
+
             reordered_messages.append(message)  # Keep function_call_output in its position
-        
+
         # If it's not a function call or output, add it as-is
         elif msg_type not in ["function_call", "function_call_output"]:
             reordered_messages.append(message)
-        
+
         # Preserve standalone function_call (no matching output or missing call_id)
         elif msg_type == "function_call" and (not call_id or call_id not in function_outputs):
             reordered_messages.append(message)
-        
+            if call_id:
+                state.pending_calls[call_id] = message
+
         # Function calls with matching outputs are handled when we process their corresponding outputs
-    
-    # Update the message store directly
-    if len(reordered_messages) != len(messages) or any(
-        orig != new for orig, new in zip(messages, reordered_messages)
-    ):
-        thread_manager._store.messages = reordered_messages
+
+    state.calls_seen.update(function_calls)
+    messages[state.watermark :] = reordered_messages
+    return True
 
 
 # Factory function to create the hook
@@ -297,12 +644,20 @@ def create_message_filter_hook():
     """Create and return a MessageFilterHook instance."""
     return MessageFilterHook()
 
+def create_context_budget_hook():
+    """Create and return a ContextBudgetHook instance."""
+    return ContextBudgetHook()
+
+def create_patch_batch_hook(editor):
+    """Create and return a PatchBatchHook instance for ``editor``."""
+    return PatchBatchHook(editor)
+
 
 if __name__ == "__main__":
     # Test the hook creation
     hook = create_system_reminder_hook()
     print("SystemReminderHook created successfully")
-    print(f"Initial tool call count: {hook.tool_call_count}")
+    print(f"Tracked sessions: {len(hook.sessions)}")
 
     # Test reminder message creation
     test_todos = [
@@ -0,0 +1,129 @@
+import codecs
+from dataclasses import dataclass
+from pathlib import Path
+
+
+SAMPLE_BYTES = 8 * 1024
+# Share of control characters (other than tab/newlines/form feed) above which
+# a sample is treated as binary.
+_BINARY_CONTROL_RATIO = 0.1
+_TEXT_CONTROLS = {0x08, 0x09, 0x0A, 0x0C, 0x0D, 0x1B}
+
+_BOMS = (
+    # UTF-32 first: its little-endian BOM starts with the UTF-16 one.
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+class BinaryFileError(ValueError):
+    """Raised for files that look binary and must not be decoded as text."""
+
+
+@dataclass(slots=True, frozen=True)
+class TextFormat:
+    """How a text file is stored on disk: codec, byte order mark and newline style."""
+
+    encoding: str = "utf-8"
+    bom: bytes = b""
+    newline: str = "\n"
+
+    def decode(self, data: bytes) -> str:
+        return data[len(self.bom) :].decode(self.encoding)
+
+    def encode(self, text: str) -> bytes:
+        return self.bom + text.encode(self.encoding)
+
+
+DEFAULT_FORMAT = TextFormat()
+
+
+def detect_format(sample: bytes) -> TextFormat:
+    """
+    Guess the format of a file from its first bytes.
+
+    BOMs identify UTF-8/16/32 directly. Without a BOM, NUL bytes in every
+    other position indicate BOM-less UTF-16, other NULs or a high share of
+    control bytes mean binary, and anything that is not valid UTF-8 is read
+    as Latin-1, which round-trips every byte unchanged.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            text = _decode_prefix(sample[len(bom) :], encoding)
+            if text is None:
+                raise BinaryFileError("invalid data after byte order mark")
+            return TextFormat(encoding, bom, _newline(text))
+
+    if b"\x00" in sample:
+        encoding = _utf16_without_bom(sample)
+        if encoding is None:
+            raise BinaryFileError("file contains NUL bytes")
+        text = _decode_prefix(sample, encoding)
+        if text is None:
+            raise BinaryFileError("file contains NUL bytes")
+        return TextFormat(encoding, b"", _newline(text))
+
+    controls = sum(1 for byte in sample if byte < 0x20 and byte not in _TEXT_CONTROLS)
+    if sample and controls / len(sample) > _BINARY_CONTROL_RATIO:
+        raise BinaryFileError("file contains mostly control bytes")
+
+    text = _decode_prefix(sample, "utf-8")
+    if text is None:
+        return TextFormat("latin-1", b"", _newline(sample.decode("latin-1")))
+    return TextFormat("utf-8", b"", _newline(text))
+
+
+def read_text_file(path: Path) -> tuple[str, TextFormat]:
+    """
+    Read and decode ``path`` using the format detected from its first bytes.
+
+    Binary files are rejected from the sample alone, before the rest of the
+    file is read.
+    """
+    with open(path, "rb") as handle:
+        sample = handle.read(SAMPLE_BYTES)
+        text_format = detect_format(sample)
+        data = sample + handle.read()
+    try:
+        return text_format.decode(data), text_format
+    except UnicodeDecodeError:
+        if text_format.encoding != "utf-8" or text_format.bom:
+            raise
+        # Valid UTF-8 in the sample, invalid later: keep every byte as Latin-1.
+        text_format = TextFormat("latin-1", b"", text_format.newline)
+        return text_format.decode(data), text_format
+
+
+def sniff_file(path: Path) -> TextFormat:
+    with open(path, "rb") as handle:
+        return detect_format(handle.read(SAMPLE_BYTES))
+
+
+def _decode_prefix(sample: bytes, encoding: str) -> str | None:
+    # The sample may end inside a multi-byte sequence; decode it incrementally.
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        return decoder.decode(sample, final=False)
+    except UnicodeDecodeError:
+        return None
+
+
+def _utf16_without_bom(sample: bytes) -> str | None:
+    pairs = len(sample) // 2
+    if not pairs:
+        return None
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    # ASCII-heavy UTF-16 has a NUL in (nearly) every high byte.
+    if odd_nuls > pairs * 0.4 and even_nuls < pairs * 0.05:
+        return "utf-16-le"
+    if even_nuls > pairs * 0.4 and odd_nuls < pairs * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def _newline(text: str) -> str:
+    return "\r\n" if "\r\n" in text else "\n"
@@ -0,0 +1,431 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+
+DEFAULT_JOURNAL_SIZE = 10_000
+DEFAULT_POLL_INTERVAL_SECONDS = 1.0
+DEFAULT_IGNORED_DIRECTORIES = frozenset(
+    {".git", "node_modules", "__pycache__", ".venv", "venv", ".next", ".cache", ".coding-agent"}
+)
+WATCHER_BACKENDS = ("auto", "inotify", "poll", "off")
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+# <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_EXCL_UNLINK = 0x04000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_ONLYDIR
+    | _IN_DONT_FOLLOW
+    | _IN_EXCL_UNLINK
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeedGap(RuntimeError):
+    """Raised when changes after the requested generation were dropped; rescan instead."""
+
+
+@dataclass(slots=True, frozen=True)
+class ChangeEvent:
+    generation: int
+    path: str
+    kind: str
+    # Modification time when the event was recorded; None for deletions.
+    mtime: float | None
+
+
+class WorkspaceWatcher:
+    """
+    Journal of file changes under a workspace root.
+
+    Every change (``created``, ``modified`` or ``deleted``, with the path
+    relative to the root and its mtime) gets the next generation number.
+    Consumers remember the generation they last saw and ask for
+    :meth:`changes_since` instead of walking the tree; subscribers are called
+    with each batch of new events. On Linux the kernel's inotify API is used
+    (through ``libc``, no extra package); elsewhere, or when inotify watches
+    run out, the tree is rescanned every ``poll_interval`` seconds. If the
+    kernel queue overflows or the journal wraps around, older generations
+    raise :class:`ChangeFeedGap`. Directories named in ``ignore`` (VCS
+    metadata, dependency folders) are not watched.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        backend: str = "auto",
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        journal_size: int = DEFAULT_JOURNAL_SIZE,
+        ignore: Iterable[str] = DEFAULT_IGNORED_DIRECTORIES,
+    ) -> None:
+        self.root = Path(root).resolve()
+        backend = (backend or "auto").strip().lower()
+        self.requested_backend = backend if backend in WATCHER_BACKENDS else "auto"
+        self.backend: str | None = None
+        self.poll_interval = max(poll_interval, 0.05)
+        self.ignore = frozenset(ignore)
+        self._journal: deque[ChangeEvent] = deque(maxlen=max(journal_size, 1))
+        self._generation = 0
+        # Highest generation whose events may be missing from the journal.
+        self._gap_through = 0
+        self._subscribers: list[Callable[[list[ChangeEvent]], None]] = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        # Self-pipe that interrupts the inotify select() on stop().
+        self._wake: tuple[int, int] | None = None
+        self._thread: threading.Thread | None = None
+        self._inotify: _Inotify | None = None
+        self._snapshot: dict[str, tuple[int, int]] = {}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start watching in a daemon thread (no-op when running or disabled)."""
+        with self._lock:
+            if self.running or self.requested_backend == "off":
+                return
+            if not self.root.is_dir():
+                logger.debug("Workspace %s does not exist yet; not watching.", self.root)
+                return
+            self._stop.clear()
+            self.backend = "poll"
+            if self.requested_backend in {"auto", "inotify"}:
+                try:
+                    self._inotify = _Inotify()
+                    self._watch_tree("")
+                    self._wake = os.pipe()
+                    self.backend = "inotify"
+                except OSError as exc:
+                    logger.info("inotify unavailable (%s); polling %s.", exc, self.root)
+                    self._close_inotify()
+            if self.backend == "poll":
+                self._snapshot = self._scan()
+            self._thread = threading.Thread(
+                target=self._run, name="workspace-watcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._wake is not None:
+            os.write(self._wake[1], b"\0")
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=self.poll_interval + 1)
+        self._thread = None
+        with self._lock:
+            self._close_inotify()
+            if self._wake is not None:
+                for fd in self._wake:
+                    os.close(fd)
+                self._wake = None
+
+    def sync(self) -> int:
+        """Record pending changes now instead of waiting for the thread; return the generation."""
+        with self._lock:
+            if self._inotify is not None:
+                self._drain_inotify()
+            elif self.backend == "poll":
+                self._poll_once()
+        return self._generation
+
+    def subscribe(self, callback: Callable[[list[ChangeEvent]], None]) -> None:
+        self._subscribers.append(callback)
+
+    def changes_since(self, generation: int, limit: int | None = None) -> list[ChangeEvent]:
+        """Events newer than ``generation``, oldest first, at most ``limit`` of them."""
+        with self._lock:
+            if generation < self._gap_through:
+                raise ChangeFeedGap(
+                    f"changes between generation {generation} and {self._gap_through} "
+                    "were dropped; rescan the workspace"
+                )
+            events = [event for event in self._journal if event.generation > generation]
+        return events if limit is None else events[:limit]
+
+    def changed_paths_since(self, generation: int) -> dict[str, str]:
+        """Net change per path since ``generation`` (created then deleted drops out)."""
+        return dict(
+            _coalesce((event.path, event.kind) for event in self.changes_since(generation))
+        )
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                inotify = self._inotify
+                if inotify is not None:
+                    try:
+                        ready, _, _ = select.select(
+                            [inotify.fd, self._wake[0]], [], [], self.poll_interval
+                        )
+                    except (OSError, ValueError):
+                        if self._inotify is not inotify:
+                            continue  # Switched to polling while waiting.
+                        raise
+                    if inotify.fd in ready and not self._stop.is_set():
+                        self.sync()
+                else:
+                    self._stop.wait(self.poll_interval)
+                    if not self._stop.is_set():
+                        self.sync()
+            except Exception:  # pragma: no cover - defensive logging
+                logger.exception("Workspace watcher for %s failed; stopping.", self.root)
+                return
+
+    def _record(self, changes: Iterable[tuple[str, str]]) -> None:
+        events = []
+        with self._lock:
+            for path, kind in _coalesce(changes):
+                mtime = None
+                if kind != DELETED:
+                    try:
+                        mtime = os.lstat(self.root / path).st_mtime
+                    except OSError:
+                        kind = DELETED
+                if len(self._journal) == self._journal.maxlen:
+                    self._gap_through = self._journal[0].generation
+                self._generation += 1
+                event = ChangeEvent(self._generation, path, kind, mtime)
+                self._journal.append(event)
+                events.append(event)
+        if events:
+            for callback in list(self._subscribers):
+                try:
+                    callback(events)
+                except Exception:  # pragma: no cover - defensive logging
+                    logger.exception("Workspace change subscriber failed.")
+
+    def _mark_gap(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._gap_through = self._generation
+
+    # -- polling -----------------------------------------------------------
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot: dict[str, tuple[int, int]] = {}
+        pending = [""]
+        while pending:
+            relative = pending.pop()
+            try:
+                entries = list(os.scandir(self.root / relative))
+            except OSError:
+                continue
+            for entry in entries:
+                path = f"{relative}/{entry.name}" if relative else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in self.ignore:
+                            pending.append(path)
+                        continue
+                    info = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                snapshot[path] = (info.st_mtime_ns, info.st_size)
+        return snapshot
+
+    def _poll_once(self) -> None:
+        current = self._scan()
+        previous = self._snapshot
+        changes = [(path, DELETED) for path in previous.keys() - current.keys()]
+        for path, signature in current.items():
+            before = previous.get(path)
+            if before is None:
+                changes.append((path, CREATED))
+            elif before != signature:
+                changes.append((path, MODIFIED))
+        self._snapshot = current
+        self._record(sorted(changes))
+
+    # -- inotify -----------------------------------------------------------
+
+    def _watch_tree(self, relative: str) -> list[str]:
+        """Watch ``relative`` and its subdirectories; return the files found in them."""
+        files = []
+        pending = [relative]
+        while pending:
+            directory = pending.pop()
+            self._inotify.add_watch(directory, self.root / directory)
+            try:
+                entries = list(os.scandir(self.root / directory))
+            except OSError:
+                continue
+            for entry in entries:
+                path = f"{directory}/{entry.name}" if directory else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not is_dir:
+                    files.append(path)
+                elif entry.name not in self.ignore:
+                    pending.append(path)
+        return files
+
+    def _drain_inotify(self) -> None:
+        inotify = self._inotify
+        changes: list[tuple[str, str]] = []
+        for wd, mask, name in inotify.read_events():
+            if mask & _IN_Q_OVERFLOW:
+                self._mark_gap()
+                continue
+            if mask & _IN_IGNORED:
+                inotify.forget(wd)
+                continue
+            directory = inotify.paths.get(wd)
+            if directory is None or not name:
+                continue
+            path = f"{directory}/{name}" if directory else name
+            if mask & _IN_ISDIR:
+                if name in self.ignore:
+                    continue
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    try:
+                        found = self._watch_tree(path)
+                    except OSError as exc:
+                        # Out of watches: keep going with polling from now on.
+                        logger.info("inotify watch failed (%s); polling %s.", exc, self.root)
+                        self._switch_to_polling()
+                        return
+                    changes.extend((file, CREATED) for file in found)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    inotify.remove_tree(path)
+                    changes.append((path, DELETED))
+                continue
+            if mask & (_IN_CREATE | _IN_MOVED_TO):
+                changes.append((path, CREATED))
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                changes.append((path, DELETED))
+            elif mask & (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_ATTRIB):
+                changes.append((path, MODIFIED))
+        self._record(changes)
+
+    def _switch_to_polling(self) -> None:
+        self._close_inotify()
+        self._mark_gap()
+        self.backend = "poll"
+        self._snapshot = self._scan()
+
+    def _close_inotify(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def _coalesce(changes: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+    # One event per path per batch. A file created and removed within the
+    # batch (e.g. the temporary file of an atomic write) is dropped.
+    merged: dict[str, str] = {}
+    for path, kind in changes:
+        previous = merged.pop(path, None)
+        if previous == CREATED and kind == DELETED:
+            continue
+        if previous == CREATED and kind == MODIFIED:
+            kind = CREATED
+        elif previous == DELETED and kind == CREATED:
+            kind = MODIFIED
+        merged[path] = kind
+    return list(merged.items())
+
+
+class _Inotify:
+    """Minimal ctypes binding of the Linux inotify API."""
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify requires Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "libc has no inotify support")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.paths: dict[int, str] = {}
+        self._watches: dict[str, int] = {}
+
+    def add_watch(self, relative: str, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return  # Removed (or replaced by a file) before we got to it.
+            raise OSError(error, os.strerror(error), str(path))
+        self.paths[wd] = relative
+        self._watches[relative] = wd
+
+    def remove_tree(self, relative: str) -> None:
+        prefix = relative + "/"
+        for path in [p for p in self._watches if p == relative or p.startswith(prefix)]:
+            wd = self._watches.pop(path)
+            self.paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def forget(self, wd: int) -> None:
+        path = self.paths.pop(wd, None)
+        if path is not None and self._watches.get(path) == wd:
+            del self._watches[path]
+
+    def read_events(self) -> list[tuple[int, int, str]]:
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                raw_name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(raw_name)))
+        return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
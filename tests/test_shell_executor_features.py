@@ -1,7 +1,11 @@
 import asyncio
+import os
 import shlex
+import socket
+import subprocess
 import sys
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
@@ -14,6 +18,10 @@ from agents import (
     ShellResult,
 )
 from coding_agent.tools.shell import ShellExecutor
+from coding_agent.util.background_registry import BackgroundProcessRegistry
+from coding_agent.util.command_cache import CommandResultCache, parse_read_only_command
+from coding_agent.util.resource_limits import LimitedCommand, ResourceLimits
+from coding_agent.util.workspace_watcher import ChangeFeedGap, WorkspaceWatcher
 
 
 def _build_request(command: str) -> ShellCommandRequest:
@@ -97,7 +105,9 @@ def test_executor_spawns_detached_background(tmp_path: Path, monkeypatch: pytest
 
     recorded: dict[str, str] = {}
 
-    async def fake_spawn(self, command: str, env: dict[str, str]) -> ShellCommandOutput:
+    async def fake_spawn(
+        self, command: str, env: dict[str, str], request: ShellCommandRequest
+    ) -> ShellCommandOutput:
         recorded["command"] = command
         return ShellCommandOutput(
             command=command,
@@ -118,3 +128,492 @@ def test_executor_spawns_detached_background(tmp_path: Path, monkeypatch: pytest
     assert recorded["command"].endswith("& echo $!")
     assert result.output[0].stdout == "detached"
 
+
+
+def _build_multi_request(commands: list[str]) -> ShellCommandRequest:
+    action = ShellActionRequest(commands=commands, timeout_ms=None)
+    call_data = ShellCallData(call_id="test_call", action=action)
+    return ShellCommandRequest(ctx_wrapper=None, data=call_data)  # type: ignore[arg-type]
+
+
+def test_persistent_session_keeps_shell_state(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    executor = ShellExecutor(cwd=tmp_path, persistent_sessions=True)
+
+    async def _run() -> tuple[ShellResult, ShellResult]:
+        try:
+            first = await executor(
+                _build_multi_request(["cd sub && export CA_MARKER=kept", "false"])
+            )
+            second = await executor(_build_multi_request(['pwd; echo "$CA_MARKER"']))
+        finally:
+            await executor.aclose()
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    assert first.output[0].outcome.exit_code == 0
+    assert first.output[1].outcome.exit_code == 1
+    assert second.output[0].stdout.splitlines() == [str(tmp_path / "sub"), "kept"]
+    assert executor.session_pool is not None
+    assert executor.session_pool.spawned == 1
+
+
+def test_persistent_session_recovers_after_shell_exit(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, persistent_sessions=True)
+
+    async def _run() -> ShellResult:
+        try:
+            return await executor(
+                _build_multi_request(["echo out; echo err >&2; exit 3", "echo again"])
+            )
+        finally:
+            await executor.aclose()
+
+    result = asyncio.run(_run())
+
+    assert result.output[0].stdout == "out\n"
+    assert result.output[0].stderr == "err\n"
+    assert result.output[0].outcome.exit_code == 3
+    assert result.output[1].stdout == "again\n"
+    assert executor.session_pool is not None
+    assert executor.session_pool.spawned == 2
+
+
+def test_persistent_session_keeps_background_output_with_its_command(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, persistent_sessions=True)
+
+    async def _run() -> tuple[ShellResult, ShellResult]:
+        try:
+            first = await executor(
+                _build_multi_request(["echo bg1; (sleep 0.2; echo bg2; echo bg3) &"])
+            )
+            second = await executor(_build_multi_request(["echo after"]))
+        finally:
+            await executor.aclose()
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    # Like a fresh /bin/sh, the command's output ends when the job closes it.
+    assert first.output[0].stdout == "bg1\nbg2\nbg3\n"
+    assert second.output[0].stdout == "after\n"
+    assert executor.session_pool is not None
+    assert executor.session_pool.spawned == 1
+
+
+def test_output_capture_keeps_head_and_tail(tmp_path: Path) -> None:
+    spill_dir = tmp_path / "spill"
+    executor = ShellExecutor(
+        cwd=tmp_path,
+        output_head_bytes=16,
+        output_tail_bytes=16,
+        output_spill_dir=spill_dir,
+    )
+    command = f"{shlex.quote(sys.executable)} -c \"print('x' * 100000 + 'END')\""
+
+    result = asyncio.run(executor(_build_request(command)))
+    stdout = result.output[0].stdout
+
+    assert stdout.startswith("x" * 16)
+    assert stdout.endswith("END\n")
+    assert "bytes of stdout truncated" in stdout
+    assert len(stdout) < 512
+    spill_files = list(spill_dir.iterdir())
+    assert len(spill_files) == 1
+    assert spill_files[0].stat().st_size == 100004
+    assert str(spill_files[0]) in stdout
+
+
+@pytest.mark.parametrize("attribute", ["streaming_context", "_streaming_context"])
+def test_output_is_streamed_while_command_runs(tmp_path: Path, attribute: str) -> None:
+    events: asyncio.Queue = asyncio.Queue()
+    ctx_wrapper = SimpleNamespace(
+        context=SimpleNamespace(**{attribute: SimpleNamespace(event_queue=events)})
+    )
+    executor = ShellExecutor(cwd=tmp_path, stream_flush_interval=0.05)
+    command = (
+        f"{shlex.quote(sys.executable)} -u -c \"import time; print('first'); "
+        "time.sleep(0.5); print('second')\""
+    )
+    action = ShellActionRequest(commands=[command], timeout_ms=None)
+    request = ShellCommandRequest(
+        ctx_wrapper=ctx_wrapper,  # type: ignore[arg-type]
+        data=ShellCallData(call_id="stream_call", action=action),
+    )
+
+    async def _run() -> tuple[dict, ShellResult]:
+        task = asyncio.create_task(executor(request))
+        first_event = await asyncio.wait_for(events.get(), timeout=0.4)
+        assert not task.done()
+        return first_event, await task
+
+    first_event, result = asyncio.run(_run())
+
+    assert first_event["type"] == "shell_output_delta"
+    assert first_event["call_id"] == "stream_call"
+    assert first_event["stream"] == "stdout"
+    assert first_event["delta"].startswith("first")
+    assert result.output[0].stdout == "first\nsecond\n"
+
+
+def test_output_rearms_inactivity_deadline(tmp_path: Path) -> None:
+    executor = ShellExecutor(
+        cwd=tmp_path,
+        default_timeout=10,
+        background_on_timeout=False,
+        inactivity_timeout=0.5,
+    )
+    command = (
+        f"{shlex.quote(sys.executable)} -u -c \"import time\n"
+        "for _ in range(5):\n    print('tick'); time.sleep(0.25)\""
+    )
+
+    result = asyncio.run(executor(_build_request(command)))
+    output = result.output[0]
+
+    assert output.outcome.type == "exit"
+    assert output.outcome.exit_code == 0
+    assert output.stdout.count("tick") == 5
+
+
+def test_command_classifier_reports_match_reasons(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path)
+    classification = executor._classify("npx expo start")
+    assert classification.tags == {"auto-confirm", "dev-server"}
+    assert classification.reasons["dev-server"] == r"\bnpx\s+expo\b"
+    assert executor._classify("ls -la").tags == frozenset()
+
+
+def test_parallel_mode_runs_commands_concurrently_in_order(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, parallel_commands=True, max_concurrency=3)
+    commands = [f"sleep 0.6; echo {index}" for index in range(3)]
+
+    async def _run() -> tuple[ShellResult, float]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await executor(_build_multi_request(commands))
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(_run())
+
+    assert [output.stdout for output in result.output] == ["0\n", "1\n", "2\n"]
+    assert elapsed < 1.5
+
+
+def test_parallel_mode_fail_fast_cancels_remaining(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, parallel_commands=True, fail_fast=True)
+
+    result = asyncio.run(
+        executor(_build_multi_request(["sleep 5; echo late", "exit 2"]))
+    )
+
+    assert result.output[1].outcome.exit_code == 2
+    assert result.output[0].stdout == ""
+    assert "cancelled" in result.output[0].stderr
+
+
+def test_background_jobs_are_registered_logged_and_stoppable(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, background_log_dir=tmp_path / "logs")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    command = (
+        f"{shlex.quote(sys.executable)} -m http.server {port} --bind 127.0.0.1 &"
+    )
+
+    async def _run() -> None:
+        result = await executor(_build_request(command))
+        assert "job=bg-1" in result.output[0].stdout
+
+        registry = executor.background_jobs
+        job = registry.get("bg-1")
+        assert job is not None
+        for _ in range(50):
+            if await registry.probe_port(port):
+                break
+            await asyncio.sleep(0.1)
+        assert await registry.probe_port(port)
+        assert [listed.job_id for listed in registry.list_jobs()] == ["bg-1"]
+        assert "Serving HTTP" in registry.tail("bg-1")
+
+        await registry.stop("bg-1")
+        assert not job.running
+        assert not await registry.probe_port(port)
+
+    asyncio.run(_run())
+
+
+def test_background_jobs_are_scoped_pruned_and_maintained_on_a_timer(tmp_path: Path) -> None:
+    registry = BackgroundProcessRegistry(
+        log_dir=tmp_path / "logs",
+        max_log_bytes=1024,
+        retention_seconds=0,
+        maintain_interval=0.05,
+    )
+    chatty = f"{shlex.quote(sys.executable)} -c \"print('x' * 100_000, flush=True)\"; sleep 5"
+
+    async def _run() -> None:
+        mine = await registry.spawn(chatty, tmp_path, {}, owner="first")
+        short = await registry.spawn("true", tmp_path, {}, owner="first")
+        await registry.spawn("sleep 5", tmp_path, {}, owner="second")
+
+        assert [job.job_id for job in registry.list_jobs("first")] == [mine.job_id, short.job_id]
+        assert registry.get(mine.job_id, owner="second") is None
+        with pytest.raises(KeyError):
+            registry.tail(mine.job_id, owner="second")
+
+        # No tool call in between: the timer rolls the log and drops the
+        # finished job together with its log.
+        await asyncio.sleep(0.5)
+        assert mine.log_path.stat().st_size <= 1024
+        assert registry.get(short.job_id) is None
+        assert not short.log_path.exists()
+
+        registry.discard("second")
+        assert registry.list_jobs("second") == []
+        await registry.stop_all()
+
+    asyncio.run(_run())
+
+
+def test_command_output_reports_resource_usage(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path)
+    command = (
+        f"{shlex.quote(sys.executable)} -c \"data = bytearray(64 * 1024 * 1024); "
+        "print(sum(range(2_000_000)))\""
+    )
+
+    result = asyncio.run(executor(_build_request(command)))
+    usage = result.output[0].provider_data["resource_usage"]
+
+    assert usage["attribution"] == "exclusive"
+    assert usage["stdout_bytes"] == len(result.output[0].stdout)
+    assert usage["wall_seconds"] > 0
+    assert usage["user_cpu_seconds"] + usage["system_cpu_seconds"] > 0
+
+
+def test_cpu_limit_terminates_runaway_command(tmp_path: Path) -> None:
+    executor = ShellExecutor(
+        cwd=tmp_path,
+        default_timeout=20,
+        command_limits=ResourceLimits(cpu_seconds=1),
+        session_limits=ResourceLimits(),
+    )
+    command = f"{shlex.quote(sys.executable)} -c \"while True: pass\""
+
+    result = asyncio.run(executor(_build_request(command)))
+    output = result.output[0]
+
+    assert output.outcome.type == "exit"
+    assert output.outcome.exit_code != 0
+    assert "CPU time" in output.stderr
+    assert "CPU time" in output.provider_data["limit_violation"]
+
+
+def test_foreign_kills_are_not_blamed_on_the_cpu_limit(tmp_path: Path) -> None:
+    executor = ShellExecutor(
+        cwd=tmp_path,
+        command_limits=ResourceLimits(cpu_seconds=30),
+        session_limits=ResourceLimits(),
+    )
+
+    result = asyncio.run(executor(_build_request("kill -9 $$")))
+    output = result.output[0]
+
+    assert output.outcome.exit_code != 0
+    assert "limit_violation" not in output.provider_data
+
+
+def test_pooled_sessions_get_no_cumulative_cpu_limit(tmp_path: Path) -> None:
+    executor = ShellExecutor(
+        cwd=tmp_path,
+        persistent_sessions=True,
+        command_limits=ResourceLimits(cpu_seconds=5, memory_mb=4096),
+        session_limits=ResourceLimits(),
+    )
+
+    async def _run() -> ShellResult:
+        try:
+            return await executor(_build_request("ulimit -t"))
+        finally:
+            await executor.aclose()
+
+    assert asyncio.run(_run()).output[0].stdout.strip() == "unlimited"
+
+
+def test_limit_events_are_counted_per_command_in_a_shared_cgroup(tmp_path: Path) -> None:
+    (tmp_path / "memory.events").write_text("oom 1\noom_kill 1\n")
+    limited = LimitedCommand(ResourceLimits(memory_mb=64), tmp_path, "cgroup")
+    assert limited.violation(-9) is None
+
+    (tmp_path / "memory.events").write_text("oom 2\noom_kill 2\n")
+    assert "memory limit of 64 MB" in limited.violation(-9)
+    limited.mark()
+    assert limited.violation(0) is None
+
+
+def test_read_only_results_are_cached_until_workspace_changes(tmp_path: Path) -> None:
+    executor = ShellExecutor(cwd=tmp_path, cache_read_only=True)
+    (tmp_path / "notes.txt").write_text("one\n")
+
+    async def _run() -> None:
+        first = await executor(_build_request("cat notes.txt"))
+        assert first.output[0].stdout == "one\n"
+        assert first.output[0].provider_data.get("result_cache") is None
+
+        cached = await executor(_build_request("cat notes.txt"))
+        assert cached.output[0].stdout == "one\n"
+        assert cached.output[0].provider_data == {"result_cache": "hit"}
+
+        await executor(_build_request("echo two > notes.txt"))
+        refreshed = await executor(_build_request("cat notes.txt"))
+        assert refreshed.output[0].stdout == "two\n"
+        assert "result_cache" not in refreshed.output[0].provider_data
+
+    asyncio.run(_run())
+    assert executor.result_cache.hits == 1
+
+
+def test_cache_lookup_sees_outside_edits_before_the_watcher_polls(tmp_path: Path) -> None:
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    (tmp_path / "notes.txt").write_text("one\n")
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "notes.txt"], cwd=tmp_path, check=True)
+    subprocess.run([*git, "commit", "-qm", "init"], cwd=tmp_path, check=True)
+    watcher = WorkspaceWatcher(tmp_path, backend="poll", poll_interval=3600)
+    executor = ShellExecutor(cwd=tmp_path, cache_read_only=True, workspace_watcher=watcher)
+
+    async def _run() -> None:
+        clean = await executor(_build_request("git status --short"))
+        assert clean.output[0].stdout == ""
+        # Edited by another process; no path the fingerprint stats changes.
+        (tmp_path / "notes.txt").write_text("two\n")
+        dirty = await executor(_build_request("git status --short"))
+        assert dirty.output[0].stdout == " M notes.txt\n"
+        assert "result_cache" not in dirty.output[0].provider_data
+
+    try:
+        asyncio.run(_run())
+    finally:
+        watcher.stop()
+
+
+def test_read_only_cache_can_be_bypassed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    executor = ShellExecutor(cwd=tmp_path, cache_read_only=True)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("one\n")
+    stat = notes.stat()
+
+    def _edit_unseen(text: str) -> None:
+        # Same size and mtime: invisible to the fingerprint until the TTL.
+        notes.write_text(text)
+        os.utime(notes, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    async def _stdout(command: str, **kwargs) -> tuple[str, dict]:
+        result = await executor(_build_request(command), **kwargs)
+        return result.output[0].stdout, result.output[0].provider_data
+
+    async def _run() -> None:
+        await _stdout("cat notes.txt")
+        _edit_unseen("two\n")
+        assert await _stdout("cat notes.txt") == ("one\n", {"result_cache": "hit"})
+
+        stdout, provider_data = await _stdout("CODING_AGENT_SHELL_CACHE=0 cat notes.txt")
+        assert stdout == "two\n" and "result_cache" not in provider_data
+        # The fresh result replaced the stale one.
+        assert await _stdout("cat notes.txt") == ("two\n", {"result_cache": "hit"})
+
+        _edit_unseen("333\n")
+        stdout, _ = await _stdout("cat notes.txt", bypass_cache=True)
+        assert stdout == "333\n"
+        _edit_unseen("444\n")
+        monkeypatch.setenv("CODING_AGENT_SHELL_CACHE", "0")
+        stdout, _ = await _stdout("cat notes.txt")
+        assert stdout == "444\n"
+
+    asyncio.run(_run())
+    assert parse_read_only_command("cat /proc/meminfo") is None
+    assert parse_read_only_command("ls /sys/class/net") is None
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "git diff --output=changes.patch",
+        "git log --output changes.txt",
+        "tree -o tree.txt",
+        "tree -ao tree.txt",
+        "rg --pre ./convert pattern",
+        "rg --pre-glob '*.pdf' pattern",
+        "file -C -m magic",
+    ],
+)
+def test_commands_with_side_effect_options_are_not_cached(command: str) -> None:
+    assert parse_read_only_command(command) is None
+
+
+def test_recursive_commands_fingerprint_the_trees_they_read() -> None:
+    assert parse_read_only_command("grep -rn needle src").trees == ("needle", "src")
+    assert parse_read_only_command("rg needle").trees == ("needle",)
+    assert parse_read_only_command("ls -l src").trees == ()
+
+
+def test_cached_recursive_read_is_invalidated_by_nested_edit(tmp_path: Path) -> None:
+    nested = tmp_path / "src" / "a" / "b.py"
+    nested.parent.mkdir(parents=True)
+    nested.write_text("needle = 1\n")
+    cache = CommandResultCache(ttl_seconds=3600)
+    assert cache.store("grep -r needle src", tmp_path, "src/a/b.py:needle = 1\n", "", 0)
+    assert cache.lookup("grep -r needle src", tmp_path) is not None
+
+    # Edited in place by another process: no path argument's stat changes.
+    with nested.open("a") as handle:
+        handle.write("needle = 2\n")
+    assert cache.lookup("grep -r needle src", tmp_path) is None
+
+    small = CommandResultCache(max_walk_entries=1)
+    assert not small.store("grep -r needle src", tmp_path, "", "", 0)
+
+
+@pytest.mark.parametrize("backend", ["inotify", "poll"])
+def test_workspace_watcher_records_changes(tmp_path: Path, backend: str) -> None:
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.txt").write_text("a")
+    (tmp_path / "node_modules").mkdir()
+    watcher = WorkspaceWatcher(tmp_path, backend=backend, poll_interval=60)
+    watcher.start()
+    try:
+        start = watcher.sync()
+        (tmp_path / "src" / "a.txt").write_text("changed")
+        (tmp_path / "src" / "lib").mkdir()
+        (tmp_path / "src" / "lib" / "b.txt").write_text("b")
+        (tmp_path / "node_modules" / "ignored.js").write_text("x")
+        watcher.sync()
+        assert watcher.changed_paths_since(start) == {
+            "src/a.txt": "modified",
+            "src/lib/b.txt": "created",
+        }
+
+        middle = watcher.generation
+        (tmp_path / "src" / "a.txt").unlink()
+        watcher.sync()
+        assert [(e.path, e.kind) for e in watcher.changes_since(middle)] == [
+            ("src/a.txt", "deleted")
+        ]
+    finally:
+        watcher.stop()
+
+
+def test_workspace_watcher_reports_dropped_history(tmp_path: Path) -> None:
+    watcher = WorkspaceWatcher(tmp_path, backend="poll", poll_interval=60, journal_size=2)
+    watcher.start()
+    try:
+        for name in ("a", "b", "c"):
+            (tmp_path / name).write_text(name)
+        watcher.sync()
+        with pytest.raises(ChangeFeedGap):
+            watcher.changes_since(0)
+        assert [e.path for e in watcher.changes_since(1)] == ["b", "c"]
+    finally:
+        watcher.stop()
@@ -0,0 +1,236 @@
+import asyncio
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+from agency_swarm.utils.thread import ThreadManager
+
+from coding_agent.tools.UpdatePlan import TodoItem, UpdatePlan
+from coding_agent.util.context_budget import ContextBudget, ToolOutputArchive
+from coding_agent.util.session_state import SessionStateStore
+from coding_agent.util.system_hooks import (
+    ContextBudgetHook,
+    SystemReminderHook,
+    filter_duplicates,
+)
+
+
+def _context() -> SimpleNamespace:
+    return SimpleNamespace(context=SimpleNamespace(thread_manager=ThreadManager()))
+
+
+def _shape(context: SimpleNamespace) -> list[tuple[str, str | None]]:
+    return [
+        (message["type"], message.get("call_id"))
+        for message in context.context.thread_manager._store.messages
+    ]
+
+
+def test_filter_duplicates_dedups_and_pairs_calls_incrementally() -> None:
+    context = _context()
+    store = context.context.thread_manager._store
+    store.add_messages(
+        [
+            {"type": "message", "role": "user"},
+            {"type": "function_call", "call_id": "a", "timestamp": 10},
+            {"type": "function_call", "call_id": "b", "timestamp": 10},
+            {"type": "function_call_output", "call_id": "a", "timestamp": 10},
+        ]
+    )
+    filter_duplicates(context)
+    assert _shape(context) == [
+        ("message", None),
+        ("function_call", "b"),
+        ("function_call", "a"),
+        ("function_call_output", "a"),
+    ]
+
+    # Later turns: a duplicate call is dropped and the pending call "b" moves
+    # down to its output.
+    store.add_messages(
+        [
+            {"type": "function_call", "call_id": "a", "timestamp": 20},
+            {"type": "reasoning"},
+            {"type": "function_call_output", "call_id": "b", "timestamp": 20},
+        ]
+    )
+    filter_duplicates(context)
+    filter_duplicates(context)
+    assert _shape(context) == [
+        ("message", None),
+        ("function_call", "a"),
+        ("function_call_output", "a"),
+        ("reasoning", None),
+        ("function_call", "b"),
+        ("function_call_output", "b"),
+    ]
+    # Timestamps are adjusted once, not on every run.
+    assert [message.get("timestamp") for message in store.messages[1:3]] == [11.0, 12.0]
+
+
+def test_filter_duplicates_rebuilds_after_messages_are_replaced() -> None:
+    context = _context()
+    manager = context.context.thread_manager
+    manager.add_message({"type": "function_call_output", "call_id": "x"})
+    filter_duplicates(context)
+
+    manager.replace_messages(
+        [
+            {"type": "function_call_output", "call_id": "x"},
+            {"type": "function_call", "call_id": "x"},
+            {"type": "function_call", "call_id": "x"},
+        ]
+    )
+    filter_duplicates(context)
+    assert _shape(context) == [("function_call", "x"), ("function_call_output", "x")]
+
+
+def _outputs(count: int, chars: int) -> list[dict]:
+    return [
+        {"type": "function_call_output", "call_id": f"call_{index}", "output": f"{index}" * chars}
+        for index in range(count)
+    ]
+
+
+def test_context_budget_compacts_old_large_outputs(tmp_path: Path) -> None:
+    archive = ToolOutputArchive(tmp_path / "archive")
+    hook = ContextBudgetHook(
+        ContextBudget(
+            max_tokens=10**6, min_age=2, min_chars=5_000, excerpt_chars=100, archive=archive
+        )
+    )
+    context = _context()
+    stored = _outputs(4, 6_000)
+    stored.append({"type": "function_call_output", "call_id": "small", "output": "ok"})
+    context.context.thread_manager.add_messages(stored)
+    request = [dict(item) for item in stored]
+
+    asyncio.run(hook.on_llm_start(context, None, None, request))
+
+    compacted = ["full output saved to" in item["output"] for item in request]
+    assert compacted == [True, True, True, False, False]
+    assert request[0]["output"].startswith("0" * 100)
+    assert hook.original_output(context, "call_0") == "0" * 6_000
+    assert stored[1]["output"] == request[1]["output"]
+    stats = hook.stats(context)
+    assert stats.tokens_after < stats.tokens_before
+
+
+def test_context_budget_compacts_more_when_over_budget(tmp_path: Path) -> None:
+    budget = ContextBudget(
+        max_tokens=3_000,
+        min_age=100,
+        min_chars=10**6,
+        excerpt_chars=100,
+        archive=ToolOutputArchive(tmp_path),
+    )
+    items = _outputs(5, 4_000)
+
+    stats = budget.compact(items)
+
+    assert stats.tokens_before > 3_000 >= stats.tokens_after
+    assert len(items[-1]["output"]) == 4_000
+    assert budget.archive.get("call_0") == "0" * 4_000
+
+
+def test_context_budget_archive_outlives_the_process_and_is_pruned(tmp_path: Path) -> None:
+    def make_hook() -> ContextBudgetHook:
+        budget = ContextBudget(
+            max_tokens=10**6,
+            min_age=1,
+            min_chars=5_000,
+            excerpt_chars=100,
+            archive=ToolOutputArchive(tmp_path),
+        )
+        return ContextBudgetHook(budget, retention_seconds=3_600)
+
+    first_message = {"role": "user", "content": "build it", "timestamp": 1.0}
+    stored = [first_message, *_outputs(2, 6_000)]
+    context = _context()
+    context.context.thread_manager.add_messages(stored)
+    asyncio.run(make_hook().on_llm_start(context, None, None, list(stored)))
+    assert "full output saved to" in stored[1]["output"]
+
+    # Another process reloads the saved (already compacted) thread.
+    reloaded = _context()
+    reloaded.context.thread_manager.add_messages([dict(item) for item in stored])
+    hook = make_hook()
+    assert hook.original_output(reloaded, "call_0") == "0" * 6_000
+    archived = Path(stored[1]["output"].split("saved to ")[1].split("]")[0])
+    assert archived.exists()
+
+    # Archives of threads unused for the retention period go once a session is evicted.
+    stale = tmp_path / "stale"
+    stale.mkdir()
+    os.utime(stale, (0, 0))
+    hook.sessions.get("other")
+    hook.sessions.discard("other")
+    assert not stale.exists()
+    assert archived.exists()
+
+
+def test_reminder_is_rendered_once_per_todo_list_version() -> None:
+    plan = UpdatePlan(
+        todos=[
+            TodoItem(task="Write parser", status="in_progress"),
+            TodoItem(task="Add tests", status="pending"),
+        ]
+    )
+    plan.run()
+    context = plan._context
+    hook = SystemReminderHook()
+
+    hook._inject_reminder(context, "user_message")
+    first = context.context.get("pending_system_reminder")
+    hook._inject_reminder(context, "tool_call_limit")
+    assert context.context.get("pending_system_reminder") is first
+    assert "- 1 pending tasks" in first
+    assert "Current in-progress tasks:\n- Write parser\n" in first
+
+    update = UpdatePlan(todos=[TodoItem(task="Add tests", status="in_progress")])
+    update._context = context
+    update.run()
+    assert context.context.get("todos")["version"] == 2
+    hook._inject_reminder(context, "user_message")
+    assert "- Add tests\n" in context.context.get("pending_system_reminder")
+
+
+def test_reminder_counters_are_kept_per_conversation() -> None:
+    hook = SystemReminderHook(max_sessions=2)
+    first, second = _context(), _context()
+    for _ in range(10):
+        asyncio.run(hook.on_tool_end(first, None, None, ""))
+    for _ in range(7):
+        asyncio.run(hook.on_tool_end(second, None, None, ""))
+    assert hook.session(first).tool_call_count == 10
+    assert hook.session(second).tool_call_count == 7
+
+    # The least recently used conversation is evicted beyond max_sessions.
+    third = _context()
+    asyncio.run(hook.on_tool_end(third, None, None, ""))
+    assert len(hook.sessions) == 2
+    assert hook.session(first).tool_call_count == 0
+
+
+def test_session_state_store_evicts_idle_sessions() -> None:
+    now = [0.0]
+    store = SessionStateStore(dict, max_sessions=10, idle_seconds=60, clock=lambda: now[0])
+    store.get("a")["turns"] = 1
+    now[0] = 30
+    store.get("b")
+    now[0] = 80
+    store.get("b")
+    assert "a" not in store
+    assert store.get("a") == {}
+
+
+def test_session_state_store_reports_evicted_sessions() -> None:
+    evicted = []
+    store = SessionStateStore(
+        dict, max_sessions=1, on_evict=lambda key, state: evicted.append((key, state))
+    )
+    store.get("a")["turns"] = 1
+    store.get("b")
+    store.discard("b")
+    store.discard("missing")
+    assert evicted == [("a", {"turns": 1}), ("b", {})]
@@ -0,0 +1,638 @@
+import asyncio
+import importlib
+import json
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from agents import Agent, ApplyPatchTool, RunConfig, RunContextWrapper, RunHooks, apply_diff
+from agents.editor import ApplyPatchOperation
+from agents.run_internal.run_steps import ToolRunApplyPatchCall
+from agents.run_internal.tool_execution import execute_apply_patch_calls
+from openai.types.responses import ResponseApplyPatchToolCall
+
+from coding_agent.tools.apply_patch import PatchBatchError, WorkspaceEditor
+from coding_agent.util import patch_journal
+from coding_agent.util.diff_engine import StreamingUnsupported, apply_diff_indexed
+from coding_agent.util.patch_journal import MANIFEST_NAME, PatchJournal
+from coding_agent.util.snapshot_store import SnapshotConflict
+from coding_agent.util.system_hooks import PatchBatchHook
+from coding_agent.util.text_encoding import BinaryFileError
+
+
+def _editor(tmp_path: Path, **kwargs) -> WorkspaceEditor:
+    root = tmp_path / "workspace"
+    root.mkdir(exist_ok=True)
+    kwargs.setdefault("journal_dir", tmp_path / "journal")
+    kwargs.setdefault("snapshot_dir", tmp_path / "snapshots")
+    return WorkspaceEditor(root, **kwargs)
+
+
+def test_update_file_replaces_content_atomically(tmp_path: Path) -> None:
+    editor = _editor(tmp_path, durability="full")
+    target = tmp_path / "workspace" / "app.py"
+    target.write_text("print('a')\n")
+    target.chmod(0o755)
+
+    result = editor.update_file(
+        ApplyPatchOperation(
+            type="update_file", path="app.py", diff="-print('a')\n+print('b')\n"
+        )
+    )
+
+    assert result.output == "Updated app.py"
+    assert target.read_text() == "print('b')\n"
+    assert target.stat().st_mode & 0o777 == 0o755
+    assert sorted(p.name for p in target.parent.iterdir()) == ["app.py"]
+
+
+def test_apply_batch_rolls_back_when_a_write_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "a.txt").write_text("old a")
+    real_write = patch_journal.atomic_write_bytes
+
+    def _failing_write(target: Path, data: bytes, durability: str) -> None:
+        if target.name == "b.txt":
+            raise OSError("disk full")
+        real_write(target, data, durability)
+
+    monkeypatch.setattr(patch_journal, "atomic_write_bytes", _failing_write)
+
+    with pytest.raises(OSError):
+        editor.apply_batch(
+            [
+                ApplyPatchOperation(type="update_file", path="a.txt", diff="-old a\n+new a\n"),
+                ApplyPatchOperation(type="create_file", path="b.txt", diff="+new b\n"),
+            ]
+        )
+
+    assert (root / "a.txt").read_text() == "old a"
+    assert not (root / "b.txt").exists()
+    assert list((tmp_path / "journal").iterdir()) == []
+
+
+def test_journal_replays_interrupted_transaction(tmp_path: Path) -> None:
+    journal = PatchJournal(tmp_path / "journal", durability="none")
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    first.write_text("before")
+
+    transaction = journal._prepare({first: b"after", second: b"created"})
+    manifest = json.loads((transaction / MANIFEST_NAME).read_text())
+    manifest["state"] = "applying"
+    (transaction / MANIFEST_NAME).write_text(json.dumps(manifest))
+    first.write_text("half-written")
+
+    assert journal.recover() == [transaction.name]
+    assert first.read_text() == "after"
+    assert second.read_text() == "created"
+    assert journal.pending() == []
+
+
+def test_apply_batch_commits_all_operations_together(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "a.txt").write_text("a1\n")
+    (root / "b.txt").write_text("b1\n")
+
+    result = editor.apply_batch(
+        [
+            ApplyPatchOperation(type="update_file", path="a.txt", diff="-a1\n+a2\n"),
+            ApplyPatchOperation(type="update_file", path="a.txt", diff="-a2\n+a3\n"),
+            ApplyPatchOperation(type="create_file", path="pkg/c.txt", diff="+c\n"),
+            ApplyPatchOperation(type="delete_file", path="b.txt"),
+        ]
+    )
+
+    assert [r.output for r in result.results] == [
+        "Updated a.txt",
+        "Updated a.txt",
+        "Created pkg/c.txt",
+        "Deleted b.txt",
+    ]
+    assert result.files_changed == 3
+    assert result.total_seconds >= 0
+    assert (root / "a.txt").read_text() == "a3\n"
+    assert (root / "pkg" / "c.txt").read_text() == "c"
+    assert not (root / "b.txt").exists()
+
+
+def test_apply_batch_writes_nothing_when_an_operation_fails(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "a.txt").write_text("a1\n")
+
+    with pytest.raises(PatchBatchError) as excinfo:
+        editor.apply_batch(
+            [
+                ApplyPatchOperation(type="update_file", path="a.txt", diff="-a1\n+a2\n"),
+                ApplyPatchOperation(type="create_file", path="new/d.txt", diff="+d\n"),
+                ApplyPatchOperation(type="update_file", path="missing.txt", diff="-x\n+y\n"),
+            ]
+        )
+
+    assert excinfo.value.index == 2
+    assert (root / "a.txt").read_text() == "a1\n"
+    assert not (root / "new").exists()
+
+
+def _run_patch_response(editor: WorkspaceEditor, operations: list[dict]) -> list[dict]:
+    """Run the apply_patch calls of one model response through the SDK."""
+    tool = ApplyPatchTool(editor=editor)
+    hook = PatchBatchHook(editor)
+    agent = Agent(name="coder", tools=[tool], hooks=hook)
+    context = RunContextWrapper(context=SimpleNamespace())
+    calls = [
+        ResponseApplyPatchToolCall(
+            id=f"ap_{index}",
+            call_id=f"call_{index}",
+            operation=operation,
+            status="completed",
+            type="apply_patch_call",
+        )
+        for index, operation in enumerate(operations)
+    ]
+
+    async def _run() -> list:
+        await hook.on_llm_end(context, agent, SimpleNamespace(output=calls))
+        return await execute_apply_patch_calls(
+            public_agent=agent,
+            calls=[ToolRunApplyPatchCall(call, tool) for call in calls],
+            context_wrapper=context,
+            hooks=RunHooks(),
+            config=RunConfig(),
+        )
+
+    return [item.raw_item for item in asyncio.run(_run())]
+
+
+def test_apply_patch_tool_applies_a_response_all_or_nothing(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "a.txt").write_text("a1\n")
+
+    failed = _run_patch_response(
+        editor,
+        [
+            {"type": "update_file", "path": "a.txt", "diff": "-a1\n+a2\n"},
+            {"type": "create_file", "path": "b.txt", "diff": "+b\n"},
+            {"type": "update_file", "path": "missing.txt", "diff": "-x\n+y\n"},
+        ],
+    )
+    assert [item["status"] for item in failed] == ["failed", "failed", "failed"]
+    assert "no file of this patch was changed" in failed[0]["output"]
+    assert (root / "a.txt").read_text() == "a1\n"
+    assert not (root / "b.txt").exists()
+
+    applied = _run_patch_response(
+        editor,
+        [
+            {"type": "update_file", "path": "a.txt", "diff": "-a1\n+a2\n"},
+            {"type": "create_file", "path": "b.txt", "diff": "+b\n"},
+        ],
+    )
+    assert [item["output"] for item in applied] == ["Updated a.txt", "Created b.txt"]
+    assert (root / "a.txt").read_text() == "a2\n"
+    assert (root / "b.txt").read_text() == "b"
+    assert not editor._expected
+
+
+def test_content_cache_serves_hot_files_and_detects_external_edits(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    target = tmp_path / "workspace" / "hot.txt"
+    target.write_text("v1\n")
+
+    for old, new in (("v1", "v2"), ("v2", "v3")):
+        editor.update_file(
+            ApplyPatchOperation(type="update_file", path="hot.txt", diff=f"-{old}\n+{new}\n")
+        )
+    assert (editor.content_cache.misses, editor.content_cache.hits) == (1, 1)
+
+    target.write_text("external edit\n")
+    editor.update_file(
+        ApplyPatchOperation(
+            type="update_file", path="hot.txt", diff="-external edit\n+v4\n"
+        )
+    )
+    assert editor.content_cache.misses == 2
+    assert target.read_text() == "v4\n"
+
+
+def _outcome(apply, original: str, diff: str) -> tuple[str, str]:
+    try:
+        return "ok", apply(original, diff)
+    except ValueError as exc:
+        return "error", str(exc)
+
+
+@pytest.mark.parametrize(
+    "original, diff",
+    [
+        ("a\nb\nc\nb\nd", "@@ c\n b\n-d\n+e\n"),
+        ("one\r\ntwo\r\nthree\r\n", "-two\n+TWO\n"),
+        ("def f():\n    return 1  \n", " def f():\n-    return 1\n+    return 2\n"),
+        ("x\ny\nz", "@@\n y\n-z\n+Z\n*** End of File\n"),
+        # Stacked anchors narrow the search to a nested block.
+        (
+            "class A:\n    def f(self):\n        return 1\nclass B:\n    def f(self):\n        return 1\n",
+            "@@ class B:\n@@     def f(self):\n-        return 1\n+        return 2\n",
+        ),
+        ("a\nb\n", "@@ a\n@@\n b\n+c\n"),
+        ("a\nb\nc\n", "@@ \n b\n+x\n"),
+        # Appends at the end of a file with and without a trailing newline.
+        ("import os\nprint(1)\n", "+print(2)\n*** End of File\n"),
+        ("import os\nprint(1)", "+print(2)\n*** End of File\n"),
+        ("import os\nprint(1)\n", " print(1)\n+print(2)\n*** End of File\n"),
+        ("one\r\ntwo\r\n", "@@\n+three\n*** End of File\n"),
+        ("", "+x\n*** End of File\n"),
+    ],
+)
+def test_indexed_diff_engine_matches_reference(original: str, diff: str) -> None:
+    assert _outcome(apply_diff_indexed, original, diff) == _outcome(apply_diff, original, diff)
+
+
+def test_indexed_diff_engine_matches_reference_on_random_diffs() -> None:
+    pool = ["a", "b", " a", "a ", "", "x", "def f():", "    return 1"]
+    rng = random.Random(0)
+    for _ in range(3000):
+        lines = [rng.choice(pool) for _ in range(rng.randint(0, 8))]
+        newline = rng.choice(["\n", "\n", "\r\n"])
+        original = newline.join(lines) + rng.choice(["", newline])
+        diff = []
+        for _ in range(rng.randint(1, 3)):
+            for _ in range(rng.choice([0, 0, 1, 2])):
+                diff.append(rng.choice(["@@", "@@ ", "@@ " + rng.choice(lines or pool)]))
+            start = rng.randint(0, max(len(lines) - 1, 0))
+            for offset in range(rng.randint(0, 4)):
+                line = lines[start + offset] if start + offset < len(lines) else rng.choice(pool)
+                diff.append(rng.choice(" -+") + line)
+            if rng.random() < 0.3:
+                diff.append("+" + rng.choice(pool))
+            if rng.random() < 0.2:
+                diff.append("*** End of File")
+        text = "\n".join(diff) + rng.choice(["", "\n"])
+        assert _outcome(apply_diff_indexed, original, text) == _outcome(
+            apply_diff, original, text
+        ), (original, text)
+
+
+def test_indexed_diff_engine_reports_reference_errors() -> None:
+    with pytest.raises(ValueError) as expected:
+        apply_diff("a\nb\n", "-missing\n+x\n")
+    with pytest.raises(ValueError) as actual:
+        apply_diff_indexed("a\nb\n", "-missing\n+x\n")
+    assert str(actual.value) == str(expected.value)
+
+
+@pytest.mark.parametrize(
+    "diff",
+    [
+        "+line 5000\n*** End of File\n",
+        "@@ line 10\n@@ line 2499\n-line 2500\n+line 2500 patched\n",
+    ],
+)
+def test_large_file_updates_match_reference_without_streaming(tmp_path: Path, diff: str) -> None:
+    editor = _editor(tmp_path, streaming_threshold=1024)
+    target = tmp_path / "workspace" / "big.txt"
+    target.write_text("\n".join(f"line {number}" for number in range(5000)) + "\n")
+    expected = _outcome(apply_diff, target.read_text(), diff)
+    with pytest.raises(StreamingUnsupported):
+        editor._stream_update(target, diff)
+
+    try:
+        editor.update_file(ApplyPatchOperation(type="update_file", path="big.txt", diff=diff))
+        actual = "ok", target.read_text()
+    except ValueError as exc:
+        actual = "error", str(exc)
+    assert actual == expected
+
+
+def test_large_file_updates_are_streamed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    editor = _editor(tmp_path, streaming_threshold=1024)
+    target = tmp_path / "workspace" / "big.txt"
+    lines = [f"line {number}" for number in range(5000)]
+    target.write_text("\n".join(lines) + "\n")
+    diff = " line 2499\n-line 2500\n+line 2500 patched\n line 2501\n"
+    expected = apply_diff(target.read_text(), diff)
+
+    def _no_full_read(self, path: Path) -> str:
+        raise AssertionError("large file should not be read into memory")
+
+    monkeypatch.setattr(type(editor.content_cache), "read_text", _no_full_read)
+    result = editor.update_file(
+        ApplyPatchOperation(type="update_file", path="big.txt", diff=diff)
+    )
+
+    assert result.output == "Updated big.txt"
+    assert target.read_text() == expected
+
+
+def test_undo_and_redo_restore_recorded_snapshots(tmp_path: Path) -> None:
+    editor = _editor(tmp_path, snapshots=True)
+    root = tmp_path / "workspace"
+    (root / "a.txt").write_text("a1\n")
+
+    editor.update_file(ApplyPatchOperation(type="update_file", path="a.txt", diff="-a1\n+a2\n"))
+    editor.create_file(ApplyPatchOperation(type="create_file", path="b.txt", diff="+b\n"))
+    editor.delete_file(ApplyPatchOperation(type="delete_file", path="a.txt"))
+
+    assert editor.undo(2) == ["Deleted a.txt", "Created b.txt"]
+    assert (root / "a.txt").read_text() == "a2\n"
+    assert not (root / "b.txt").exists()
+
+    assert editor.redo() == ["Created b.txt"]
+    assert (root / "b.txt").read_text() == "b"
+
+    (root / "b.txt").write_text("edited by hand")
+    with pytest.raises(SnapshotConflict):
+        editor.undo()
+    assert editor.undo(force=True) == ["Created b.txt"]
+    assert not (root / "b.txt").exists()
+
+
+def test_edit_history_tool_undoes_and_redoes_patches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    history_module = importlib.import_module("coding_agent.tools.EditHistory")
+    editor = _editor(tmp_path, snapshots=True)
+    monkeypatch.setattr(history_module, "workspace_editor", editor)
+    target = tmp_path / "workspace" / "app.py"
+
+    def _run(action: str, **kwargs) -> str:
+        return asyncio.run(history_module.EditHistory(action=action, **kwargs).run())
+
+    assert _run("undo") == "Nothing to undo."
+    editor.create_file(ApplyPatchOperation(type="create_file", path="app.py", diff="+v1\n"))
+    editor.update_file(ApplyPatchOperation(type="update_file", path="app.py", diff="-v1\n+v2\n"))
+    assert _run("list") == "edit 2: Updated app.py\nedit 1: Created app.py"
+
+    assert _run("undo") == "Undid: Updated app.py"
+    assert target.read_text() == "v1"
+    assert _run("redo") == "Redid: Updated app.py"
+    assert target.read_text() == "v2"
+
+    target.write_text("edited by hand")
+    assert _run("undo", steps=2).startswith("Error: ")
+    assert target.read_text() == "edited by hand"
+    assert _run("undo", steps=2, force=True) == "Undid: Updated app.py\nUndid: Created app.py"
+    assert not target.exists()
+
+    (tmp_path / "off").mkdir()
+    monkeypatch.setattr(history_module, "workspace_editor", _editor(tmp_path / "off"))
+    assert _run("list").startswith("Error: edit history is disabled")
+
+
+def test_snapshot_collection_drops_unreferenced_blobs(tmp_path: Path) -> None:
+    editor = _editor(tmp_path, snapshots=True)
+    (tmp_path / "workspace" / "a.txt").write_text("a1\n")
+    for old, new in (("a1", "a2"), ("a2", "a3")):
+        editor.update_file(
+            ApplyPatchOperation(type="update_file", path="a.txt", diff=f"-{old}\n+{new}\n")
+        )
+    store = editor.snapshots
+    assert len(set(store.blobs.keys())) == 3
+
+    assert store.collect(max_age_seconds=0) == 3
+    assert store.history() == []
+
+
+def test_snapshots_are_opt_in_bounded_and_private_to_each_store(tmp_path: Path) -> None:
+    assert _editor(tmp_path).snapshots is None
+
+    editor = _editor(tmp_path, snapshots=True)
+    other = _editor(tmp_path, snapshots=True)
+    store = editor.snapshots
+    store.max_bytes = 10
+    target = tmp_path / "workspace" / "a.txt"
+    target.write_text("0\n")
+    other.update_file(ApplyPatchOperation(type="update_file", path="a.txt", diff="-0\n+1\n"))
+    for old in range(1, 6):
+        editor.update_file(
+            ApplyPatchOperation(type="update_file", path="a.txt", diff=f"-{old}\n+{old + 1}\n")
+        )
+        # Every edit is trimmed to max_bytes, not only when history overflows.
+        assert sum(store.blobs.size(key) for key in store.blobs.keys()) <= 10
+
+    assert len(store.history()) == 4
+    assert len(set(other.snapshots.blobs.keys())) == 2
+    assert other.undo(force=True) == ["Updated a.txt"]
+    assert target.read_text() == "0\n"
+
+
+@pytest.mark.parametrize(
+    ("encoding", "bom", "newline"),
+    [
+        ("utf-8", b"\xef\xbb\xbf", "\r\n"),
+        ("utf-16-le", b"\xff\xfe", "\n"),
+        ("utf-16-be", b"\xfe\xff", "\r\n"),
+        ("latin-1", b"", "\n"),
+    ],
+)
+def test_update_preserves_encoding_bom_and_newlines(
+    tmp_path: Path, encoding: str, bom: bytes, newline: str
+) -> None:
+    editor = _editor(tmp_path)
+    target = tmp_path / "workspace" / "notes.txt"
+    target.write_bytes(bom + newline.join(["caf\u00e9", "old", "end", ""]).encode(encoding))
+
+    editor.update_file(
+        ApplyPatchOperation(
+            type="update_file", path="notes.txt", diff=" caf\u00e9\n-old\n+new \u00fc\n"
+        )
+    )
+
+    expected = newline.join(["caf\u00e9", "new \u00fc", "end", ""])
+    assert target.read_bytes() == bom + expected.encode(encoding)
+
+
+def test_binary_files_are_rejected(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    target = tmp_path / "workspace" / "image.png"
+    target.write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + bytes(range(256)))
+
+    with pytest.raises(BinaryFileError, match="image.png"):
+        editor.update_file(
+            ApplyPatchOperation(type="update_file", path="image.png", diff="-a\n+b\n")
+        )
+
+
+def test_paths_are_resolved_once_per_operation_and_symlink_safe(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "src").mkdir()
+    for name in ("a.txt", "b.txt"):
+        (root / "src" / name).write_text("x\n")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    resolved: list[str] = []
+    real_resolve = editor._resolve
+
+    def _counting_resolve(relative: str, ensure_parent: bool = False) -> Path:
+        resolved.append(relative)
+        return real_resolve(relative, ensure_parent)
+
+    monkeypatch.setattr(editor, "_resolve", _counting_resolve)
+    steps = [("src/a.txt", "x", "y"), ("src/b.txt", "x", "y"), ("src/a.txt", "y", "z")]
+    for path, old, new in steps:
+        editor.update_file(
+            ApplyPatchOperation(type="update_file", path=path, diff=f"-{old}\n+{new}\n")
+        )
+    editor.delete_file(ApplyPatchOperation(type="delete_file", path="src/b.txt"))
+    assert resolved == ["src/a.txt", "src/b.txt", "src/a.txt", "src/b.txt"]
+
+    # Swapping the directory for a symlink that leaves the workspace is caught.
+    (root / "src").rename(root / "old-src")
+    (root / "src").symlink_to(outside, target_is_directory=True)
+    with pytest.raises(RuntimeError, match="outside workspace"):
+        editor.create_file(ApplyPatchOperation(type="create_file", path="src/a.txt", diff="+x\n"))
+    (root / "old-src" / "link.txt").symlink_to(outside / "secret.txt")
+    with pytest.raises(RuntimeError, match="outside workspace"):
+        editor.create_file(
+            ApplyPatchOperation(type="create_file", path="old-src/link.txt", diff="+x\n")
+        )
+    assert not (outside / "a.txt").exists()
+    assert not (outside / "secret.txt").exists()
+
+
+def test_path_resolution_catches_replaced_ancestor(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    root = tmp_path / "workspace"
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "b" / "ok.txt").write_text("x\n")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    editor.update_file(
+        ApplyPatchOperation(type="update_file", path="a/b/ok.txt", diff="-x\n+y\n")
+    )
+
+    # Moving an ancestor out and linking it back keeps the parent's inode.
+    (root / "a").rename(outside / "a")
+    (root / "a").symlink_to(outside / "a", target_is_directory=True)
+    with pytest.raises(RuntimeError, match="outside workspace"):
+        editor.create_file(
+            ApplyPatchOperation(type="create_file", path="a/b/pwned.txt", diff="+x\n")
+        )
+    assert not (outside / "a" / "b" / "pwned.txt").exists()
+
+
+def test_written_files_are_syntax_checked(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+
+    broken = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="app.py", diff="+def f(:\n+    pass\n")
+    )
+    assert broken.output.splitlines()[:2] == ["Created app.py", "Syntax check failed:"]
+    assert broken.output.splitlines()[2].startswith("app.py:1:")
+
+    config = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="config.json", diff='+{"a": 1,}\n')
+    )
+    assert "config.json:1:" in config.output
+    fixed = editor.update_file(
+        ApplyPatchOperation(type="update_file", path="config.json", diff='-{"a": 1,}\n+{"a": 1}\n')
+    )
+    assert fixed.output == "Updated config.json"
+
+    editor.validator.register((".js",), lambda text, path: [f"{path}:1:1: nope"])
+    script = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="app.js", diff="+let x\n")
+    )
+    assert script.output.endswith("app.js:1:1: nope")
+
+    quiet = _editor(tmp_path, validate=False)
+    result = quiet.create_file(
+        ApplyPatchOperation(type="create_file", path="other.py", diff="+def f(:\n")
+    )
+    assert result.output == "Created other.py"
+
+
+def test_commented_config_files_are_checked_as_jsonc(tmp_path: Path) -> None:
+    editor = _editor(tmp_path)
+    tsconfig = (
+        '{\n  "compilerOptions": {\n    /* Bundler mode */\n'
+        '    "moduleResolution": "bundler", // Vite default\n'
+        '    "paths": {"@/*": ["./src/*"]},\n  },\n}\n'
+    )
+    diff = "".join(f"+{line}\n" for line in tsconfig.splitlines())
+
+    result = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="tsconfig.app.json", diff=diff)
+    )
+    assert result.output == "Created tsconfig.app.json"
+
+    broken = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="tsconfig.json", diff='+{"a": 1 "b": 2}\n')
+    )
+    assert "tsconfig.json:1:" in broken.output
+    strict = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="package.json", diff=diff)
+    )
+    assert "Syntax check failed:" in strict.output
+
+    # Extensionless configs are matched by name rather than suffix.
+    swcrc = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="web/.swcrc", diff=diff)
+    )
+    assert swcrc.output == "Created web/.swcrc"
+    broken_swcrc = editor.create_file(
+        ApplyPatchOperation(type="create_file", path=".swcrc", diff='+{"a": 1 "b": 2}\n')
+    )
+    assert ".swcrc:1:" in broken_swcrc.output
+    assert editor.validator.supports(".swcrc")
+    assert not editor.validator.supports("Makefile")
+
+
+def test_yaml_with_application_tags_passes_the_syntax_check(tmp_path: Path) -> None:
+    pytest.importorskip("yaml")
+    editor = _editor(tmp_path)
+    template = (
+        "Resources:\n  Policy:\n    Properties:\n      Bucket: !Ref MyBucket\n"
+        "      Arn: !GetAtt [MyBucket, Arn]\n---\nkind: Service\n"
+    )
+    diff = "".join(f"+{line}\n" for line in template.splitlines())
+
+    result = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="template.yaml", diff=diff)
+    )
+    assert result.output == "Created template.yaml"
+
+    broken = editor.create_file(
+        ApplyPatchOperation(type="create_file", path="broken.yml", diff="+a: [1,\n")
+    )
+    assert "broken.yml:" in broken.output
+
+
+def test_journal_is_recovered_lazily_and_only_for_its_workspace(tmp_path: Path) -> None:
+    shared = tmp_path / "journal"
+    other_root = tmp_path / "other"
+    other_root.mkdir()
+    other = PatchJournal(shared, durability="none", root=other_root)
+    transaction = other._prepare({other_root / "a.txt": b"after"})
+    manifest = json.loads((transaction / MANIFEST_NAME).read_text())
+    manifest["state"] = "applying"
+    (transaction / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    editor = _editor(tmp_path, journal_dir=shared)
+    assert not (other_root / "a.txt").exists()
+    editor.create_file(ApplyPatchOperation(type="create_file", path="new.txt", diff="+x\n"))
+    # Another workspace's interrupted transaction is left for its own editor.
+    assert not (other_root / "a.txt").exists()
+    assert other.recover() == [transaction.name]
+    assert (other_root / "a.txt").read_text() == "after"
+
+
+def test_journal_defaults_to_the_workspace_state_directory(tmp_path: Path) -> None:
+    root = tmp_path / "workspace"
+    root.mkdir()
+    editor = WorkspaceEditor(root, snapshot_dir=tmp_path / "snapshots")
+    assert editor.journal.journal_dir == root / ".coding-agent" / "journal"
+    assert not (root / ".coding-agent").exists()
+
+    editor.create_file(ApplyPatchOperation(type="create_file", path="a.txt", diff="+a\n"))
+    assert (root / ".coding-agent" / ".gitignore").read_text() == "*\n"